@@ -0,0 +1,212 @@
+"""Servidor local que imita o hub, o player e o CDN, para medir o downloader sem tocar no site real.
+
+Rotas servidas (todas em http://127.0.0.1:<porta>):
+  /curso/<slug>/                     página do curso com os links das aulas
+  /curso/atividade/aula-<n>/         página da aula com o iframe do player
+  /curso/atividade/texto-<n>/        aula só com texto (sem vídeo)
+  /embed/<biblioteca>/<video>        iframe no estilo mediadelivery, citando a playlist mestre
+  /<video>/playlist.m3u8             playlist mestre com duas variantes (720p e 1080p)
+  /<video>/<qualidade>/video.m3u8    playlist da variante
+  /<video>/<qualidade>/video<i>.ts   segmento MPEG-TS sintético
+
+Latência por requisição, banda por conexão e injeção de erros nos segmentos
+são configuráveis.
+"""
+
+import re
+import time
+import socket
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TS_PACKET_SIZE = 188
+VARIANTS = (("720p", 1280, 720, 2_000_000), ("1080p", 1920, 1080, 5_000_000))
+LIBRARY_ID = "123456"
+
+_LESSON_RE = re.compile(r"^/curso/atividade/(aula|texto)-(\d+)/?$")
+_EMBED_RE = re.compile(r"^/embed/[^/]+/([^/]+)$")
+_MASTER_RE = re.compile(r"^/([^/]+)/playlist\.m3u8$")
+_VARIANT_RE = re.compile(r"^/([^/]+)/([^/]+)/video\.m3u8$")
+_SEGMENT_RE = re.compile(r"^/([^/]+)/([^/]+)/video(\d+)\.ts$")
+
+
+def synthetic_segment(size):
+    """Bytes que passam por MPEG-TS: pacotes de 188 bytes começando com o byte de sincronismo"""
+    packets = max(1, size // TS_PACKET_SIZE)
+    return (b"\x47" + bytes(TS_PACKET_SIZE - 1)) * packets
+
+
+class FakeHub:
+    """Servidor sintético em thread própria.
+
+    `latency` (segundos) é somada a toda resposta; `bandwidth` (bytes/s) limita
+    cada conexão ao enviar segmentos; `error_rate` é a fração de segmentos
+    respondidos com `error_status` (com `Retry-After: 0`).
+    """
+
+    def __init__(self, lessons=4, text_lessons=0, segments=30, segment_size=188 * 1000, latency=0.0, bandwidth=None, error_rate=0.0, error_status=503, seed=0):
+        self.lessons = lessons
+        self.text_lessons = text_lessons
+        self.segments = segments
+        self.segment = synthetic_segment(segment_size)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def course_url(self):
+        return f"{self.url}/curso/curso-benchmark/"
+
+    def iframe_url(self, n):
+        return f"{self.url}/embed/{LIBRARY_ID}/video-{n}"
+
+    def master_url(self, n):
+        return f"{self.url}/video-{n}/playlist.m3u8"
+
+    def start(self, port=0):
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Cabeçalho e corpo saem em escritas separadas; sem isso o ACK atrasado
+                # do TCP soma ~40 ms a cada resposta pequena
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                hub._handle(self)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-hub", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _course_page(self):
+        links = "".join(
+            f'<a class="lesson-title" href="/curso/atividade/aula-{n}/">Aula {n}</a>'
+            for n in range(self.lessons)
+        )
+        links += "".join(
+            f'<a class="lesson-title" href="/curso/atividade/texto-{n}/">Texto {n}</a>'
+            for n in range(self.text_lessons)
+        )
+        return f'<html><head><title>Benchmark</title></head><body><h1>Curso Benchmark</h1><div class="lessons-wrapper">{links}</div></body></html>'
+
+    def _lesson_page(self, kind, n):
+        if kind == "texto":
+            return f'<html><body><main><h2>Texto {n}</h2><p>{"conteúdo " * 200}</p></main></body></html>'
+        # Páginas reais são grandes; o iframe vem depois de bastante marcação
+        filler = '<div class="comentario">comentário</div>' * 200
+        return f'<html><body><article>{filler}<iframe class="bunny-video" src="{self.iframe_url(n)}"></iframe></article></body></html>'
+
+    def _iframe(self, video):
+        script = "var player = {};" * 500
+        return f'<html><head><script>{script}</script></head><body><video src="{self.url}/{video}/playlist.m3u8"></video></body></html>'
+
+    def _master(self):
+        linhas = ["#EXTM3U"]
+        for quality, width, height, bandwidth in VARIANTS:
+            linhas.append(f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={width}x{height}")
+            linhas.append(f"{quality}/video.m3u8")
+        return "\n".join(linhas) + "\n"
+
+    def _variant(self):
+        linhas = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:4", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for i in range(self.segments):
+            linhas.append("#EXTINF:4.0,")
+            linhas.append(f"video{i}.ts")
+        linhas.append("#EXT-X-ENDLIST")
+        return "\n".join(linhas) + "\n"
+
+    def _route(self, path):
+        """(status, content-type, corpo, é segmento) para `path`"""
+        if path.startswith("/curso/atividade/"):
+            match = _LESSON_RE.match(path)
+            if match:
+                return 200, "text/html", self._lesson_page(match.group(1), int(match.group(2))), False
+        elif path.startswith("/curso/"):
+            return 200, "text/html", self._course_page(), False
+        match = _EMBED_RE.match(path)
+        if match:
+            return 200, "text/html", self._iframe(match.group(1)), False
+        if _MASTER_RE.match(path):
+            return 200, "application/vnd.apple.mpegurl", self._master(), False
+        if _VARIANT_RE.match(path):
+            return 200, "application/vnd.apple.mpegurl", self._variant(), False
+        match = _SEGMENT_RE.match(path)
+        if match and int(match.group(3)) < self.segments:
+            return 200, "video/mp2t", self.segment, True
+        return 404, "text/plain", "", False
+
+    def _handle(self, handler):
+        status, content_type, body, segmento = self._route(handler.path.split("?", 1)[0])
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self.requests += 1
+            falhar = segmento and self.error_rate and self._random.random() < self.error_rate
+            if falhar:
+                self.errors += 1
+        if falhar:
+            handler.send_response(self.error_status)
+            handler.send_header("Retry-After", "0")
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        try:
+            self._send(handler.wfile, body, throttle=segmento)
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente desistiu (ex: requisição duplicada perdedora)
+            return
+
+    def _send(self, wfile, body, throttle):
+        if not throttle or not self.bandwidth:
+            wfile.write(body)
+            with self._lock:
+                self.bytes_sent += len(body)
+            return
+        bloco = 64 * 1024
+        for inicio in range(0, len(body), bloco):
+            parte = body[inicio:inicio + bloco]
+            wfile.write(parte)
+            with self._lock:
+                self.bytes_sent += len(parte)
+            time.sleep(len(parte) / self.bandwidth)
@@ -0,0 +1,318 @@
+"""Benchmark de ponta a ponta contra o servidor sintético (benchmarks/fake_hub.py).
+
+Mede três cenários com o mesmo servidor local:
+  extract   extract_m3u8_url em cada iframe: latência p50/p99 da resolução
+  segments  download_video_with_fallback de um vídeo: MB/s e latência p50/p99 por segmento
+  course    process_course do curso inteiro: aulas/min e MB/s
+e informa o pico de memória (RSS) do processo.
+
+    python -m benchmarks.run --lessons 6 --segments 60 --latency-ms 20 --json atual.json
+    python -m benchmarks.run --lessons 6 --segments 60 --latency-ms 20 --baseline atual.json
+
+Com `--baseline`, cada número é comparado com o de uma execução anterior gravada
+com `--json`. O modo de concatenação padrão é `ts`, que não precisa do ffmpeg.
+
+Aulas/min e MB/s contam só as aulas cujo arquivo final existe e não está vazio.
+Se alguma aula ou o download de segmentos falhar, a execução é marcada como
+inválida e o processo sai com código 1.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+try:
+    import resource
+except ImportError:
+    # Windows: sem getrusage, o pico de RSS não é informado
+    resource = None
+
+# downloader.parser chama logging.basicConfig com um arquivo de log no diretório atual;
+# configurado antes, o logging do benchmark vai só para o terminal
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+from benchmarks.fake_hub import FakeHub
+from downloader.extract_m3u8 import extract_m3u8_url
+from downloader.lessons import process_course
+from downloader.video_downloader import download_video_with_fallback, CONCAT_MODES, CONCAT_TS, DEFAULT_MAX_WORKERS
+from downloader.retry import DEFAULT_SEGMENT_RETRIES
+from downloader.session import create_session, peak_connections
+from downloader.ratelimit import HostRateLimiter
+from downloader.tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+# Métricas em que um número maior é melhor (as demais são tempos ou memória)
+HIGHER_IS_BETTER = {"lessons_per_min", "mb_per_s", "resolutions_per_s"}
+
+# Arquivo final de uma aula: "<nº>.<título>" + vídeo remuxado, fluxo TS ou markdown
+LESSON_OUTPUT_RE = re.compile(r"^(\d+)\..+\.(mp4|ts|md)$")
+
+
+def percentile(values, pct):
+    """Percentil por posição (nearest-rank); None para lista vazia"""
+    if not values:
+        return None
+    ordenados = sorted(values)
+    indice = max(0, min(len(ordenados) - 1, int(round(pct / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[indice]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KiB, macOS em bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def span_durations(name):
+    """Durações (s) dos spans `name` gravados pelo tracer desde o último enable()"""
+    return [event["dur"] / 1e6 for event in TRACER.events() if event.get("ph") == "X" and event["name"] == name]
+
+
+def lesson_outputs(output_dir):
+    """{nº da aula: arquivo final não vazio} em `output_dir` e na pasta do curso.
+
+    Checkpoints (.parts), o armazenamento de conteúdo e as pastas de segmentos do
+    método manual não contam.
+    """
+    encontrados = {}
+    for raiz, pastas, arquivos in os.walk(output_dir):
+        pastas[:] = [pasta for pasta in pastas if not pasta.startswith(".") and not pasta.endswith("_segments")]
+        for nome in arquivos:
+            match = LESSON_OUTPUT_RE.match(nome)
+            path = os.path.join(raiz, nome)
+            if match and os.path.getsize(path) > 0:
+                encontrados.setdefault(int(match.group(1)), path)
+    return encontrados
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def bench_extract(hub, session, rounds):
+    tempos = []
+    inicio = time.perf_counter()
+    for _ in range(rounds):
+        for n in range(hub.lessons):
+            t0 = time.perf_counter()
+            if not extract_m3u8_url(hub.iframe_url(n), max_retries=0, session=session):
+                raise RuntimeError(f"extract_m3u8_url falhou para {hub.iframe_url(n)}")
+            tempos.append(time.perf_counter() - t0)
+    total = time.perf_counter() - inicio
+    return {
+        "resolutions": len(tempos),
+        "resolutions_per_s": round(len(tempos) / total, 2),
+        "p50_ms": _ms(percentile(tempos, 50)),
+        "p99_ms": _ms(percentile(tempos, 99)),
+    }
+
+
+def bench_segments(hub, session, args, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    TRACER.enable()
+    bytes_antes = hub.bytes_sent
+    inicio = time.perf_counter()
+    ok = download_video_with_fallback(
+        hub.master_url(0),
+        "segmentos.mp4",
+        output_dir,
+        headers=None,
+        max_workers=args.workers,
+        session=session,
+        concat_mode=args.concat_mode,
+        segment_retries=args.retries,
+        hedge=args.hedge,
+    )
+    total = time.perf_counter() - inicio
+    latencias = span_durations("segment")
+    TRACER.disable()
+    mb = (hub.bytes_sent - bytes_antes) / 1e6
+    return {
+        "ok": bool(ok),
+        "segments": len(latencias),
+        "seconds": round(total, 3),
+        "mb": round(mb, 2),
+        "mb_per_s": round(mb / total, 2),
+        "segment_p50_ms": _ms(percentile(latencias, 50)),
+        "segment_p99_ms": _ms(percentile(latencias, 99)),
+    }
+
+
+def bench_course(hub, session, args, output_dir):
+    def get_course_page(url):
+        response = session.get(url, timeout=30)
+        return response.text if response.status_code == 200 else None
+
+    def save_lesson_as_markdown(lesson_title, lesson_html, prefix=None):
+        path = os.path.join(output_dir, f"{prefix}.{lesson_title}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(str(lesson_html))
+        return path
+
+    os.makedirs(output_dir, exist_ok=True)
+    inicio = time.perf_counter()
+    process_course(
+        hub.course_url,
+        get_course_page,
+        save_lesson_as_markdown,
+        headers=None,
+        max_retries=0,
+        wait_time=0,
+        output_dir=output_dir,
+        max_workers=args.workers,
+        session=session,
+        concat_mode=args.concat_mode,
+        pipeline=not args.sequential,
+        engine=args.engine,
+        segment_retries=args.retries,
+        hedge=args.hedge,
+    )
+    total = time.perf_counter() - inicio
+    # process_course não informa falhas por aula: conta os arquivos que de fato ficaram prontos
+    aulas = hub.lessons + hub.text_lessons
+    saidas = lesson_outputs(output_dir)
+    concluidas = len(saidas)
+    mb = sum(os.path.getsize(path) for path in saidas.values()) / 1e6
+    return {
+        "lessons": aulas,
+        "ok": concluidas,
+        "failed": aulas - concluidas,
+        "seconds": round(total, 3),
+        "lessons_per_min": round(concluidas / total * 60, 2),
+        "mb": round(mb, 2),
+        "mb_per_s": round(mb / total, 2),
+    }
+
+
+def compare(results, baseline):
+    """Linhas `cenário.métrica: antes -> agora (delta%)` para os números presentes nos dois"""
+    linhas = []
+    for cenario, metricas in results.items():
+        if cenario == "config" or not isinstance(metricas, dict):
+            continue
+        for nome, valor in metricas.items():
+            antes = baseline.get(cenario, {}).get(nome) if isinstance(baseline.get(cenario), dict) else None
+            if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not isinstance(antes, (int, float)) or not antes:
+                continue
+            delta = (valor - antes) / antes * 100
+            melhor = delta > 0 if nome in HIGHER_IS_BETTER else delta < 0
+            sinal = "✅" if melhor else ("➖" if abs(delta) < 1 else "⚠️")
+            linhas.append(f"  {sinal} {cenario}.{nome}: {antes} -> {valor} ({delta:+.1f}%)")
+    return linhas
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do downloader contra um hub/CDN sintético local")
+    parser.add_argument("--lessons", type=int, default=4, help="aulas com vídeo no curso")
+    parser.add_argument("--text-lessons", type=int, default=1, help="aulas só com texto (salvas como markdown)")
+    parser.add_argument("--segments", type=int, default=30, help="segmentos por vídeo")
+    parser.add_argument("--segment-kb", type=int, default=188, help="tamanho de cada segmento, em KB")
+    parser.add_argument("--latency-ms", type=float, default=0, help="latência somada a cada resposta")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0, help="banda por conexão nos segmentos (0 = sem limite)")
+    parser.add_argument("--error-rate", type=float, default=0, help="fração de segmentos respondidos com erro")
+    parser.add_argument("--error-status", type=int, default=503, help="status dos erros injetados (ex: 429)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="segmentos em paralelo")
+    parser.add_argument("--retries", type=int, default=DEFAULT_SEGMENT_RETRIES, help="novas tentativas por segmento")
+    parser.add_argument("--hedge", action="store_true", help="liga as requisições duplicadas de segmentos lentos")
+    parser.add_argument("--concat-mode", choices=CONCAT_MODES, default=CONCAT_TS)
+    parser.add_argument("--engine", choices=("sync", "async"), default="sync")
+    parser.add_argument("--sequential", action="store_true", help="process_course sem pipeline")
+    parser.add_argument("--extract-rounds", type=int, default=3, help="voltas de extract_m3u8_url por iframe")
+    parser.add_argument("--scenarios", default="extract,segments,course", help="cenários a rodar, separados por vírgula")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--baseline", help="compara com resultados gravados antes com --json")
+    parser.add_argument("--verbose", action="store_true", help="mantém os logs do downloader")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    hub = FakeHub(
+        lessons=args.lessons,
+        text_lessons=args.text_lessons,
+        segments=args.segments,
+        segment_size=args.segment_kb * 1000,
+        latency=args.latency_ms / 1000,
+        bandwidth=args.bandwidth_mbps * 1e6 / 8 if args.bandwidth_mbps else None,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    )
+    # Sem limite de taxa relevante: o que se mede é o downloader, não o orçamento do hub
+    session = create_session(
+        pool_size=peak_connections(args.workers, hedge=args.hedge),
+        rate_limiter=HostRateLimiter({"127.0.0.1": (10000, 10000)}),
+    )
+    cenarios = [nome.strip() for nome in args.scenarios.split(",") if nome.strip()]
+    output_dir = tempfile.mkdtemp(prefix="asimov-bench-")
+
+    results = {
+        "config": {
+            "lessons": args.lessons,
+            "text_lessons": args.text_lessons,
+            "segments": args.segments,
+            "segment_kb": args.segment_kb,
+            "latency_ms": args.latency_ms,
+            "bandwidth_mbps": args.bandwidth_mbps,
+            "error_rate": args.error_rate,
+            "workers": args.workers,
+            "concat_mode": args.concat_mode,
+            "engine": args.engine,
+            "pipeline": not args.sequential,
+        }
+    }
+    try:
+        with hub:
+            if "extract" in cenarios:
+                results["extract"] = bench_extract(hub, session, args.extract_rounds)
+            if "segments" in cenarios:
+                results["segments"] = bench_segments(hub, session, args, os.path.join(output_dir, "segments"))
+            if "course" in cenarios:
+                results["course"] = bench_course(hub, session, args, os.path.join(output_dir, "course"))
+            results["server"] = {"requests": hub.requests, "injected_errors": hub.errors}
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    results["process"] = {"peak_rss_mb": round(peak_rss_mb(), 1) if resource else None}
+    falhas = []
+    if "segments" in results and not results["segments"]["ok"]:
+        falhas.append("download de segmentos falhou")
+    if results.get("course", {}).get("failed"):
+        falhas.append(f"{results['course']['failed']}/{results['course']['lessons']} aulas sem arquivo final")
+    results["valid"] = not falhas
+
+    print("\n📊 Resultados")
+    for cenario, metricas in results.items():
+        if not isinstance(metricas, dict) or cenario == "config":
+            continue
+        print(f"  {cenario}: " + ", ".join(f"{nome}={valor}" for nome, valor in metricas.items()))
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("\n⚠️ A configuração difere da baseline; a comparação pode não ser justa.")
+        print(f"\n📐 Comparação com {args.baseline}")
+        print("\n".join(compare(results, baseline)) or "  (nada em comum para comparar)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados gravados em {args.json}")
+
+    if falhas:
+        print("\n❌ Execução inválida: " + "; ".join(falhas) + " (use --verbose para ver os erros)")
+    return results
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main()["valid"] else 1)
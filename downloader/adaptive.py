@@ -0,0 +1,131 @@
+import time
+import logging
+import threading
+import statistics
+
+logger = logging.getLogger(__name__)
+
+# Duração mínima de uma janela de medição, em segundos
+WINDOW_SECONDS = 1.0
+# Ganho mínimo de vazão para continuar subindo a concorrência
+THROUGHPUT_GAIN = 1.05
+# Latência por byte (mediana da janela) acima de LATENCY_FACTOR x a referência conta como congestionamento
+LATENCY_FACTOR = 2.0
+# Peso de cada janela na referência de latência quando ela piora: a referência cai
+# de imediato para uma janela melhor e sobe devagar, esquecendo mínimos antigos
+BASELINE_DECAY = 0.1
+# Respostas cuja latência entra na medição (206 = segmento por byte-range)
+SUCCESS_STATUS = {200, 206}
+# Status que indicam que o servidor quer menos carga
+THROTTLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class AdaptiveConcurrency:
+    """Controle AIMD do número de segmentos baixados em paralelo.
+
+    A cada janela de medição, se a vazão (bytes/s) subiu, o limite cresce de 1
+    (aumento aditivo); no começo, como no slow start do TCP, ele dobra até a
+    vazão parar de subir ou o primeiro corte. Respostas 429/5xx, erros de
+    conexão ou latência crescente cortam o limite pela metade (redução
+    multiplicativa), no máximo uma vez por janela. O mesmo controlador pode ser compartilhado entre aulas, para que o
+    valor aprendido não se perca de um vídeo para o outro. `clock` substitui
+    time.monotonic (nos testes, um relógio controlado).
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, clock=time.monotonic):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.in_flight = 0
+        self.best_throughput = 0.0
+        self.latency_baseline = None
+        self.slow_start = True
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._reset_window(clock())
+        self._last_decrease = float("-inf")
+
+    def _reset_window(self, now):
+        self._window_start = now
+        self._window_bytes = 0
+        self._window_latencies = []
+        self._window_throttled = False
+
+    def acquire(self):
+        """Bloqueia até haver vaga dentro do limite atual"""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, nbytes=0, latency=None, status=200):
+        """Registra o resultado de uma requisição e libera a vaga.
+
+        `status` None indica erro de conexão/timeout.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            now = self._clock()
+            self._window_bytes += nbytes
+            if latency is not None and nbytes > 0 and status in SUCCESS_STATUS:
+                # Segundos por byte: segmentos curtos ou rendições mais leves não distorcem a referência
+                self._window_latencies.append(latency / nbytes)
+            if status is None or status in THROTTLE_STATUS:
+                self._window_throttled = True
+                self._decrease(now, f"status {status}" if status else "erro de conexão")
+
+            if now - self._window_start >= WINDOW_SECONDS:
+                self._close_window(now)
+            self._condition.notify_all()
+
+    def _decrease(self, now, reason):
+        if now - self._last_decrease < WINDOW_SECONDS:
+            return
+        novo = max(self.minimum, self.limit / 2)
+        if int(novo) < int(self.limit):
+            logger.info(f"🎛️ Reduzindo concorrência {int(self.limit)} -> {int(novo)} ({reason})")
+        self.limit = novo
+        self.slow_start = False
+        self._last_decrease = now
+        # A vazão medida com o limite antigo não vale mais como referência
+        self.best_throughput = 0.0
+
+    def _close_window(self, now):
+        elapsed = now - self._window_start
+        throughput = self._window_bytes / elapsed if elapsed > 0 else 0.0
+        latency = statistics.median(self._window_latencies) if self._window_latencies else None
+
+        congestionado = (
+            latency is not None
+            and self.latency_baseline is not None
+            and latency > self.latency_baseline * LATENCY_FACTOR
+        )
+        if latency is not None:
+            if self.latency_baseline is None or latency < self.latency_baseline:
+                self.latency_baseline = latency
+            else:
+                self.latency_baseline += BASELINE_DECAY * (latency - self.latency_baseline)
+
+        if self._window_throttled:
+            pass
+        elif congestionado:
+            self._decrease(now, f"latência {latency * 1e6:.2f}s/MB")
+        elif throughput > self.best_throughput * THROUGHPUT_GAIN:
+            self.best_throughput = throughput
+            if self.limit < self.maximum:
+                passo = self.limit if self.slow_start else 1
+                self.limit = min(self.maximum, self.limit + passo)
+                logger.debug(f"🎛️ Aumentando concorrência para {int(self.limit)} ({throughput / 1e6:.1f} MB/s)")
+        elif self._window_bytes:
+            # A vazão parou de subir: fim do slow start, daqui em diante só passos de 1
+            self.slow_start = False
+
+        self._reset_window(now)
+
+    @property
+    def current(self):
+        return int(self.limit)
+
+    def report(self):
+        """Resumo da concorrência em que o controlador se estabilizou"""
+        return f"{self.current} conexões (melhor vazão {self.best_throughput / 1e6:.1f} MB/s)"
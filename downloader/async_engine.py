@@ -0,0 +1,585 @@
+"""Engine assíncrono (asyncio + aiohttp) para página, playlist e segmentos.
+
+Alternativa ao fluxo síncrono de lessons.py/video_downloader.py: recebe as
+mesmas entradas de `process_lesson` e `download_video_with_fallback`, mas cada
+requisição em andamento é uma corrotina em vez de uma thread, então milhares de
+segmentos podem estar em voo a partir de um único processo.
+
+O engine síncrono continua sendo o padrão; este módulo só é importado quando
+`engine` é "async" e depende do pacote opcional `aiohttp`.
+"""
+import os
+import io
+import codecs
+import asyncio
+import sqlite3
+import hashlib
+import logging
+from collections import deque
+from http.cookies import Morsel
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from downloader.parser import extract_iframe_url, extract_lesson_title
+from downloader.extract_m3u8 import M3U8Scanner, SCAN_CHUNK_SIZE
+from downloader.hls import parse_playlist, PlaylistError
+from downloader.document import as_document
+from downloader.checkpoint import SegmentManifest, MANIFEST_NAME, checkpoint_dir
+from downloader.streaming import DEFAULT_CHUNK_SIZE
+from downloader.ratelimit import HostRateLimiter
+from downloader.store import video_key, segment_key
+from downloader.retry import DEFAULT_SEGMENT_RETRIES, RETRYABLE_STATUS, backoff_delay, retry_after_seconds
+from downloader.video_downloader import (
+    DEFAULT_MAX_WORKERS,
+    CONCAT_FILES,
+    CONCAT_PIPE,
+    CONCAT_MODES,
+    SEGMENT_HEADERS,
+    SegmentError,
+    PendingConcat,
+    TsFileSink,
+    FfmpegPipeSink,
+    video_output_filename,
+    lesson_parts_dir,
+    fallback_playlist_urls,
+    choose_variant,
+    janela_cheia,
+    REORDER_MAX_SEGMENTS,
+)
+
+logger = logging.getLogger("AsimovDownloader")
+
+# Aulas processadas ao mesmo tempo pelo engine assíncrono
+DEFAULT_LESSON_CONCURRENCY = 2
+
+
+def create_async_session(max_workers=DEFAULT_MAX_WORKERS, sync_session=None):
+    """Cria uma aiohttp.ClientSession com pool por host do tamanho de `max_workers`.
+
+    Se `sync_session` (a requests.Session compartilhada) for informada, seus
+    headers, cookies e limite de taxa por host são reaproveitados, mantendo o
+    login do AsimovDownloader.
+    """
+    if aiohttp is None:
+        raise ImportError("O engine assíncrono requer o pacote aiohttp (pip install aiohttp)")
+
+    rate_limiter = getattr(sync_session, "rate_limiter", None) or HostRateLimiter()
+
+    async def respeitar_limite(session, context, params):
+        # Mesmo orçamento por host do engine síncrono, mas esperando sem bloquear o loop
+        wait = rate_limiter.reserve(str(params.url))
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(respeitar_limite)
+    trace_config.on_request_redirect.append(respeitar_limite)
+
+    connector = aiohttp.TCPConnector(limit=0, limit_per_host=max(1, max_workers))
+    session = aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30),
+        trace_configs=[trace_config],
+    )
+    if sync_session is not None:
+        session.headers.update(sync_session.headers)
+        copy_session_cookies(session, sync_session)
+    return session
+
+
+def copy_session_cookies(session, sync_session):
+    """Copia os cookies da requests.Session para o cookie jar da sessão aiohttp"""
+    from yarl import URL
+    for cookie in sync_session.cookies:
+        # Com domain explícito o aiohttp envia o cookie também aos subdomínios
+        # (hub.asimov.academy); sem ele, o cookie ficaria preso ao host exato
+        morsel = Morsel()
+        morsel.set(cookie.name, cookie.value, cookie.value)
+        morsel["domain"] = cookie.domain
+        morsel["path"] = cookie.path or "/"
+        if cookie.secure:
+            morsel["secure"] = True
+        session.cookie_jar.update_cookies(
+            {cookie.name: morsel},
+            response_url=URL(f"https://{cookie.domain.lstrip('.')}/"),
+        )
+
+
+async def _executar_todas(coros):
+    """Executa as corrotinas em paralelo; se uma falhar, cancela as demais"""
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _stream_to_file(response, path, chunk_size):
+    """Versão assíncrona de streaming.stream_to_file"""
+    part_path = f"{path}.part"
+    digest = hashlib.sha256()
+    total = 0
+    try:
+        with open(part_path, 'wb') as out:
+            async for chunk in response.content.iter_chunked(chunk_size):
+                out.write(chunk)
+                digest.update(chunk)
+                total += len(chunk)
+        os.replace(part_path, path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return total, digest.hexdigest()
+
+
+async def fetch_page_async(session, url, headers=None, get_course_page=None, session_manager=None):
+    """Baixa uma página do hub.
+
+    Se o hub redirecionar para o login, a sessão expirou: com `session_manager`
+    o login é renovado uma vez (o mesmo login único dos workers síncronos), os
+    novos cookies vão para o cookie jar e a página é pedida de novo. Sem ele, ou
+    se o login falhar, é um erro (retorna None). `get_course_page` só cobre
+    falhas de rede e status inesperados.
+    """
+    for tentativa in range(2):
+        generation = session_manager.generation if session_manager else None
+        try:
+            async with session.get(url, headers=headers) as response:
+                if "login" not in str(response.url).lower():
+                    if response.status == 200:
+                        return await response.text()
+                    logger.warning(f"⚠️ Resposta inesperada para {url}: {response.status}")
+                    break
+        except aiohttp.ClientError as e:
+            logger.error(f"❌ Erro na requisição: {str(e)}")
+            break
+
+        if session_manager is None or tentativa > 0:
+            logger.error(f"❌ O hub redirecionou para o login (sessão não enviada ou expirada): {url}")
+            return None
+        logger.warning("🔑 Sessão expirada, renovando login...")
+        if not await session_manager.refresh_async(generation):
+            logger.error(f"❌ Não foi possível renovar o login: {url}")
+            return None
+        copy_session_cookies(session, session_manager.http_session)
+
+    if get_course_page:
+        return await asyncio.to_thread(get_course_page, url)
+    return None
+
+
+async def fetch_playlist_async(session, url, headers=None):
+    """Baixa e interpreta uma playlist; None se indisponível (para sondagens em paralelo)"""
+    try:
+        async with session.get(url, headers=headers) as response:
+            if response.status != 200:
+                logger.warning(f"⚠️ Playlist indisponível ({response.status}): {url}")
+                return None
+            return parse_playlist(await response.text(), url)
+    except (aiohttp.ClientError, asyncio.TimeoutError, PlaylistError) as e:
+        logger.warning(f"⚠️ Falha ao analisar {url}: {e}")
+        return None
+
+
+async def extract_m3u8_url_async(iframe_url, headers=None, max_retries=3, wait_time=2, session=None, quality_policy=None):
+    """Versão assíncrona de extract_m3u8_url.
+
+    O HTML do iframe é lido em blocos; as URLs novas de cada bloco são sondadas em
+    paralelo e a leitura para na primeira playlist mestre utilizável.
+    """
+    all_matches = None
+    for tentativa in range(max_retries + 1):
+        try:
+            async with session.get(iframe_url, headers=headers) as response:
+                if response.status == 200:
+                    all_matches = []
+                    decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+                    scanner = M3U8Scanner()
+                    fim = False
+                    while not fim:
+                        chunk = await response.content.read(SCAN_CHUNK_SIZE)
+                        fim = not chunk
+                        if fim:
+                            novos = scanner.feed(decoder.decode(b"", final=True)) + scanner.close()
+                        else:
+                            novos = scanner.feed(decoder.decode(chunk))
+                        if not novos:
+                            continue
+                        all_matches.extend(novos)
+                        playlists = await asyncio.gather(*(fetch_playlist_async(session, url, headers) for url in novos))
+                        candidatos = [
+                            (url, playlist.best_variant())
+                            for url, playlist in zip(novos, playlists)
+                            if playlist is not None and playlist.is_master
+                        ]
+                        if candidatos:
+                            master_url, best = max(candidatos, key=lambda c: (c[1].height, c[1].bandwidth))
+                            if quality_policy:
+                                logger.info(f"✅ Playlist mestre encontrada (até {best.height}p); a política de qualidade escolhe a rendição")
+                                return master_url
+                            logger.info(f"✅ Qualidade selecionada: {best.height}p")
+                            return best.url
+                    break
+                logger.error(f"❌ Erro ao acessar o iframe: {response.status}")
+        except aiohttp.ClientError as e:
+            logger.error(f"❌ Erro na requisição do iframe: {str(e)}")
+        if tentativa < max_retries:
+            await asyncio.sleep(wait_time * (max_retries - tentativa + 1))
+
+    if all_matches is None:
+        return None
+
+    if not all_matches:
+        logger.warning("⚠️ Nenhuma URL .m3u8 encontrada no iframe.")
+        return None
+
+    logger.warning("⚠️ Nenhuma stream válida encontrada. Usando primeiro .m3u8 como fallback.")
+    return all_matches[0]
+
+
+async def download_video_with_fallback_async(m3u8_url, output_filename, output_dir, headers, max_workers=DEFAULT_MAX_WORKERS, session=None, chunk_size=DEFAULT_CHUNK_SIZE, concat_mode=CONCAT_FILES, defer_concat=False, concurrency_controller=None, segment_retries=DEFAULT_SEGMENT_RETRIES, hedge=False, content_store=None, quality_policy=None):
+    """Versão assíncrona de download_video_with_fallback, com os mesmos modos, checkpoint e content_store.
+
+    `max_workers` limita quantos segmentos ficam em voo ao mesmo tempo; como cada um
+    é só uma corrotina, valores de centenas ou milhares são viáveis no modo `files`.
+    Nos modos `pipe`/`ts` a janela de reordenação (REORDER_MAX_SEGMENTS/BYTES) limita
+    a memória e, com ela, os segmentos em voo. O controle
+    adaptativo (`concurrency_controller`) e as requisições duplicadas (`hedge`)
+    dependem de threads e não são usados aqui; as novas tentativas por segmento sim.
+    """
+    if concat_mode not in CONCAT_MODES:
+        raise ValueError(f"concat_mode inválido: {concat_mode} (use {', '.join(CONCAT_MODES)})")
+
+    output_filename = video_output_filename(output_filename, concat_mode)
+    output_path = os.path.join(output_dir, output_filename)
+    if os.path.exists(output_path):
+        logger.info(f"⏭️ Arquivo já existe: {output_path}")
+        return True
+    stream_key = video_key(m3u8_url, output_filename, quality_policy.signature(output_filename) if quality_policy else None)
+    if content_store and content_store.restore_video(stream_key, output_path):
+        return True
+
+    parts_dir = lesson_parts_dir(output_dir, output_filename)
+    limite = asyncio.Semaphore(max(1, max_workers))
+
+    async def get_segmento(segmento):
+        response = await session.get(segmento.url, headers=segmento.request_headers(SEGMENT_HEADERS))
+        if response.status != 200 and not (response.status == 206 and segmento.byterange):
+            response.release()
+            raise SegmentError(segmento.url, response.status, retry_after_seconds(response))
+        return response
+
+    async def com_retentativas(segmento, tentar):
+        """Executa `tentar()` com até `segment_retries` novas tentativas (backoff com jitter)"""
+        for tentativa in range(segment_retries + 1):
+            try:
+                async with limite:
+                    return await tentar()
+            except SegmentError as e:
+                if e.status not in RETRYABLE_STATUS or tentativa == segment_retries:
+                    logger.error(f"❌ Erro ao baixar segmento {segmento.url}: {e.status}")
+                    raise
+                motivo = f"status {e.status}"
+                atraso = e.retry_after if e.retry_after is not None else backoff_delay(tentativa)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if tentativa == segment_retries:
+                    logger.error(f"❌ Erro ao baixar segmento {segmento.url}: {e}")
+                    raise
+                motivo = type(e).__name__
+                atraso = backoff_delay(tentativa)
+            logger.warning(f"⚠️ Segmento falhou ({motivo}), tentativa {tentativa + 2}/{segment_retries + 1} em {atraso:.1f}s: {segmento.url}")
+            await asyncio.sleep(atraso)
+
+    def arquivar(segmentos):
+        """Guarda o vídeo pronto no content_store; os segmentos dele deixam de ser necessários"""
+        if not content_store:
+            return
+        try:
+            content_store.add_video(stream_key, output_path)
+            content_store.release_segments(segment_key(segmento) for segmento in segmentos)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"⚠️ Não foi possível guardar {output_path} no armazenamento de conteúdo: {e}")
+
+    async def baixar_segmento(segmento, seg_path, manifest):
+        async def tentar():
+            async with await get_segmento(segmento) as seg_r:
+                return await _stream_to_file(seg_r, seg_path, chunk_size)
+        size, sha256 = await com_retentativas(segmento, tentar)
+        manifest.record(os.path.basename(seg_path), size, sha256)
+        if content_store:
+            try:
+                content_store.add_segment(segment_key(segmento), seg_path, size, sha256)
+            except (OSError, sqlite3.Error) as e:
+                logger.debug(f"Segmento não guardado no armazenamento de conteúdo: {e}")
+
+    async def baixar_segmento_em_memoria(segmento):
+        if content_store:
+            guardado = content_store.read_segment(segment_key(segmento))
+            if guardado is not None:
+                return guardado
+
+        async def tentar():
+            async with await get_segmento(segmento) as seg_r:
+                buffer = io.BytesIO()
+                async for chunk in seg_r.content.iter_chunked(chunk_size):
+                    buffer.write(chunk)
+            return buffer.getbuffer()
+        return await com_retentativas(segmento, tentar)
+
+    async def baixar_em_arquivos(m3u8_url_real, segmentos):
+        temp_dir = checkpoint_dir(parts_dir, m3u8_url_real)
+        os.makedirs(temp_dir, exist_ok=True)
+        seg_names = [f"seg_{i:04d}.ts" for i in range(len(segmentos))]
+        manifest = SegmentManifest(os.path.join(temp_dir, MANIFEST_NAME), m3u8_url_real)
+
+        pendentes = [
+            (segmento, seg_name) for segmento, seg_name in zip(segmentos, seg_names)
+            if not manifest.is_complete(seg_name, os.path.join(temp_dir, seg_name))
+        ]
+        if len(pendentes) < len(segmentos):
+            logger.info(f"♻️ Retomando download: {len(segmentos) - len(pendentes)}/{len(segmentos)} segmentos já baixados")
+        if content_store and pendentes:
+            faltando = []
+            for segmento, seg_name in pendentes:
+                guardado = content_store.restore_segment(segment_key(segmento), os.path.join(temp_dir, seg_name))
+                if guardado is None:
+                    faltando.append((segmento, seg_name))
+                else:
+                    manifest.record(seg_name, *guardado)
+            if len(faltando) < len(pendentes):
+                logger.info(f"♻️ {len(pendentes) - len(faltando)} segmentos reaproveitados de outra aula")
+            pendentes = faltando
+
+        if pendentes:
+            logger.info(f"⬇️ Baixando {len(pendentes)} segmentos .ts (até {max_workers} em voo)...")
+            try:
+                await _executar_todas(
+                    baixar_segmento(segmento, os.path.join(temp_dir, seg_name), manifest)
+                    for segmento, seg_name in pendentes
+                )
+            finally:
+                manifest.flush()
+
+        concat = PendingConcat(temp_dir, seg_names, output_path, parts_dir, on_success=lambda: arquivar(segmentos))
+        if defer_concat:
+            return concat
+        return await asyncio.to_thread(concat.run)
+
+    async def transmitir_segmentos(segmentos):
+        output_part = f"{output_path}.part"
+        destino = FfmpegPipeSink(output_part) if concat_mode == CONCAT_PIPE else TsFileSink(output_part)
+        logger.info(f"⬇️ Transmitindo {len(segmentos)} segmentos em ordem (até {min(max_workers, REORDER_MAX_SEGMENTS)} em voo)...")
+
+        # Janela ordenada e limitada, como em escrever_em_ordem
+        restantes = iter(segmentos)
+        proximo = next(restantes, None)
+        pendentes = deque()
+        try:
+            while True:
+                while pendentes and pendentes[0].done():
+                    destino.write(pendentes.popleft().result())
+                while proximo is not None and not janela_cheia(pendentes):
+                    pendentes.append(asyncio.ensure_future(baixar_segmento_em_memoria(proximo)))
+                    proximo = next(restantes, None)
+                if not pendentes:
+                    break
+                await asyncio.wait([task for task in pendentes if not task.done()], return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            for task in pendentes:
+                task.cancel()
+            await asyncio.gather(*pendentes, return_exceptions=True)
+            destino.abort()
+            raise
+
+        if not await asyncio.to_thread(destino.close):
+            return False
+        os.replace(output_part, output_path)
+        logger.info(f"✅ Download e concatenação concluídos: {output_path}")
+        await asyncio.to_thread(arquivar, segmentos)
+        return True
+
+    async def baixar_segmentos(playlist):
+        try:
+            if playlist.is_master:
+                media = None
+                if quality_policy and quality_policy.needs_duration(output_filename):
+                    # A duração vem da playlist de mídia; choose_variant a reaproveita se for a escolhida
+                    maior = quality_policy.allowed(playlist.variants, output_filename)[-1]
+                    media = await fetch_playlist_async(session, maior.url, SEGMENT_HEADERS)
+                variant, media = choose_variant(playlist, quality_policy, output_filename, lambda url: media)
+                logger.info(f"🎯 Playlist mestre: usando a variante {variant.height}p")
+                playlist = media or await fetch_playlist_async(session, variant.url, SEGMENT_HEADERS)
+                if playlist is None:
+                    return False
+
+            if not playlist.segments:
+                return False
+            if playlist.encryption:
+                logger.error(f"❌ Segmentos criptografados ({playlist.encryption}) não são suportados")
+                return False
+
+            if concat_mode == CONCAT_FILES:
+                return await baixar_em_arquivos(playlist.url, playlist.segments)
+            return await transmitir_segmentos(playlist.segments)
+
+        except Exception as e:
+            logger.error(f"❌ Falha no download ou concatenação: {str(e)}")
+            return False
+
+    principal = await fetch_playlist_async(session, m3u8_url, SEGMENT_HEADERS)
+    if principal is not None:
+        resultado = await baixar_segmentos(principal)
+        if resultado:
+            return resultado
+
+    # Fallbacks sondados em paralelo, tentados em ordem de qualidade
+    fallbacks = fallback_playlist_urls(m3u8_url, quality_policy, output_filename)
+    sondadas = await asyncio.gather(*(fetch_playlist_async(session, url, SEGMENT_HEADERS) for _, url in fallbacks))
+    for (quality, fallback_url), playlist in zip(fallbacks, sondadas):
+        if playlist is not None:
+            logger.info(f"⚠️ Tentando fallback: {fallback_url}")
+            resultado = await baixar_segmentos(playlist)
+            if resultado:
+                return resultado
+        logger.warning(f"⚠️ Qualidade {quality} indisponível, tentando próxima...")
+
+    logger.error("❌ Nenhuma qualidade disponível para download.")
+    return False
+
+
+async def process_lesson_async(get_course_page, save_lesson_as_markdown, headers, max_retries, wait_time, output_dir, lesson_url, prefix=None, session=None, lesson_page=None, resolution_cache=None, course_state=None, session_manager=None, **download_options):
+    """Versão assíncrona de process_lesson; `session` é uma aiohttp.ClientSession.
+
+    `lesson_page` permite passar a página da aula se ela já foi baixada.
+    `session_manager` renova o login se a página da aula cair no login.
+    """
+    from downloader.lessons import lesson_output_filename, lesson_video_path, markdown_output_path, cached_lesson, remember_lesson, forget_m3u8_url, iframe_cache_kind
+
+    logger.info(f"\n🔍 Processando aula: {lesson_url}")
+
+    def concluir(success, output_path=None, m3u8_url=None):
+        if course_state:
+            course_state.record(lesson_url, output_dir, success, lesson_title, output_path, m3u8_url)
+        if download_options.get("quality_policy"):
+            download_options["quality_policy"].finish_lesson(output_path if success else None)
+        return success
+
+    lesson_title, iframe_url = cached_lesson(resolution_cache, lesson_url)
+    if not iframe_url:
+        if lesson_page is None:
+            lesson_page = await fetch_page_async(session, lesson_url, headers, get_course_page, session_manager)
+        if not lesson_page:
+            logger.error("❌ Não foi possível obter a página da aula.")
+            return concluir(False)
+        lesson_page = as_document(lesson_page, lesson_url)
+
+        lesson_title = extract_lesson_title(lesson_page, lesson_url)
+        logger.info(f"📌 Título da aula: {lesson_title}")
+
+        # O parse do HTML é CPU; sai do event loop para não atrasar os downloads em voo
+        iframe_url = await asyncio.to_thread(extract_iframe_url, lesson_page)
+        if not iframe_url:
+            logger.warning("⚠️ Aula sem vídeo. Tentando salvar conteúdo como markdown...")
+            markdown_path = await asyncio.to_thread(save_lesson_as_markdown, lesson_title, lesson_page, prefix=prefix)
+            return concluir(bool(markdown_path), markdown_output_path(markdown_path))
+        remember_lesson(resolution_cache, lesson_url, lesson_title, iframe_url)
+
+    quality_policy = download_options.get("quality_policy")
+    cache_kind = iframe_cache_kind(quality_policy)
+    m3u8_url = resolution_cache.get(cache_kind, iframe_url) if resolution_cache else None
+    if m3u8_url:
+        logger.info("⚡ Playlist .m3u8 em cache")
+    else:
+        m3u8_url = await extract_m3u8_url_async(
+            iframe_url,
+            headers=headers,
+            max_retries=max_retries,
+            wait_time=wait_time,
+            session=session,
+            quality_policy=quality_policy,
+        )
+        if not m3u8_url:
+            logger.error("❌ URL do m3u8 não encontrada.")
+            return concluir(False)
+        if resolution_cache:
+            resolution_cache.put(cache_kind, iframe_url, m3u8_url)
+
+    output_filename = lesson_output_filename(lesson_title, prefix)
+    success = bool(await download_video_with_fallback_async(
+        m3u8_url,
+        output_filename,
+        output_dir,
+        headers,
+        session=session,
+        **download_options
+    ))
+    if not success:
+        forget_m3u8_url(resolution_cache, iframe_url, quality_policy)
+    output_path = lesson_video_path(output_dir, output_filename, download_options.get("concat_mode", CONCAT_FILES))
+    return concluir(success, output_path, m3u8_url)
+
+
+async def process_multiple_lessons_async(lesson_urls, get_course_page, save_lesson_as_markdown, headers, max_retries, wait_time, output_dir, session=None, lesson_concurrency=DEFAULT_LESSON_CONCURRENCY, skip=(), session_manager=None, **download_options):
+    """Processa várias aulas, até `lesson_concurrency` ao mesmo tempo.
+
+    O espaçamento entre requisições fica a cargo do limite de taxa por host da
+    sessão. Aulas em `skip` contam como concluídas sem nenhuma requisição.
+    Retorna uma lista de booleanos na ordem de `lesson_urls`.
+    """
+    limite_aulas = asyncio.Semaphore(max(1, lesson_concurrency))
+
+    async def processar(index, lesson_url):
+        if lesson_url in skip:
+            return True
+        async with limite_aulas:
+            try:
+                return await process_lesson_async(
+                    get_course_page=get_course_page,
+                    save_lesson_as_markdown=save_lesson_as_markdown,
+                    headers=headers,
+                    max_retries=max_retries,
+                    wait_time=wait_time,
+                    output_dir=output_dir,
+                    lesson_url=lesson_url,
+                    prefix=f"{index + 1:02d}",
+                    session=session,
+                    session_manager=session_manager,
+                    **download_options
+                )
+            except Exception as e:
+                logger.error(f"❌ Erro ao processar {lesson_url}: {e}")
+                return False
+
+    return await asyncio.gather(*(processar(index, url) for index, url in enumerate(lesson_urls)))
+
+
+def run_lessons_async(lesson_urls, get_course_page, save_lesson_as_markdown, headers, max_retries, wait_time, output_dir, session=None, max_workers=DEFAULT_MAX_WORKERS, **download_options):
+    """Ponto de entrada síncrono: roda process_multiple_lessons_async num event loop próprio.
+
+    `session` aqui é a requests.Session compartilhada, usada para semear headers
+    e cookies da sessão aiohttp; o SessionManager registrado nela renova o login.
+    """
+    async def main():
+        async with create_async_session(max_workers, sync_session=session) as async_session:
+            return await process_multiple_lessons_async(
+                lesson_urls,
+                get_course_page=get_course_page,
+                save_lesson_as_markdown=save_lesson_as_markdown,
+                headers=headers,
+                max_retries=max_retries,
+                wait_time=wait_time,
+                output_dir=output_dir,
+                session=async_session,
+                session_manager=getattr(session, "session_manager", None),
+                max_workers=max_workers,
+                **download_options
+            )
+
+    return asyncio.run(main())
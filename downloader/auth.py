@@ -1,91 +1,304 @@
 # downloader/auth.py
 
-import time
-import pickle
 import os
+import pickle
+import atexit
 import logging
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urljoin
+
+import requests
+
+from downloader.session import DEFAULT_HEADERS, apply_auth_headers
+from downloader.document import HtmlDocument
 
 logger = logging.getLogger(__name__)
 
-def login_and_get_cookies(email, password, save_path=None):
-    """Login to Asimov Academy using Selenium and capture cookies"""
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-notifications")
-    
-    logger.info("🔑 Iniciando processo de login na Asimov Academy...")
-    
+LOGIN_URL = "https://hub.asimov.academy/login"
+# Saved cookies older than this are not trusted without a new login
+SESSION_MAX_AGE = timedelta(days=1)
+# Maximum seconds to wait for the login form and for the redirect after submitting it
+LOGIN_TIMEOUT = 20
+
+# Headless Chrome kept alive between logins; started on the first browser login
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def _cookie_header(cookies):
+    """Format (name, value) pairs as a Cookie header"""
+    return "; ".join(f"{name}={value}" for name, value in cookies)
+
+
+def _login_form_fields(document):
+    """Find the login form and return (action, method, fields, email_name, password_name), or None"""
+    email_input = document.select_one("form input#email, form input[type=email]")
+    password_input = document.select_one("form input#password, form input[type=password]")
+    if email_input is None or password_input is None:
+        return None
+    form = email_input.find_parent("form")
+    if form is None or not email_input.get("name") or not password_input.get("name"):
+        return None
+
+    # Hidden inputs (CSRF tokens, nonces, redirect targets) go back exactly as served
+    fields = {}
+    for field in form.select("input[name]"):
+        field_type = (field.get("type") or "text").lower()
+        if field_type in ("submit", "button", "image", "file"):
+            continue
+        if field_type in ("checkbox", "radio") and not field.has_attr("checked"):
+            continue
+        fields[field["name"]] = field.get("value", "")
+
+    action = urljoin(document.url, form.get("action") or document.url)
+    method = (form.get("method") or "post").lower()
+    return action, method, fields, email_input["name"], password_input["name"]
+
+
+def login_with_http(email, password, login_url=LOGIN_URL, timeout=30):
+    """Login by submitting the login form over plain HTTP, without a browser.
+
+    Returns the Cookie header of the new session; None when this path isn't
+    usable (form rendered by JavaScript, unexpected response), or False when
+    the hub rejected the credentials.
+    """
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
     try:
+        response = session.get(login_url, timeout=timeout)
+        if response.status_code != 200:
+            logger.debug(f"Página de login respondeu {response.status_code}")
+            return None
+        form = _login_form_fields(HtmlDocument(response.text, response.url))
+        if form is None:
+            logger.debug("Formulário de login não encontrado no HTML")
+            return None
+
+        action, method, fields, email_name, password_name = form
+        fields[email_name] = email
+        fields[password_name] = password
+        if method == "get":
+            result = session.get(action, params=fields, timeout=timeout)
+        else:
+            result = session.post(action, data=fields, timeout=timeout, headers={"Referer": response.url})
+    except requests.RequestException as e:
+        logger.warning(f"⚠️ Erro no login via HTTP: {e}")
+        return None
+
+    # Still showing the login form means the credentials were rejected
+    document = HtmlDocument(result.text, result.url)
+    if result.status_code >= 400 or _login_form_fields(document) is not None or not session.cookies:
+        error_msg = document.select_one(".message-container")
+        if error_msg is not None:
+            logger.error(f"❌ Falha no login: {error_msg.get_text(strip=True)}")
+            return False
+        return None
+
+    return _cookie_header((cookie.name, cookie.value) for cookie in session.cookies)
+
+
+def _get_driver():
+    """Return the warm headless Chrome, starting it (and resolving chromedriver) only once"""
+    global _driver
+    if _driver is None:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        options = Options()
+        options.add_argument("--headless")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--window-size=1920,1080")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-notifications")
+
         service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-
-        # Access login page
-        driver.get("https://hub.asimov.academy/login")
-
-        # Wait for page to load
-        wait = WebDriverWait(driver, 10)
-        email_field = wait.until(EC.presence_of_element_located((By.ID, "email")))            
-        # Fill in login form
-        email_field.send_keys(email)
-        password_input = driver.find_element(By.ID, "password")
-        password_input.send_keys(password)
-        password_input.send_keys(Keys.RETURN)
-        
-        # Wait for login to complete and redirect
-        time.sleep(5)
-        
-        # Check if login was successful
-        if "login" in driver.current_url.lower():
-            error_msg = driver.find_elements(By.CLASS_NAME, "message-container")
-            if error_msg:
-                logger.error(f"❌ Falha no login: {error_msg[0].text}")
-                driver.quit()
-                return False
-        
-        # Capture cookies
-        cookies = driver.get_cookies()
-        driver.quit()
-
-        # Format cookies for requests
-        cookies = "; ".join([f"{cookie['name']}={cookie['value']}" for cookie in cookies])
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:112.0) Gecko/20100101 Firefox/112.0",
-            "Referer": "https://hub.asimov.academy/",
-            "Cookie": cookies
-        }
-        
-        # Save session for future use
-        if save_path:
-            try:
-                with open(save_path, 'wb') as f:
-                    pickle.dump({
-                        'cookies': cookies,
-                        'timestamp': datetime.now()
-                    }, f)
-                logger.info("💾 Sessão salva com sucesso!")
-            except Exception as e:
-                logger.warning(f"⚠️ Erro ao salvar sessão: {e}")
-
-        return {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:112.0) Gecko/20100101 Firefox/112.0",
-            "Referer": "https://hub.asimov.academy/",
-            "Cookie": cookies
-        }
-
-        
-        
-    except Exception as e:
-        logger.error(f"❌ Erro durante o processo de login: {str(e)}")
+        _driver = webdriver.Chrome(service=service, options=options)
+        atexit.register(close_driver)
+    return _driver
+
+
+def _quit_driver():
+    global _driver
+    if _driver is not None:
+        try:
+            _driver.quit()
+        except Exception as e:
+            logger.debug(f"Erro ao encerrar o navegador: {e}")
+        _driver = None
+
+
+def close_driver():
+    """Quit the warm Chrome, if one was started"""
+    with _driver_lock:
+        _quit_driver()
+
+
+def login_with_browser(email, password, login_url=LOGIN_URL, timeout=LOGIN_TIMEOUT):
+    """Login through the warm headless Chrome. Returns the Cookie header, or None on failure"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    with _driver_lock:
+        try:
+            driver = _get_driver()
+            # The warm driver may still hold the expired session
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.get(login_url)
+
+            wait = WebDriverWait(driver, timeout)
+            email_field = wait.until(EC.presence_of_element_located((By.ID, "email")))
+            email_field.clear()
+            email_field.send_keys(email)
+            password_input = driver.find_element(By.ID, "password")
+            password_input.clear()
+            password_input.send_keys(password)
+            password_input.send_keys(Keys.RETURN)
+
+            # Wait until the hub leaves the login page or shows an error, instead of a fixed sleep
+            wait.until(lambda d: "login" not in d.current_url.lower() or d.find_elements(By.CLASS_NAME, "message-container"))
+            if "login" in driver.current_url.lower():
+                error_msg = driver.find_elements(By.CLASS_NAME, "message-container")
+                logger.error(f"❌ Falha no login: {error_msg[0].text if error_msg else driver.current_url}")
+                return None
+
+            return _cookie_header((cookie['name'], cookie['value']) for cookie in driver.get_cookies())
+
+        except Exception as e:
+            logger.error(f"❌ Erro durante o login pelo navegador: {str(e)}")
+            # A broken driver is discarded; the next login starts a new one
+            _quit_driver()
+            return None
+
+
+def login_and_get_cookies(email, password, save_path=None, login_url=LOGIN_URL):
+    """Login to Asimov Academy and capture cookies.
+
+    Tries the login form over plain HTTP first; the headless browser is only used
+    when that isn't possible. Returns the request headers with the new cookies, or False.
+    """
+    logger.info("🔑 Iniciando processo de login na Asimov Academy...")
+
+    cookies = login_with_http(email, password, login_url)
+    if cookies:
+        logger.info("✅ Login feito via HTTP, sem navegador.")
+    elif cookies is None:
+        logger.info("🌐 Login via HTTP indisponível, usando o navegador...")
+        cookies = login_with_browser(email, password, login_url)
+    if not cookies:
         return False
+
+    # Save session for future use
+    if save_path:
+        try:
+            save_session(save_path, cookies)
+            logger.info("💾 Sessão salva com sucesso!")
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao salvar sessão: {e}")
+
+    return {**DEFAULT_HEADERS, "Cookie": cookies}
+
+
+def save_session(path, cookies):
+    """Write the session file atomically: readers see the old or the new cookies, never half a file"""
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({
+            'cookies': cookies,
+            'timestamp': datetime.now()
+        }, f)
+    os.replace(tmp_path, path)
+
+
+def load_session(path, max_age=SESSION_MAX_AGE):
+    """Return the saved cookies if the session file exists and is recent enough, else None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            session_data = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"⚠️ Erro ao carregar sessão existente: {e}")
+        return None
+    if datetime.now() - session_data.get('timestamp', datetime.min) >= max_age:
+        return None
+    return session_data.get('cookies')
+
+
+class SessionManager:
+    """Login cookies shared by every worker, with at most one login in flight.
+
+    Workers read `generation` before a request; when they hit the login page they
+    call `refresh(generation)`. The first one logs in while the others wait on the
+    lock and then reuse its result (success or failure) instead of logging in again.
+    The session file is replaced atomically.
+
+    Coroutines of the async engine use `refresh_async`, which runs the same
+    single-flight refresh on a worker thread. The manager is reachable from the
+    shared HTTP session as `http_session.session_manager`.
+    """
+
+    def __init__(self, email, password, session_file, http_session=None, login_url=LOGIN_URL):
+        self.email = email
+        self.password = password
+        self.session_file = session_file
+        self.http_session = http_session
+        self.login_url = login_url
+        self.headers = None
+        # Incremented on every login attempt; tells waiting workers someone already tried
+        self.generation = 0
+        self._last_result = False
+        self._lock = threading.Lock()
+        if http_session is not None:
+            # Lets the async engine, which only receives the HTTP session, renew the login
+            http_session.session_manager = self
+
+    @property
+    def cookies(self):
+        return self.headers["Cookie"] if self.headers else None
+
+    def _apply(self, headers):
+        self.headers = headers or None
+        if self.headers and self.http_session is not None:
+            apply_auth_headers(self.http_session, self.headers)
+
+    def load(self):
+        """Apply the saved cookies if they are recent enough (no network access). Returns True on success"""
+        with self._lock:
+            cookies = load_session(self.session_file)
+            if not cookies:
+                return False
+            self._apply({**DEFAULT_HEADERS, "Cookie": cookies})
+            return True
+
+    def refresh(self, seen_generation=None):
+        """Log in again, unless another worker already did since `seen_generation`.
+
+        Returns the login headers, or False if the login failed.
+        """
+        with self._lock:
+            if seen_generation is not None and seen_generation != self.generation:
+                logger.debug("♻️ Login já renovado por outro worker, reaproveitando")
+                return self._last_result
+            headers = login_and_get_cookies(self.email, self.password, login_url=self.login_url)
+            self.generation += 1
+            self._last_result = headers
+            if headers:
+                self._apply(headers)
+                try:
+                    save_session(self.session_file, self.cookies)
+                    logger.info("✅ Sessão salva para uso futuro.")
+                except Exception as e:
+                    logger.warning(f"⚠️ Erro ao salvar sessão: {e}")
+            return headers
+
+    async def refresh_async(self, seen_generation=None):
+        """`refresh` for coroutines: the login runs on a thread, so the event loop keeps going"""
+        import asyncio
+
+        return await asyncio.to_thread(self.refresh, seen_generation)
@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAME = "resolution_cache.json"
+
+# Por quanto tempo uma resolução vale, em segundos. As URLs .m3u8 do CDN podem
+# carregar tokens assinados, então o cache não deve durar mais que eles.
+DEFAULT_TTL = 6 * 60 * 60
+# Entradas mantidas no arquivo; acima disso saem as usadas há mais tempo
+DEFAULT_MAX_ENTRIES = 2000
+
+# Namespaces: página da aula -> {título, iframe} e iframe -> .m3u8
+LESSON = "aula"
+IFRAME = "iframe"
+# iframe -> playlist mestre, quando uma política de qualidade escolhe a rendição no download
+IFRAME_MASTER = "iframe-mestre"
+
+
+class ResolutionCache:
+    """Cache em disco das resoluções aula -> iframe -> .m3u8.
+
+    Cada entrada tem validade de `ttl` segundos; o arquivo guarda no máximo
+    `max_entries` entradas, descartando as usadas há mais tempo. Com ele,
+    reexecuções e novas tentativas pulam o download e o parse da página e a
+    visita ao iframe.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get("entries", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Cache de resolução inválido, ignorando: {e}")
+
+    @staticmethod
+    def _key(kind, key):
+        return f"{kind}:{key}"
+
+    def get(self, kind, key):
+        """Valor em cache para `key`, ou None se ausente ou vencido"""
+        with self._lock:
+            entry = self.entries.get(self._key(kind, key))
+            if entry is None:
+                return None
+            now = time.time()
+            if now - entry["created"] > self.ttl:
+                del self.entries[self._key(kind, key)]
+                return None
+            entry["used"] = now
+            return entry["value"]
+
+    def put(self, kind, key, value):
+        with self._lock:
+            now = time.time()
+            self.entries[self._key(kind, key)] = {"value": value, "created": now, "used": now}
+            self._evict(now)
+            self._write()
+
+    def discard(self, kind, key):
+        """Remove uma entrada que se mostrou inválida (ex: token do .m3u8 vencido)"""
+        with self._lock:
+            if self.entries.pop(self._key(kind, key), None) is not None:
+                self._write()
+
+    def _evict(self, now):
+        vencidas = [k for k, entry in self.entries.items() if now - entry["created"] > self.ttl]
+        for k in vencidas:
+            del self.entries[k]
+        excesso = len(self.entries) - self.max_entries
+        if excesso > 0:
+            for k in sorted(self.entries, key=lambda k: self.entries[k]["used"])[:excesso]:
+                del self.entries[k]
+
+    def _write(self):
+        # Chamado a cada resolução nova (no máximo uma por aula), então grava direto
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"entries": self.entries}, f)
+        os.replace(tmp_path, self.path)
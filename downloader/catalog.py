@@ -0,0 +1,188 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from urllib.parse import urljoin, urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from downloader.parser import parse_course_page
+from downloader.document import as_document
+
+logger = logging.getLogger("AsimovDownloader")
+
+CATALOG_NAME = "catalog.json"
+
+# Páginas da conta que listam os cursos a que ela tem acesso
+CATALOG_SEEDS = [
+    "https://hub.asimov.academy/dashboard/enrolled-courses/",
+    "https://hub.asimov.academy/dashboard/",
+]
+
+# /curso/<slug>/ é a página de um curso; /curso/atividade/... são as aulas
+COURSE_PATH_RE = re.compile(r"^/curso/(?!atividade/)[^/]+/?$")
+
+# Páginas de curso buscadas ao mesmo tempo; o limite de taxa do hub continua valendo
+DEFAULT_CRAWL_WORKERS = 4
+
+# Links de paginação das listagens do painel (rel="next", "Próxima", números de página)
+PAGINATION_SELECTOR = 'a[rel~="next"], link[rel~="next"], a.next, a.page-numbers, .pagination a[href], .tutor-pagination a[href]'
+# /page/<n>/ no fim do caminho, ou ?paged=<n> / ?page=<n> / ?current_page=<n>
+PAGE_PATH_RE = re.compile(r"/page/\d+/?$")
+PAGE_QUERY_PARAMS = ("paged", "page", "current_page")
+# Teto de páginas por listagem, contra ciclos de paginação
+MAX_LISTING_PAGES = 100
+
+
+def find_course_urls(page, page_url):
+    """URLs de páginas de curso citadas em `page`, na ordem em que aparecem e sem repetição"""
+    host = urlsplit(page_url).netloc
+    course_urls = {}
+    for link in as_document(page, page_url).select('a[href]'):
+        url = urljoin(page_url, link['href']).split('#', 1)[0]
+        parts = urlsplit(url)
+        if parts.netloc == host and COURSE_PATH_RE.match(parts.path):
+            course_urls.setdefault(url, None)
+    return list(course_urls)
+
+
+def listing_root(url):
+    """Endereço da primeira página de uma listagem paginada (sem /page/<n>/ nem ?paged=<n>)"""
+    parts = urlsplit(url)
+    path = PAGE_PATH_RE.sub("/", parts.path)
+    return f"{parts.scheme}://{parts.netloc}{path.rstrip('/')}/"
+
+
+def find_page_urls(page, page_url):
+    """Outras páginas da mesma listagem citadas nos links de paginação de `page`"""
+    root = listing_root(page_url)
+    page_urls = {}
+    for link in as_document(page, page_url).select(PAGINATION_SELECTOR):
+        if not link.get('href'):
+            continue
+        url = urljoin(page_url, link['href']).split('#', 1)[0]
+        query = parse_qs(urlsplit(url).query)
+        paginada = PAGE_PATH_RE.search(urlsplit(url).path) or any(name in query for name in PAGE_QUERY_PARAMS)
+        if listing_root(url) == root and (paginada or 'next' in (link.get('rel') or [])):
+            page_urls.setdefault(url, None)
+    return list(page_urls)
+
+
+class CatalogIndex:
+    """Índice persistente e ordenado dos cursos da conta e de suas aulas.
+
+    Cursos ficam na ordem em que foram descobertos.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # url do curso -> {"title", "lessons", "crawled_at"}; dict preserva a ordem de inserção
+        self.courses = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Catálogo inválido, ignorando: {e}")
+            return
+        for course in data.get("courses", []):
+            self.courses[course["url"]] = course
+
+    def add_course(self, course_url, title, lesson_urls):
+        with self._lock:
+            self.courses[course_url] = {
+                "url": course_url,
+                "title": title,
+                "lessons": list(dict.fromkeys(lesson_urls)),
+                "crawled_at": time.time(),
+            }
+
+    def search(self, term=None):
+        """Cursos cujo título ou URL contém `term` (sem diferenciar maiúsculas), na ordem do índice"""
+        term = (term or "").strip().lower()
+        return [
+            course for course in self.courses.values()
+            if not term or term in course["title"].lower() or term in course["url"].lower()
+        ]
+
+    @property
+    def lesson_count(self):
+        return sum(len(course["lessons"]) for course in self.courses.values())
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"courses": list(self.courses.values())}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+def crawl_catalog(get_course_page, index, seeds=None, max_workers=DEFAULT_CRAWL_WORKERS):
+    """Descobre todos os cursos visíveis para a conta e indexa suas aulas.
+
+    As páginas em `seeds` (painel do aluno), seguidas pela paginação até a
+    última, fornecem as URLs dos cursos; as páginas de curso são então buscadas
+    em paralelo por até `max_workers` threads, sob o limite de taxa da sessão
+    usada por `get_course_page`. O índice é gravado ao final. Retorna o número de cursos indexados nesta rodada.
+    """
+    course_urls = {}
+    for seed in seeds or CATALOG_SEEDS:
+        # Segue a paginação da listagem até acabar; cada página é lida uma vez
+        visitadas = {}
+        fila = [seed]
+        while fila and len(visitadas) < MAX_LISTING_PAGES:
+            page_url = fila.pop(0)
+            if page_url in visitadas:
+                continue
+            visitadas[page_url] = None
+            page = get_course_page(page_url)
+            if not page:
+                logger.warning(f"⚠️ Não foi possível ler {page_url}")
+                continue
+            page = as_document(page, page_url)
+            for url in find_course_urls(page, page_url):
+                course_urls.setdefault(url, None)
+            fila.extend(url for url in find_page_urls(page, page_url) if url not in visitadas)
+        if len(visitadas) > 1:
+            logger.info(f"📄 {seed}: {len(visitadas)} páginas de listagem")
+
+    if not course_urls:
+        logger.warning("⚠️ Nenhum curso encontrado na conta.")
+        return 0
+    logger.info(f"🧭 {len(course_urls)} cursos encontrados, lendo as páginas ({max_workers} em paralelo)...")
+
+    def indexar(course_url):
+        course_page = get_course_page(course_url)
+        if not course_page:
+            logger.warning(f"⚠️ Não foi possível obter a página do curso: {course_url}")
+            return None
+        return parse_course_page(course_page, course_url)
+
+    resultados = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {executor.submit(indexar, url): url for url in course_urls}
+        for future in as_completed(futures):
+            try:
+                resultados[futures[future]] = future.result()
+            except Exception as e:
+                logger.error(f"❌ Erro ao indexar {futures[future]}: {e}")
+
+    # Insere na ordem de descoberta, não na de conclusão
+    indexados = 0
+    for course_url in course_urls:
+        resultado = resultados.get(course_url)
+        if resultado:
+            title, lesson_urls = resultado
+            index.add_course(course_url, title, lesson_urls)
+            indexados += 1
+    index.save()
+
+    logger.info(f"📚 Catálogo atualizado: {indexados} cursos, {index.lesson_count} aulas")
+    return indexados
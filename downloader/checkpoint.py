@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+# Intervalo mínimo entre gravações do manifesto durante o download
+FLUSH_INTERVAL = 1.0
+
+
+def playlist_key(playlist_url):
+    """Identidade estável da playlist: host + caminho, sem tokens na query string"""
+    parts = urlsplit(playlist_url)
+    return f"{parts.netloc}{parts.path}"
+
+
+def checkpoint_dir(parts_dir, playlist_url):
+    """Subdiretório de segmentos de uma playlist dentro do diretório da aula"""
+    digest = hashlib.sha1(playlist_key(playlist_url).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(parts_dir, digest)
+
+
+class SegmentManifest:
+    """Checkpoint dos segmentos já baixados de uma aula.
+
+    O manifesto fica dentro do diretório de segmentos e registra, para cada
+    segmento concluído, seu tamanho e hash SHA-256. Ele é associado à playlist
+    (sem query string, já que tokens assinados mudam a cada execução); se a
+    playlist for outra, o checkpoint é descartado.
+    """
+
+    def __init__(self, path, playlist_url):
+        self.path = path
+        self.playlist_key = playlist_key(playlist_url)
+        self.segments = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = 0.0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Manifesto de checkpoint inválido, ignorando: {e}")
+            return
+
+        if data.get("playlist") != self.playlist_key:
+            logger.info("ℹ️ Checkpoint pertence a outra playlist, recomeçando do zero.")
+            return
+        self.segments = data.get("segments", {})
+
+    def is_complete(self, name, seg_path):
+        """Confere se o segmento foi registrado e o arquivo em disco tem o tamanho esperado"""
+        entry = self.segments.get(name)
+        if not entry:
+            return False
+        try:
+            return os.path.getsize(seg_path) == entry["size"]
+        except OSError:
+            return False
+
+    def record(self, name, size, sha256):
+        """Registra um segmento concluído, gravando o manifesto no máximo a cada FLUSH_INTERVAL"""
+        with self._lock:
+            self.segments[name] = {"size": size, "sha256": sha256}
+            self._dirty = True
+            if time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+                self._write()
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._write()
+
+    def _write(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"playlist": self.playlist_key, "segments": self.segments}, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        self._last_flush = time.monotonic()
@@ -0,0 +1,62 @@
+import logging
+import importlib.util
+
+logger = logging.getLogger(__name__)
+
+# lxml é bem mais rápido que o parser puro Python; sem ele, cai para html.parser.
+# find_spec só verifica se está instalado: bs4/lxml são importados no primeiro parse
+DEFAULT_PARSER = "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+
+
+class HtmlDocument:
+    """Página HTML analisada uma única vez e compartilhada por quem precisa dela.
+
+    O parse é feito na primeira consulta (não no download), com o parser
+    `parser` (lxml quando instalado). Resultados de `select`/`select_one` ficam
+    em cache por seletor, então consultas repetidas não percorrem a árvore de novo.
+    """
+
+    def __init__(self, html, url=None, parser=None):
+        self.html = html
+        self.url = url
+        self.parser = parser or DEFAULT_PARSER
+        self._soup = None
+        self._selects = {}
+
+    @property
+    def soup(self):
+        if self._soup is None:
+            from bs4 import BeautifulSoup
+
+            self._soup = BeautifulSoup(self.html, self.parser)
+        return self._soup
+
+    def select(self, selector):
+        resultado = self._selects.get(selector)
+        if resultado is None:
+            resultado = self._selects[selector] = self.soup.select(selector)
+        return resultado
+
+    def select_one(self, selector):
+        resultado = self.select(selector)
+        return resultado[0] if resultado else None
+
+    @staticmethod
+    def matches(element, selector):
+        """Testa um elemento contra um seletor sem percorrer a árvore (soupsieve guarda o seletor compilado)"""
+        import soupsieve
+
+        return soupsieve.match(selector, element)
+
+    def __str__(self):
+        return self.html
+
+    def __bool__(self):
+        return bool(self.html)
+
+
+def as_document(page, url=None):
+    """Aceita texto ou HtmlDocument e devolve sempre um HtmlDocument"""
+    if isinstance(page, HtmlDocument):
+        return page
+    return HtmlDocument(page, url)
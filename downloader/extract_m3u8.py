@@ -1,76 +1,157 @@
 import time
 import re
+import codecs
 import requests
 import logging
-from urllib.parse import urljoin
+
+from downloader.session import get_session
+from downloader.hls import probe_playlists
+from downloader.metrics import RETRIES, record_sleep
 
 logger = logging.getLogger(__name__)
 
-def extract_m3u8_url(iframe_url, headers=None, max_retries=3, wait_time=2):
-    """Extrai a melhor URL .m3u8 apontando diretamente para a stream de maior qualidade"""
+M3U8_PATTERNS = [
+    r'https://[^"\']+\.m3u8',
+    r'"playbackUrl":\s*"([^"]+\.m3u8[^"]*)"',
+    r'src="([^"]+\.m3u8[^"]*)"',
+    r"src='([^']+\.m3u8[^']*)'",
+]
+
+
+# Todos os padrões numa única expressão: o texto é percorrido uma vez só
+M3U8_RE = re.compile("|".join(f"(?:{pattern})" for pattern in M3U8_PATTERNS))
+
+# Bloco lido por vez da resposta do iframe
+SCAN_CHUNK_SIZE = 16 * 1024
+# Um match perto do fim do texto lido pode estar cortado; esta margem é
+# reexaminada quando chega o próximo bloco
+SCAN_OVERLAP = 2048
+
+
+def _match_url(match):
+    # Os padrões com grupo capturam só a URL; o primeiro casa a URL inteira
+    url = next((group for group in match.groups() if group), match.group(0))
+    return url.replace('\\/', '/')
+
+
+class M3U8Scanner:
+    """Procura URLs .m3u8 num HTML que chega aos pedaços.
+
+    `feed(texto)` devolve só as URLs novas encontradas até ali; matches a menos
+    de SCAN_OVERLAP caracteres do fim ficam para o próximo `feed` (ou `close`),
+    já que podem estar incompletos.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.found = {}
+
+    def _scan(self, final):
+        novos = []
+        fim = 0
+        # Um match perto do fim ainda pode crescer (ou perder para um padrão mais
+        # longo) quando chegar mais texto; só é aceito com SCAN_OVERLAP de folga
+        limite = len(self.buffer) if final else len(self.buffer) - SCAN_OVERLAP
+        corte = limite
+        for match in M3U8_RE.finditer(self.buffer):
+            if match.end() > limite:
+                corte = min(corte, match.start())
+                break
+            fim = match.end()
+            url = _match_url(match)
+            if url not in self.found:
+                self.found[url] = None
+                novos.append(url)
+                logger.info(f"🎬 URL de vídeo encontrada: {url}")
+        # O que vem antes do corte já foi examinado; ele recua até o início de uma
+        # tag para não separar `src="` da URL
+        corte = max(fim, corte)
+        tag = self.buffer.rfind('<', fim, corte + 1)
+        self.buffer = self.buffer[tag if tag != -1 else corte:]
+        return novos
+
+    def feed(self, text):
+        self.buffer += text
+        return self._scan(final=False)
+
+    def close(self):
+        return self._scan(final=True)
+
+
+def scan_m3u8_candidates(response, chunk_size=SCAN_CHUNK_SIZE):
+    """Lê a resposta do iframe (`stream=True`) aos poucos, gerando as URLs novas de cada bloco.
+
+    Quem consome pode parar a qualquer momento; o resto do corpo não é baixado.
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    scanner = M3U8Scanner()
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        novos = scanner.feed(decoder.decode(chunk))
+        if novos:
+            yield novos
+    novos = scanner.feed(decoder.decode(b"", final=True)) + scanner.close()
+    if novos:
+        yield novos
+
+
+def best_stream(session, master_urls, headers=None):
+    """Sonda as playlists mestre em paralelo; devolve (url da mestre, melhor variante) entre todas, ou None"""
+    candidatos = [
+        (url, playlist.best_variant())
+        for url, playlist in probe_playlists(session, master_urls, headers)
+        if playlist is not None and playlist.is_master
+    ]
+    if not candidatos:
+        return None
+    return max(candidatos, key=lambda c: (c[1].height, c[1].bandwidth))
+
+
+def extract_m3u8_url(iframe_url, headers=None, max_retries=3, wait_time=2, session=None, quality_policy=None):
+    """Extrai a melhor URL .m3u8 apontando diretamente para a stream de maior qualidade
+
+    Com `quality_policy`, devolve a playlist mestre: a rendição é escolhida no
+    download, quando a duração do vídeo e o orçamento são conhecidos.
+    """
     logger.debug("🧪 Usando versão modular de extract_m3u8_url()")
+    session = session or get_session()
     try:
-        response = requests.get(iframe_url, headers=headers, timeout=30)
+        # stream=True: o HTML é lido aos poucos e a leitura para assim que houver uma playlist utilizável
+        with session.get(iframe_url, headers=headers, timeout=30, stream=True) as response:
+            if response.status_code == 200:
+                # Leitura e sondagem intercaladas: cada bloco com URLs novas é sondado antes de ler o próximo
+                all_matches = []
+                for novos in scan_m3u8_candidates(response):
+                    all_matches.extend(novos)
+                    melhor = best_stream(session, novos, headers)
+                    if melhor:
+                        master_url, best = melhor
+                        if quality_policy:
+                            logger.info(f"✅ Playlist mestre encontrada (até {best.height}p); a política de qualidade escolhe a rendição")
+                            return master_url
+                        logger.info(f"✅ Qualidade selecionada: {best.height}p")
+                        return best.url
 
         if response.status_code != 200:
             logger.error(f"❌ Erro ao acessar o iframe: {response.status_code}")
             if max_retries > 0:
+                RETRIES.inc(stage="m3u8", reason=response.status_code)
+                record_sleep("backoff", wait_time * (max_retries + 1))
                 time.sleep(wait_time * (max_retries + 1))
-                return extract_m3u8_url(iframe_url, headers, max_retries - 1, wait_time)
+                return extract_m3u8_url(iframe_url, headers, max_retries - 1, wait_time, session, quality_policy)
             return None
 
-        # Etapa 1: Encontrar a URL do .m3u8 mestre
-        m3u8_patterns = [
-            r'https://[^"\']+\.m3u8',
-            r'"playbackUrl":\s*"([^"]+\.m3u8[^"]*)"',
-            r'src="([^"]+\.m3u8[^"]*)"',
-            r"src='([^']+\.m3u8[^']*)'",
-        ]
-
-        all_matches = set()
-        for pattern in m3u8_patterns:
-            matches = re.findall(pattern, response.text)
-            for url in matches:
-                cleaned = url.replace('\\/', '/')
-                all_matches.add(cleaned)
-                logger.info(f"🎬 URL de vídeo encontrada com padrão: {pattern[:20]}...")
-
         if not all_matches:
             logger.warning("⚠️ Nenhuma URL .m3u8 encontrada no iframe.")
             return None
 
-        # Etapa 2: Selecionar o .m3u8 com melhor qualidade de stream real
-        best_stream = None
-        best_quality = 0
-
-        for master_url in all_matches:
-            try:
-                m3u8_resp = requests.get(master_url, headers=headers, timeout=15)
-                base_url = master_url.rsplit("/", 1)[0] + "/"
-
-                for line in m3u8_resp.text.splitlines():
-                    match = re.search(r'RESOLUTION=\d+x(\d+)', line)
-                    if match:
-                        height = int(match.group(1))
-                        if height > best_quality:
-                            best_quality = height
-                    elif best_quality and line.endswith('.m3u8'):
-                        # Linha da URL do vídeo (relativa)
-                        best_stream = urljoin(base_url, line)
-
-                if best_stream:
-                    logger.info(f"✅ Qualidade selecionada: {best_quality}p")
-                    return best_stream
-
-            except Exception as e:
-                logger.warning(f"⚠️ Falha ao analisar {master_url}: {e}")
-
         logger.warning("⚠️ Nenhuma stream válida encontrada. Usando primeiro .m3u8 como fallback.")
-        return list(all_matches)[0]
+        return all_matches[0]
 
     except requests.RequestException as e:
         logger.error(f"❌ Erro na requisição do iframe: {str(e)}")
         if max_retries > 0:
+            RETRIES.inc(stage="m3u8", reason=type(e).__name__)
+            record_sleep("backoff", wait_time * (max_retries + 1))
             time.sleep(wait_time * (max_retries + 1))
-            return extract_m3u8_url(iframe_url, headers, max_retries - 1, wait_time)
+            return extract_m3u8_url(iframe_url, headers, max_retries - 1, wait_time, session, quality_policy)
         return None
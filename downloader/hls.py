@@ -0,0 +1,218 @@
+import re
+import logging
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+
+from downloader.metrics import track_stage
+
+logger = logging.getLogger(__name__)
+
+# Quantas playlists são sondadas ao mesmo tempo
+DEFAULT_PROBE_WORKERS = 4
+
+# ATRIBUTO=valor ou ATRIBUTO="valor, com vírgulas"
+_ATTRIBUTE_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+class PlaylistError(ValueError):
+    """O texto recebido não é uma playlist HLS válida"""
+
+
+def parse_attributes(text):
+    """Converte a lista de atributos de uma tag (`BANDWIDTH=1,CODECS="a,b"`) em dict"""
+    return {
+        name: value[1:-1] if value.startswith('"') else value
+        for name, value in _ATTRIBUTE_RE.findall(text)
+    }
+
+
+class Variant:
+    """Uma rendição listada em uma playlist mestre (#EXT-X-STREAM-INF)"""
+
+    def __init__(self, url, bandwidth=0, resolution=None, codecs=None):
+        self.url = url
+        self.bandwidth = bandwidth
+        self.resolution = resolution
+        self.codecs = codecs
+
+    @property
+    def height(self):
+        return self.resolution[1] if self.resolution else 0
+
+    def __repr__(self):
+        return f"Variant({self.height}p, {self.bandwidth} bps, {self.url})"
+
+
+class Segment:
+    """Um segmento de uma playlist de mídia, com duração e intervalo de bytes opcional"""
+
+    def __init__(self, url, duration=0.0, sequence=0, byterange=None, discontinuity=False):
+        self.url = url
+        self.duration = duration
+        self.sequence = sequence
+        # (tamanho, deslocamento) quando o segmento é um trecho de um arquivo maior
+        self.byterange = byterange
+        # Timestamps/codec recomeçam neste segmento (#EXT-X-DISCONTINUITY)
+        self.discontinuity = discontinuity
+
+    def request_headers(self, headers=None):
+        """Headers da requisição do segmento, com Range quando há EXT-X-BYTERANGE"""
+        headers = dict(headers or {})
+        if self.byterange:
+            length, offset = self.byterange
+            headers["Range"] = f"bytes={offset}-{offset + length - 1}"
+        return headers
+
+    def __repr__(self):
+        return f"Segment({self.sequence}, {self.duration}s, {self.url})"
+
+
+class Playlist:
+    """Playlist HLS já interpretada: mestre (`variants`) ou de mídia (`segments`)"""
+
+    def __init__(self, url):
+        self.url = url
+        self.variants = []
+        self.segments = []
+        self.target_duration = None
+        self.media_sequence = 0
+        self.endlist = False
+        # Método de #EXT-X-KEY (AES-128, SAMPLE-AES...) se os segmentos forem criptografados
+        self.encryption = None
+
+    @property
+    def is_master(self):
+        return bool(self.variants)
+
+    @property
+    def duration(self):
+        return sum(segment.duration for segment in self.segments)
+
+    def best_variant(self):
+        """Rendição de maior resolução; BANDWIDTH desempata (e decide quando não há RESOLUTION)"""
+        if not self.variants:
+            return None
+        return max(self.variants, key=lambda v: (v.height, v.bandwidth))
+
+
+def parse_playlist(text, url):
+    """Interpreta o texto de uma playlist .m3u8; URIs relativas são resolvidas contra `url`
+
+    Levanta PlaylistError se o texto não começar com #EXTM3U (ex: uma página de
+    erro servida com status 200) ou se uma tag numérica estiver malformada.
+    """
+    lines = [line.strip() for line in text.lstrip("\ufeff").splitlines()]
+    lines = [line for line in lines if line]
+    if not lines or lines[0] != "#EXTM3U":
+        raise PlaylistError(f"Resposta não é uma playlist HLS: {url}")
+    try:
+        return _parse_lines(lines[1:], url)
+    except ValueError as e:
+        raise PlaylistError(f"Playlist malformada ({e}): {url}") from e
+
+
+def _parse_lines(lines, url):
+    playlist = Playlist(url)
+    pending_variant = None
+    duration = 0.0
+    byterange = None
+    discontinuity = False
+    # Para EXT-X-BYTERANGE sem @deslocamento: continua de onde o trecho anterior do mesmo arquivo parou
+    next_offset = {}
+
+    for line in lines:
+        if line.startswith("#"):
+            tag, _, value = line.partition(":")
+            if tag == "#EXT-X-STREAM-INF":
+                attrs = parse_attributes(value)
+                resolution = None
+                match = re.match(r"(\d+)x(\d+)", attrs.get("RESOLUTION", ""))
+                if match:
+                    resolution = (int(match.group(1)), int(match.group(2)))
+                pending_variant = Variant(
+                    None,
+                    bandwidth=int(attrs.get("BANDWIDTH", 0) or 0),
+                    resolution=resolution,
+                    codecs=attrs.get("CODECS"),
+                )
+            elif tag == "#EXTINF":
+                try:
+                    duration = float(value.split(",", 1)[0])
+                except ValueError:
+                    duration = 0.0
+            elif tag == "#EXT-X-BYTERANGE":
+                length, _, offset = value.partition("@")
+                byterange = (int(length), int(offset) if offset else None)
+            elif tag == "#EXT-X-DISCONTINUITY":
+                discontinuity = True
+            elif tag == "#EXT-X-TARGETDURATION":
+                playlist.target_duration = float(value)
+            elif tag == "#EXT-X-MEDIA-SEQUENCE":
+                playlist.media_sequence = int(value)
+            elif tag == "#EXT-X-ENDLIST":
+                playlist.endlist = True
+            elif tag == "#EXT-X-KEY":
+                method = parse_attributes(value).get("METHOD", "NONE")
+                playlist.encryption = None if method == "NONE" else method
+            continue
+
+        uri = urljoin(url, line)
+        if pending_variant is not None:
+            pending_variant.url = uri
+            playlist.variants.append(pending_variant)
+            pending_variant = None
+            continue
+
+        if byterange is not None:
+            length, offset = byterange
+            if offset is None:
+                offset = next_offset.get(uri, 0)
+            next_offset[uri] = offset + length
+            byterange = (length, offset)
+        playlist.segments.append(Segment(
+            uri,
+            duration=duration,
+            sequence=playlist.media_sequence + len(playlist.segments),
+            byterange=byterange,
+            discontinuity=discontinuity,
+        ))
+        duration = 0.0
+        byterange = None
+        discontinuity = False
+
+    return playlist
+
+
+def fetch_playlist(session, url, headers=None, timeout=15):
+    """Baixa e interpreta uma playlist; retorna None se a resposta não for 200 ou não for uma playlist"""
+    with track_stage("playlist", url=url):
+        response = session.get(url, headers=headers, timeout=timeout)
+    if response.status_code != 200:
+        logger.warning(f"⚠️ Playlist indisponível ({response.status_code}): {url}")
+        return None
+    try:
+        return parse_playlist(response.text, url)
+    except PlaylistError as e:
+        logger.warning(f"⚠️ {e}")
+        return None
+
+
+def probe_playlists(session, urls, headers=None, max_workers=DEFAULT_PROBE_WORKERS, timeout=15):
+    """Baixa várias playlists em paralelo.
+
+    Retorna `[(url, Playlist ou None)]` na mesma ordem de `urls`; falhas de rede
+    viram None em vez de interromper as demais sondagens.
+    """
+    urls = list(urls)
+    if not urls:
+        return []
+
+    def sondar(url):
+        try:
+            return fetch_playlist(session, url, headers, timeout)
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao analisar {url}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as executor:
+        return list(zip(urls, executor.map(sondar, urls)))
@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "index.json"
+
+# Páginas mantidas em disco; acima disso saem as usadas há mais tempo
+DEFAULT_MAX_PAGES = 1000
+
+
+class PageCache:
+    """Cache HTTP condicional das páginas do hub (ETag / Last-Modified).
+
+    Guarda o corpo de cada página junto com os validadores da resposta. Na
+    próxima visita, `conditional_headers` produz If-None-Match/If-Modified-Since;
+    se o servidor responder 304, o corpo salvo é servido com `load`.
+    """
+
+    def __init__(self, directory, max_pages=DEFAULT_MAX_PAGES):
+        self.directory = directory
+        self.max_pages = max(1, max_pages)
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Índice do cache de páginas inválido, ignorando: {e}")
+
+    def _body_path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html")
+
+    def conditional_headers(self, url):
+        """Headers de validação para `url`, vazios se a página não está em cache"""
+        with self._lock:
+            entry = self.entries.get(url)
+        if not entry or not os.path.exists(self._body_path(url)):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def load(self, url):
+        """Corpo salvo de `url` (após um 304), ou None se não estiver mais em disco"""
+        try:
+            with open(self._body_path(url), 'r', encoding='utf-8') as f:
+                body = f.read()
+        except OSError:
+            self.discard(url)
+            return None
+        with self._lock:
+            if url in self.entries:
+                self.entries[url]["used"] = time.time()
+        return body
+
+    def store(self, url, response):
+        """Guarda uma resposta 200; sem ETag nem Last-Modified não há como revalidar, então ignora"""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        body_path = self._body_path(url)
+        tmp_path = f"{body_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        os.replace(tmp_path, body_path)
+
+        with self._lock:
+            self.entries[url] = {"etag": etag, "last_modified": last_modified, "used": time.time()}
+            self._evict()
+            self._write()
+
+    def discard(self, url):
+        with self._lock:
+            if self.entries.pop(url, None) is not None:
+                self._write()
+        if os.path.exists(self._body_path(url)):
+            os.remove(self._body_path(url))
+
+    def _evict(self):
+        excesso = len(self.entries) - self.max_pages
+        if excesso <= 0:
+            return
+        for url in sorted(self.entries, key=lambda u: self.entries[u]["used"])[:excesso]:
+            del self.entries[url]
+            if os.path.exists(self._body_path(url)):
+                os.remove(self._body_path(url))
+
+    def _write(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.index_path)
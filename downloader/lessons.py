@@ -1,70 +1,320 @@
 import os
 import time
 import logging
-import requests
-from bs4 import BeautifulSoup
-from markdownify import markdownify as md
 
-from downloader.utils import sanitize_filename
-from downloader.parser import extract_iframe_url, extract_lesson_title
+from downloader.parser import extract_iframe_url, extract_lesson_title, parse_course_page
+from downloader.document import HtmlDocument
 from downloader.extract_m3u8 import extract_m3u8_url
-from downloader.video_downloader import download_video_with_fallback, download_m3u8_segments
-from downloader.auth import login_and_get_cookies
+from downloader.video_downloader import (
+    download_video_with_fallback,
+    download_m3u8_segments,
+    video_output_filename,
+    PendingConcat,
+    CONCAT_FILES,
+)
+from downloader.pipeline import Stage, run_pipeline
+from downloader.cache import LESSON, IFRAME, IFRAME_MASTER
+from downloader.metrics import STAGE_SECONDS, IN_FLIGHT, track_stage
+from downloader.tracing import TRACER
 
 logger = logging.getLogger("AsimovDownloader")
 
 
-def process_lesson(get_course_page, save_lesson_as_markdown, headers, max_retries, wait_time, output_dir, lesson_url, prefix=None):
-    """Processa uma aula individual"""
-    logger.info(f"\n🔍 Processando aula: {lesson_url}")
-    
+class LessonJob:
+    """Estado de uma aula enquanto atravessa o pipeline de process_multiple_lessons"""
+
+    def __init__(self, index, lesson_url):
+        self.index = index
+        self.lesson_url = lesson_url
+        # Prefixo pela posição no curso, independente de aulas anteriores falharem
+        self.prefix = f"{index + 1:02d}"
+        self.lesson_page = None
+        self.lesson_title = None
+        self.iframe_url = None
+        self.m3u8_url = None
+        self.output_path = None
+        self.concat = None
+        self.success = False
+        # Já concluída numa sincronização anterior (ver CourseState)
+        self.skipped = False
+        # Entrada no pipeline, para a métrica de duração da aula inteira
+        self.started_at = None
+
+
+def fetch_lesson_page(get_course_page, lesson_url):
+    """Baixa a página da aula e extrai o título; retorna (None, None) em caso de falha
+
+    A página volta como HtmlDocument: iframe e markdown usam o mesmo parse.
+    """
     lesson_page = get_course_page(lesson_url)
     if not lesson_page:
         logger.error("❌ Não foi possível obter a página da aula.")
-        return False
-    
+        return None, None
+    lesson_page = HtmlDocument(lesson_page, lesson_url)
+
     lesson_title = extract_lesson_title(lesson_page, lesson_url)
     logger.info(f"📌 Título da aula: {lesson_title}")
-    
-    iframe_url = extract_iframe_url(lesson_page)
+    return lesson_page, lesson_title
+
+
+def cached_lesson(resolution_cache, lesson_url):
+    """(título, iframe_url) de uma aula com vídeo já resolvida antes, ou (None, None)"""
+    entry = resolution_cache.get(LESSON, lesson_url) if resolution_cache else None
+    if not entry:
+        return None, None
+    logger.info(f"⚡ Aula em cache: {entry['title']}")
+    return entry["title"], entry["iframe_url"]
+
+
+def remember_lesson(resolution_cache, lesson_url, lesson_title, iframe_url):
+    if resolution_cache:
+        resolution_cache.put(LESSON, lesson_url, {"title": lesson_title, "iframe_url": iframe_url})
+
+
+def iframe_cache_kind(quality_policy=None):
+    """Namespace do cache iframe -> playlist: com política de qualidade o valor é a playlist mestre"""
+    return IFRAME_MASTER if quality_policy else IFRAME
+
+
+def resolve_m3u8_url(iframe_url, headers, max_retries, wait_time, session=None, resolution_cache=None, quality_policy=None):
+    """extract_m3u8_url com cache: um iframe resolvido há pouco não é visitado de novo"""
+    m3u8_url = resolution_cache.get(iframe_cache_kind(quality_policy), iframe_url) if resolution_cache else None
+    if m3u8_url:
+        logger.info("⚡ Playlist .m3u8 em cache")
+        return m3u8_url
+
+    with track_stage("m3u8", url=iframe_url):
+        m3u8_url = extract_m3u8_url(
+            iframe_url,
+            headers=headers,
+            max_retries=max_retries,
+            wait_time=wait_time,
+            session=session,
+            quality_policy=quality_policy,
+        )
+    if m3u8_url and resolution_cache:
+        resolution_cache.put(iframe_cache_kind(quality_policy), iframe_url, m3u8_url)
+    return m3u8_url
+
+
+def forget_m3u8_url(resolution_cache, iframe_url, quality_policy=None):
+    """Descarta a playlist em cache de um download que falhou (o token pode ter vencido)"""
+    if resolution_cache:
+        resolution_cache.discard(iframe_cache_kind(quality_policy), iframe_url)
+
+
+def lesson_output_filename(lesson_title, prefix=None):
+    # Prefixo numérico, se fornecido
+    if prefix is not None:
+        return f"{prefix}.{lesson_title}.mp4"
+    return f"{lesson_title}.mp4"
+
+
+def lesson_video_path(output_dir, output_filename, concat_mode=CONCAT_FILES):
+    """Caminho final do vídeo de uma aula, como download_video_with_fallback o grava"""
+    return os.path.join(output_dir, video_output_filename(output_filename, concat_mode))
+
+
+def markdown_output_path(result):
+    """Caminho do .md quando save_lesson_as_markdown o informa (um retorno True não diz onde gravou)"""
+    return result if isinstance(result, str) else None
+
+
+def download_lesson_video(m3u8_url, output_filename, output_dir, headers, session=None, **download_options):
+    """Baixa o vídeo da aula, caindo para o método manual se o principal falhar"""
+    with track_stage("download"):
+        success = download_video_with_fallback(
+            m3u8_url,
+            output_filename,
+            output_dir,
+            headers=headers,
+            session=session,
+            **download_options
+        )
+
+        if not success:
+            logger.info("⚠️ Tentando método alternativo de download (manual)")
+            return download_m3u8_segments(
+                m3u8_url=m3u8_url,
+                output_path=os.path.join(output_dir, output_filename),
+                headers=headers,
+                session=session
+            )
+
+        return success
+
+
+def process_lesson(get_course_page, save_lesson_as_markdown, headers, max_retries, wait_time, output_dir, lesson_url, prefix=None, session=None, resolution_cache=None, course_state=None, **download_options):
+    """Processa uma aula individual
+
+    `session` é a sessão HTTP compartilhada (ver downloader.session). Com
+    `resolution_cache` (um ResolutionCache), aulas já resolvidas pulam a página e o
+    iframe; com `course_state` (um CourseState), o resultado fica registrado para a
+    próxima sincronização. Opções extras (ex: `max_workers`) são repassadas para
+    `download_video_with_fallback`.
+    """
+    logger.info(f"\n🔍 Processando aula: {lesson_url}")
+    inicio = time.monotonic()
+    TRACER.begin("aula", lesson_url, url=lesson_url)
+
+    def concluir(success, output_path=None, m3u8_url=None):
+        STAGE_SECONDS.observe(time.monotonic() - inicio, stage="lesson")
+        TRACER.end("aula", lesson_url, success=bool(success))
+        if course_state:
+            course_state.record(lesson_url, output_dir, success, lesson_title, output_path, m3u8_url)
+        if download_options.get("quality_policy"):
+            download_options["quality_policy"].finish_lesson(output_path if success else None)
+        return success
+
+    lesson_title, iframe_url = cached_lesson(resolution_cache, lesson_url)
     if not iframe_url:
-        logger.warning("⚠️ Aula sem vídeo. Tentando salvar conteúdo como markdown...")
-        return save_lesson_as_markdown(lesson_title, lesson_page)
+        lesson_page, lesson_title = fetch_lesson_page(get_course_page, lesson_url)
+        if not lesson_page:
+            return concluir(False)
 
+        with track_stage("iframe"):
+            iframe_url = extract_iframe_url(lesson_page)
+        if not iframe_url:
+            logger.warning("⚠️ Aula sem vídeo. Tentando salvar conteúdo como markdown...")
+            markdown_path = save_lesson_as_markdown(lesson_title, lesson_page, prefix=prefix)
+            return concluir(bool(markdown_path), markdown_output_path(markdown_path))
+        remember_lesson(resolution_cache, lesson_url, lesson_title, iframe_url)
 
-    m3u8_url = extract_m3u8_url(
-        iframe_url,
-        headers=headers,
-        max_retries=max_retries,
-        wait_time=wait_time
-    )
+    quality_policy = download_options.get("quality_policy")
+    m3u8_url = resolve_m3u8_url(iframe_url, headers, max_retries, wait_time, session, resolution_cache, quality_policy)
 
     if not m3u8_url:
         logger.error("❌ URL do m3u8 não encontrada.")
-        return False
+        return concluir(False)
 
-    # Prefixo numérico, se fornecido
-    if prefix is not None:
-        output_filename = f"{prefix}.{lesson_title}.mp4"
-    else:
-        output_filename = f"{lesson_title}.mp4"
-    
-    success = download_video_with_fallback(
+    output_filename = lesson_output_filename(lesson_title, prefix)
+    success = bool(download_lesson_video(
         m3u8_url,
         output_filename,
         output_dir,
-        headers=headers
-    )
-
+        headers,
+        session=session,
+        **download_options
+    ))
     if not success:
-        logger.info("⚠️ Tentando método alternativo de download (manual)")
-        return download_m3u8_segments(
-            m3u8_url=m3u8_url,
-            output_path=os.path.join(output_dir, output_filename),
-            headers=headers
+        forget_m3u8_url(resolution_cache, iframe_url, quality_policy)
+    output_path = lesson_video_path(output_dir, output_filename, download_options.get("concat_mode", CONCAT_FILES))
+    return concluir(success, output_path, m3u8_url)
+
+
+def run_lesson_pipeline(
+    lesson_urls,
+    get_course_page,
+    save_lesson_as_markdown,
+    headers,
+    max_retries,
+    wait_time,
+    output_dir,
+    session=None,
+    resolution_cache=None,
+    course_state=None,
+    skip=(),
+    **download_options
+):
+    """Processa as aulas em quatro etapas sobrepostas, cada uma com sua fila limitada:
+
+    página da aula -> iframe/m3u8 -> download dos segmentos -> mux (ffmpeg)
+
+    Enquanto a aula N baixa, a aula N+1 já está sendo resolvida e a N-1 concatenada.
+    Aulas em `skip` não entram no pipeline. Retorna a lista de LessonJob na ordem do curso.
+    """
+    jobs = [LessonJob(index, lesson_url) for index, lesson_url in enumerate(lesson_urls)]
+    for job in jobs:
+        if job.lesson_url in skip:
+            job.skipped = job.success = True
+
+    def etapa_pagina(job):
+        # O espaçamento entre páginas fica a cargo do limite de taxa por host da sessão
+        logger.info(f"\n🔍 Processando aula: {job.lesson_url}")
+        job.started_at = time.monotonic()
+        IN_FLIGHT.inc(stage="lesson")
+        TRACER.begin("aula", job.lesson_url, url=job.lesson_url, prefix=job.prefix)
+        job.lesson_title, job.iframe_url = cached_lesson(resolution_cache, job.lesson_url)
+        if job.iframe_url:
+            return job
+        job.lesson_page, job.lesson_title = fetch_lesson_page(get_course_page, job.lesson_url)
+        return job if job.lesson_page else None
+
+    def etapa_resolucao(job):
+        if job.iframe_url is None:
+            lesson_page, job.lesson_page = job.lesson_page, None
+            with track_stage("iframe"):
+                job.iframe_url = extract_iframe_url(lesson_page)
+            if not job.iframe_url:
+                logger.warning("⚠️ Aula sem vídeo. Tentando salvar conteúdo como markdown...")
+                markdown_path = save_lesson_as_markdown(job.lesson_title, lesson_page, prefix=job.prefix)
+                job.success = bool(markdown_path)
+                job.output_path = markdown_output_path(markdown_path)
+                return None
+            remember_lesson(resolution_cache, job.lesson_url, job.lesson_title, job.iframe_url)
+
+        job.m3u8_url = resolve_m3u8_url(job.iframe_url, headers, max_retries, wait_time, session, resolution_cache, download_options.get("quality_policy"))
+        if not job.m3u8_url:
+            logger.error("❌ URL do m3u8 não encontrada.")
+            return None
+        return job
+
+    def etapa_download(job):
+        output_filename = lesson_output_filename(job.lesson_title, job.prefix)
+        job.output_path = lesson_video_path(output_dir, output_filename, download_options.get("concat_mode", CONCAT_FILES))
+        resultado = download_lesson_video(
+            job.m3u8_url,
+            output_filename,
+            output_dir,
+            headers,
+            session=session,
+            defer_concat=True,
+            **download_options
         )
+        if isinstance(resultado, PendingConcat):
+            job.concat = resultado
+            return job
+        job.success = bool(resultado)
+        if not job.success:
+            forget_m3u8_url(resolution_cache, job.iframe_url, download_options.get("quality_policy"))
+        return None
 
-    return True
+    def etapa_mux(job):
+        concat, job.concat = job.concat, None
+        job.success = concat.run()
+        if not job.success:
+            # Como em process_lesson: se o mux falha, seguem os fallbacks 1080p/720p e o método manual
+            logger.warning("⚠️ Concatenação falhou, tentando as qualidades de fallback...")
+            job.success = bool(download_lesson_video(
+                job.m3u8_url,
+                lesson_output_filename(job.lesson_title, job.prefix),
+                output_dir,
+                headers,
+                session=session,
+                fallback_only=True,
+                **download_options
+            ))
+        if not job.success:
+            forget_m3u8_url(resolution_cache, job.iframe_url, download_options.get("quality_policy"))
+        return None
+
+    def registrar(job):
+        if job.started_at is not None:
+            STAGE_SECONDS.observe(time.monotonic() - job.started_at, stage="lesson")
+            IN_FLIGHT.dec(stage="lesson")
+            TRACER.end("aula", job.lesson_url, success=job.success, title=job.lesson_title)
+        if course_state:
+            course_state.record(job.lesson_url, output_dir, job.success, job.lesson_title, job.output_path, job.m3u8_url)
+        if download_options.get("quality_policy"):
+            download_options["quality_policy"].finish_lesson(job.output_path if job.success else None)
+
+    run_pipeline([job for job in jobs if not job.skipped], [
+        Stage("pagina", etapa_pagina),
+        Stage("resolucao", etapa_resolucao),
+        Stage("download", etapa_download),
+        Stage("mux", etapa_mux),
+    ], on_done=registrar)
+    return jobs
 
 
 def process_multiple_lessons(
@@ -75,45 +325,113 @@ def process_multiple_lessons(
     headers,
     max_retries,
     wait_time,
-    output_dir
+    output_dir,
+    pipeline=True,
+    engine="sync",
+    session=None,
+    course_state=None,
+    **download_options
 ):
-    """Process multiple lessons with progress tracking"""
+    """Process multiple lessons with progress tracking
+
+    Com `pipeline=True` as etapas de aulas consecutivas se sobrepõem (ver
+    run_lesson_pipeline); com `pipeline=False` cada aula é processada por inteiro
+    via `process_lesson` antes da próxima. Com `engine="async"` as aulas rodam no
+    engine asyncio (ver downloader.async_engine). Em todos os casos o prefixo
+    numérico segue a posição da aula no curso.
+
+    Com `course_state` (um CourseState), aulas concluídas em sincronizações
+    anteriores são puladas sem nenhuma requisição e o diff é informado no log.
+    """
     total_lessons = len(lesson_urls)
     logger.info(f"\n🚀 Iniciando processamento de {total_lessons} aulas...\n")
     
     success_count = 0
     failed_urls = []
-    
-    current_index = 1
 
-    for lesson_url in lesson_urls:
-        logger.info(f"\n📊 Tentando baixar: {lesson_url}")
-        
-        success = process_lesson(
+    skip = set()
+    if course_state:
+        novas, pendentes, concluidas = course_state.diff(lesson_urls, output_dir)
+        skip = set(concluidas)
+        logger.info(
+            f"🗂️ Sincronização: {len(novas)} novas, {len(pendentes)} a refazer, "
+            f"{len(concluidas)} já baixadas (puladas)"
+        )
+    if download_options.get("quality_policy"):
+        # O orçamento de disco, menos os vídeos já gravados, é dividido entre as aulas que faltam
+        download_options["quality_policy"].start_course(total_lessons - len(skip), output_dir)
+
+    if engine == "async":
+        # Import tardio: aiohttp é opcional
+        from downloader.async_engine import run_lessons_async
+
+        results = run_lessons_async(
+            lesson_urls,
             get_course_page=get_course_page,
             save_lesson_as_markdown=save_lesson_as_markdown,
             headers=headers,
             max_retries=max_retries,
             wait_time=wait_time,
             output_dir=output_dir,
-            lesson_url=lesson_url,
-            prefix=f"{current_index:02d}"
+            session=session,
+            course_state=course_state,
+            skip=skip,
+            **download_options
         )
+        for lesson_url, success in zip(lesson_urls, results):
+            if success:
+                success_count += 1
+            else:
+                failed_urls.append(lesson_url)
+    elif pipeline:
+        jobs = run_lesson_pipeline(
+            lesson_urls,
+            get_course_page=get_course_page,
+            save_lesson_as_markdown=save_lesson_as_markdown,
+            headers=headers,
+            max_retries=max_retries,
+            wait_time=wait_time,
+            output_dir=output_dir,
+            session=session,
+            course_state=course_state,
+            skip=skip,
+            **download_options
+        )
+        for job in jobs:
+            if job.success:
+                success_count += 1
+            else:
+                failed_urls.append(job.lesson_url)
+    else:
+        for index, lesson_url in enumerate(lesson_urls):
+            if lesson_url in skip:
+                success_count += 1
+                continue
+            logger.info(f"\n📊 Tentando baixar: {lesson_url}")
         
-        if success:
-            success_count += 1
-            current_index += 1
-        else:
-            failed_urls.append(lesson_url)
-
+            success = process_lesson(
+                get_course_page=get_course_page,
+                save_lesson_as_markdown=save_lesson_as_markdown,
+                headers=headers,
+                max_retries=max_retries,
+                wait_time=wait_time,
+                output_dir=output_dir,
+                lesson_url=lesson_url,
+                prefix=f"{index + 1:02d}",
+                session=session,
+                course_state=course_state,
+                **download_options
+            )
         
-        # Wait between requests to avoid triggering anti-bot measures
-        if lesson_url != lesson_urls[-1]:
-            logger.info(f"⏳ Aguardando {wait_time} segundos antes da próxima aula...")
-            time.sleep(wait_time)
+            if success:
+                success_count += 1
+            else:
+                failed_urls.append(lesson_url)
     
     # Report results
     logger.info(f"\n✅ Download concluído! {success_count}/{total_lessons} aulas baixadas com sucesso.")
+    if skip:
+        logger.info(f"⏭️ {len(skip)} delas já estavam baixadas e não foram buscadas de novo.")
     
     # Report failed downloads if any
     if failed_urls:
@@ -122,70 +440,52 @@ def process_multiple_lessons(
             logger.warning(f"  - {url}")
 
 
-def process_course(course_url, get_course_page, save_lesson_as_markdown, headers, max_retries, wait_time, output_dir):
+def process_course(course_url, get_course_page, save_lesson_as_markdown, headers, max_retries, wait_time, output_dir, **download_options):
     """Process all lessons in a course"""
     logger.info(f"\n📚 Processando curso: {course_url}")
     
     course_page = get_course_page(course_url)
-    logger.debug(course_page[:1000])
     if not course_page:
         logger.error("❌ Não foi possível obter a página do curso.")
-        logger.debug(course_page[:1000])
         return False
-    
-    soup = BeautifulSoup(course_page, 'html.parser')
-    
-    course_title_elem = soup.select_one('h1') or soup.select_one('.course-title') or soup.select_one('title')
-    course_title = sanitize_filename(course_title_elem.text.strip()) if course_title_elem else "Curso"
-    
-    course_dir = os.path.join(output_dir, course_title)
-    os.makedirs(course_dir, exist_ok=True)
+    logger.debug(course_page[:1000])
 
     # Detectar todas as aulas
-    lesson_links = []
-    link_patterns = [
-        'div.lessons-wrapper a[href*="/curso/atividade/"]',
-        'a.lesson-title', 
-        'a.tutor-course-content-list-item-title',
-        '.tutor-course-content-list-item a',
-        '.course-curriculum a[href*="atividade"]',
-        '.course-curriculum a[href*="aula"]',
-        '.course-curriculum a[href*="lesson"]',
-        'a[href*="atividade"]',
-        'a[href*="aula"]',
-        'a[href*="lesson"]'
-    ]
-    
-    for pattern in link_patterns:
-        links = soup.select(pattern)
-        if links:
-            lesson_links.extend(links)
-            logger.info(f"🔍 Encontrados {len(links)} links com o padrão: {pattern}")
-    
-    # Normalizar URLs
-    lesson_urls = []
-    for link in lesson_links:
-        if 'href' in link.attrs:
-            url = link['href']
-            if not url.startswith('http'):
-                url = f"https://hub.asimov.academy{url}" if url.startswith('/') else f"https://hub.asimov.academy/{url}"
-            if url not in lesson_urls:
-                lesson_urls.append(url)
-    
-    if lesson_urls:
-        logger.info(f"📋 Encontradas {len(lesson_urls)} aulas para download")
-        process_multiple_lessons(
-            process_lesson=process_lesson,
-            lesson_urls=lesson_urls,
-            get_course_page=get_course_page,
-            save_lesson_as_markdown=save_lesson_as_markdown,
-            headers=headers,
-            max_retries=max_retries,
-            wait_time=wait_time,
-            output_dir=course_dir
-        )
-    else:
+    course_title, lesson_urls = parse_course_page(course_page, course_url)
+
+    if not lesson_urls:
         logger.warning("⚠️ Nenhuma aula encontrada neste curso.")
         logger.debug(course_page[:1000])
-    
+        return True
+
+    return download_course_lessons(
+        course_title,
+        lesson_urls,
+        get_course_page=get_course_page,
+        save_lesson_as_markdown=save_lesson_as_markdown,
+        headers=headers,
+        max_retries=max_retries,
+        wait_time=wait_time,
+        output_dir=output_dir,
+        **download_options
+    )
+
+
+def download_course_lessons(course_title, lesson_urls, get_course_page, save_lesson_as_markdown, headers, max_retries, wait_time, output_dir, **download_options):
+    """Baixa aulas já conhecidas de um curso (da página do curso ou do catálogo) em `output_dir/<curso>`"""
+    course_dir = os.path.join(output_dir, course_title)
+    os.makedirs(course_dir, exist_ok=True)
+
+    logger.info(f"📋 Encontradas {len(lesson_urls)} aulas para download")
+    process_multiple_lessons(
+        process_lesson=process_lesson,
+        lesson_urls=lesson_urls,
+        get_course_page=get_course_page,
+        save_lesson_as_markdown=save_lesson_as_markdown,
+        headers=headers,
+        max_retries=max_retries,
+        wait_time=wait_time,
+        output_dir=course_dir,
+        **download_options
+    )
     return True
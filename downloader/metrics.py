@@ -0,0 +1,273 @@
+"""Métricas do downloader no formato texto do Prometheus.
+
+Contadores, gauges e histogramas com labels ficam num registro global
+(`REGISTRY`); `start_http_server` expõe o registro em `/metrics` e
+`start_file_writer` grava o mesmo texto num arquivo (para o textfile collector
+do node_exporter), ambos em threads daemon. Sem exportador configurado, as
+métricas só custam um lock e uma soma por observação.
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from downloader.tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+# Limites dos histogramas de duração: de um parse de página a um curso inteiro
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+# Peso da última medição na vazão suavizada por host
+THROUGHPUT_SMOOTHING = 0.2
+
+# Intervalo padrão entre gravações do arquivo de métricas, em segundos
+DEFAULT_WRITE_INTERVAL = 15
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pares = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pares.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels esperados {self.labelnames}, recebidos {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in self._values.items()]
+
+    def render(self):
+        linhas = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self._samples():
+            linhas.append(f"{name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return "\n".join(linhas)
+
+
+class Counter(_Metric):
+    """Valor que só cresce (requisições, bytes, segundos acumulados)"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Valor que sobe e desce (operações em andamento, vazão atual)"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    """Distribuição de valores (latências) em buckets cumulativos, com soma e contagem"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            estado = self._values.get(key)
+            if estado is None:
+                estado = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for indice, limite in enumerate(self.buckets):
+                if value <= limite:
+                    estado[0][indice] += 1
+                    break
+            estado[1] += value
+            estado[2] += 1
+
+    def _samples(self):
+        amostras = []
+        with self._lock:
+            for key, (contagens, soma, total) in self._values.items():
+                acumulado = 0
+                for limite, contagem in zip(self.buckets, contagens):
+                    acumulado += contagem
+                    amostras.append((f"{self.name}_bucket", key, (("le", _format_value(limite)),), acumulado))
+                amostras.append((f"{self.name}_sum", key, (), soma))
+                amostras.append((f"{self.name}_count", key, (), total))
+        return amostras
+
+
+class Registry:
+    """Conjunto de métricas renderizadas juntas no formato texto do Prometheus"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrica duplicada: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram(
+    "asimov_stage_duration_seconds",
+    "Duração de cada etapa (page, iframe, m3u8, playlist, segment, download, concat, lesson)",
+    ["stage"],
+)
+IN_FLIGHT = Gauge("asimov_in_flight", "Operações em andamento por etapa", ["stage"])
+HTTP_RESPONSES = Counter("asimov_http_responses_total", "Respostas HTTP por host e status (0 = erro de conexão)", ["host", "status"])
+BYTES = Counter("asimov_downloaded_bytes_total", "Bytes de segmentos baixados por host", ["host"])
+THROUGHPUT = Gauge("asimov_throughput_bytes_per_second", "Vazão suavizada dos segmentos por host", ["host"])
+RETRIES = Counter("asimov_retries_total", "Novas tentativas por etapa e motivo", ["stage", "reason"])
+DEDUP_BYTES = Counter("asimov_dedup_bytes_total", "Bytes reaproveitados do armazenamento de conteúdo em vez de baixados", ["kind"])
+SLEEP_SECONDS = Counter("asimov_sleep_seconds_total", "Tempo dormindo: backoff entre tentativas e limite de taxa", ["cause"])
+
+
+def host_of(url):
+    return (urlsplit(url).hostname or "").lower()
+
+
+@contextmanager
+def track_stage(stage, **trace_args):
+    """Mede a duração de `stage` e a conta como em andamento enquanto roda.
+
+    Com o tracer ligado (downloader.tracing), a etapa também vira um span da
+    linha do tempo, com `trace_args` como detalhes.
+    """
+    IN_FLIGHT.inc(stage=stage)
+    inicio = time.monotonic()
+    try:
+        with TRACER.span(stage, **trace_args):
+            yield
+    finally:
+        STAGE_SECONDS.observe(time.monotonic() - inicio, stage=stage)
+        IN_FLIGHT.dec(stage=stage)
+
+
+def record_transfer(url, nbytes, seconds):
+    """Soma os bytes de um segmento ao host e atualiza a vazão suavizada"""
+    host = host_of(url)
+    BYTES.inc(nbytes, host=host)
+    if seconds > 0 and nbytes:
+        atual = THROUGHPUT.value(host=host)
+        medida = nbytes / seconds
+        THROUGHPUT.set(medida if not atual else atual + THROUGHPUT_SMOOTHING * (medida - atual), host=host)
+
+
+def record_sleep(cause, seconds):
+    if seconds > 0:
+        SLEEP_SECONDS.inc(seconds, cause=cause)
+
+
+def start_http_server(port, addr="127.0.0.1", registry=None):
+    """Serve o registro em http://addr:port/metrics numa thread daemon; retorna o servidor"""
+    registry = registry or REGISTRY
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"📈 Métricas em http://{addr}:{server.server_address[1]}/metrics")
+    return server
+
+
+def write_metrics(path, registry=None):
+    """Grava o registro em `path` via arquivo temporário + rename atômico"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write((registry or REGISTRY).render())
+    os.replace(tmp_path, path)
+
+
+def start_file_writer(path, interval=DEFAULT_WRITE_INTERVAL, registry=None):
+    """Regrava `path` a cada `interval` segundos numa thread daemon; retorna o Event que a encerra"""
+    stop = threading.Event()
+
+    def gravar():
+        while True:
+            try:
+                write_metrics(path, registry)
+            except OSError as e:
+                logger.warning(f"⚠️ Erro ao gravar métricas em {path}: {e}")
+            if stop.wait(interval):
+                return
+
+    threading.Thread(target=gravar, name="metrics-file", daemon=True).start()
+    logger.info(f"📈 Métricas gravadas em {path} a cada {interval}s")
+    return stop
@@ -1,6 +1,7 @@
 import time
 import re
-from bs4 import BeautifulSoup
+from urllib.parse import urljoin
+from downloader.document import as_document
 import logging
 from downloader.utils import sanitize_filename
 
@@ -11,7 +12,9 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler("asimov_downloader.log"),
+        # delay: o arquivo só é criado se este handler chegar a ser usado
+        # (quem configurou o logging antes, como o benchmark, não ganha um .log)
+        logging.FileHandler("asimov_downloader.log", delay=True),
         logging.StreamHandler()
     ]
 )
@@ -19,8 +22,12 @@ logger = logging.getLogger("AsimovDownloader")
 
 
 def extract_iframe_url(lesson_page):
-    """Extract iframe URL where the video is embedded"""
-    soup = BeautifulSoup(lesson_page, 'html.parser')
+    """Extract iframe URL where the video is embedded
+
+    `lesson_page` pode ser texto ou um HtmlDocument já analisado.
+    """
+    document = as_document(lesson_page)
+    soup = document.soup
     
     # Try different patterns for iframe (some courses use different players)
     iframe_patterns = [
@@ -44,7 +51,7 @@ def extract_iframe_url(lesson_page):
         return video_element["src"]
         
     # Try to find any data attributes that might contain video URLs
-    video_containers = soup.select("[data-src], [data-video-url], [data-video-id]")
+    video_containers = document.select("[data-src], [data-video-url], [data-video-id]")
     for container in video_containers:
         for attr in ["data-src", "data-video-url", "data-video-id"]:
             if container.has_attr(attr) and container[attr]:
@@ -63,4 +70,51 @@ def extract_lesson_title(lesson_page, lesson_url=None):
             return sanitize_filename(last_part)
 
     # Fallback final
-    return f"aula_{int(time.time())}"
\ No newline at end of file
+    return f"aula_{int(time.time())}"
+
+
+# Seletores dos links de aula na página do curso, do mais específico ao mais genérico
+LESSON_LINK_PATTERNS = [
+    'div.lessons-wrapper a[href*="/curso/atividade/"]',
+    'a.lesson-title',
+    'a.tutor-course-content-list-item-title',
+    '.tutor-course-content-list-item a',
+    '.course-curriculum a[href*="atividade"]',
+    '.course-curriculum a[href*="aula"]',
+    '.course-curriculum a[href*="lesson"]',
+    'a[href*="atividade"]',
+    'a[href*="aula"]',
+    'a[href*="lesson"]'
+]
+
+
+def parse_course_page(course_page, course_url):
+    """Extrai (título do curso, URLs das aulas) da página do curso.
+
+    As URLs saem na ordem em que os padrões as encontram, sem repetição, e
+    links relativos são resolvidos contra `course_url`. A árvore é percorrida
+    uma única vez com todos os padrões juntos; cada link encontrado é então
+    atribuído ao primeiro padrão que o reconhece.
+    """
+    document = as_document(course_page, course_url)
+
+    course_title_elem = document.select_one('h1') or document.select_one('.course-title') or document.select_one('title')
+    course_title = sanitize_filename(course_title_elem.text.strip()) if course_title_elem else "Curso"
+
+    por_padrao = [[] for _ in LESSON_LINK_PATTERNS]
+    for link in document.select(", ".join(LESSON_LINK_PATTERNS)):
+        for indice, pattern in enumerate(LESSON_LINK_PATTERNS):
+            if document.matches(link, pattern):
+                por_padrao[indice].append(link)
+                break
+
+    # dict como conjunto ordenado: deduplicação O(1) mantendo a ordem
+    lesson_urls = {}
+    for pattern, links in zip(LESSON_LINK_PATTERNS, por_padrao):
+        if links:
+            logger.info(f"🔍 Encontrados {len(links)} links com o padrão: {pattern}")
+        for link in links:
+            if link.get('href'):
+                lesson_urls.setdefault(urljoin(course_url, link['href']), None)
+
+    return course_title, list(lesson_urls)
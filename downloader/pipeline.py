@@ -0,0 +1,78 @@
+import queue
+import logging
+import threading
+
+from downloader.tracing import TRACER
+
+logger = logging.getLogger("AsimovDownloader")
+
+# Marca de fim de fila, repassada a cada thread de uma etapa
+_FIM = object()
+
+
+class Stage:
+    """Etapa do pipeline.
+
+    `func(item)` devolve o item para a próxima etapa, ou None quando o item
+    termina ali (concluído, pulado ou com falha).
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=2):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+
+
+def run_pipeline(items, stages, on_done=None):
+    """Passa `items` pelas etapas em sequência, cada uma com fila limitada e threads próprias.
+
+    Enquanto a etapa N processa um item, a etapa N-1 já trabalha no seguinte. As filas
+    limitadas impedem que uma etapa rápida acumule trabalho na frente de uma lenta.
+    `on_done(item)`, se informado, é chamado assim que cada item sai do pipeline.
+    Retorna quando todos os itens saíram do pipeline.
+    """
+    filas = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+
+    def worker(indice):
+        stage = stages[indice]
+        fila = filas[indice]
+        proxima = filas[indice + 1] if indice + 1 < len(stages) else None
+        while True:
+            item = fila.get()
+            if item is _FIM:
+                return
+            try:
+                # No trace, o intervalo entre dois spans de uma thread é tempo esperando a fila
+                with TRACER.span(stage.name, cat="pipeline"):
+                    resultado = stage.func(item)
+            except Exception as e:
+                logger.error(f"❌ Erro na etapa '{stage.name}': {e}")
+                resultado = None
+            if resultado is not None and proxima is not None:
+                proxima.put(resultado)
+            elif on_done is not None:
+                try:
+                    on_done(item)
+                except Exception as e:
+                    logger.error(f"❌ Erro ao finalizar item da etapa '{stage.name}': {e}")
+
+    threads = []
+    for indice, stage in enumerate(stages):
+        etapa_threads = [
+            threading.Thread(target=worker, args=(indice,), name=f"{stage.name}-{n}", daemon=True)
+            for n in range(stage.workers)
+        ]
+        for thread in etapa_threads:
+            thread.start()
+        threads.append(etapa_threads)
+
+    for item in items:
+        filas[0].put(item)
+
+    # Encerra as etapas em ordem: uma etapa só recebe o fim depois que a anterior esvaziou
+    for indice, stage in enumerate(stages):
+        for _ in range(stage.workers):
+            filas[indice].put(_FIM)
+        for thread in threads[indice]:
+            thread.join()
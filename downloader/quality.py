@@ -0,0 +1,205 @@
+import os
+import re
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+PREFER_HIGHEST = "highest"
+PREFER_LOWEST = "lowest"
+PREFERENCES = (PREFER_HIGHEST, PREFER_LOWEST)
+
+_GB = 1000 ** 3
+_MBPS = 1000 ** 2
+
+# Saídas de vídeo que contam no orçamento de disco (markdown não conta)
+VIDEO_EXTENSIONS = (".mp4", ".ts")
+
+
+def estimated_size(variant, duration):
+    """Bytes estimados de uma rendição: BANDWIDTH (pico, em bits/s) x duração. Tende a sobrar"""
+    return int(variant.bandwidth / 8 * duration) if duration else 0
+
+
+class DiskBudget:
+    """Orçamento de disco de um curso, dividido entre as aulas que ainda faltam.
+
+    Cada aula pode usar `restante / aulas restantes`; uma aula que gasta menos
+    que sua parte deixa a sobra para as seguintes. Uma aula sai da conta uma
+    única vez: com `spend` (vídeo gravado) ou `skip` (sem vídeo ou com falha).
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.remaining = total
+        self.lessons_left = 1
+        self._lock = threading.Lock()
+
+    def start(self, lessons, used=0):
+        with self._lock:
+            self.remaining = self.total - used
+            self.lessons_left = max(1, lessons)
+
+    def allowance(self):
+        with self._lock:
+            return max(0, self.remaining) / max(1, self.lessons_left)
+
+    def spend(self, nbytes):
+        with self._lock:
+            self.remaining -= nbytes
+            self.lessons_left = max(1, self.lessons_left - 1)
+
+    def skip(self):
+        with self._lock:
+            self.lessons_left = max(1, self.lessons_left - 1)
+
+
+class QualityPolicy:
+    """Escolhe a rendição de cada vídeo a partir de BANDWIDTH, RESOLUTION e duração.
+
+    - `max_height`: teto de resolução (ex: 720)
+    - `max_bandwidth`: teto de BANDWIDTH em bits/s, para limitar o tempo de download
+    - `prefer`: "highest" (padrão) ou "lowest" dentro dos tetos
+    - `disk_budget`: bytes por curso; cada aula fica com a maior rendição que cabe
+      na sua parte do orçamento (BANDWIDTH x soma dos EXTINF)
+    - `rules`: lista de `{"match": regex, ...}` com os mesmos campos (menos o
+      orçamento), aplicada às aulas cujo nome casa com o regex (a primeira vale)
+
+    Sem rendição dentro dos tetos, a menor disponível é usada.
+    """
+
+    def __init__(self, max_height=None, max_bandwidth=None, prefer=PREFER_HIGHEST, disk_budget=None, rules=()):
+        if prefer not in PREFERENCES:
+            raise ValueError(f"prefer inválido: {prefer} (use {', '.join(PREFERENCES)})")
+        self.settings = {"max_height": max_height, "max_bandwidth": max_bandwidth, "prefer": prefer}
+        self.budget = DiskBudget(disk_budget) if disk_budget else None
+        # Vídeos já descontados do orçamento do curso atual (não são cobrados de novo)
+        self._counted = set()
+        self.rules = []
+        for rule in rules:
+            rule = dict(rule)
+            pattern = re.compile(rule.pop("match"), re.IGNORECASE)
+            overrides = self._parse_settings(rule)
+            if overrides.get("prefer", PREFER_HIGHEST) not in PREFERENCES:
+                raise ValueError(f"prefer inválido na regra {pattern.pattern}: {overrides['prefer']}")
+            self.rules.append((pattern, overrides))
+
+    @staticmethod
+    def _parse_settings(config):
+        settings = {}
+        if config.get("max_height"):
+            settings["max_height"] = int(config["max_height"])
+        if config.get("max_bandwidth_mbps"):
+            settings["max_bandwidth"] = float(config["max_bandwidth_mbps"]) * _MBPS
+        if config.get("prefer"):
+            settings["prefer"] = config["prefer"]
+        return settings
+
+    @classmethod
+    def from_config(cls, config):
+        """Política a partir da chave `quality` do config.json, ou None se vazia.
+
+        Ex: {"max_height": 720, "max_bandwidth_mbps": 4, "disk_budget_gb": 20,
+             "rules": [{"match": "tela|screen", "prefer": "lowest"}]}
+        """
+        if not config:
+            return None
+        settings = cls._parse_settings(config)
+        disk_budget = float(config["disk_budget_gb"]) * _GB if config.get("disk_budget_gb") else None
+        return cls(disk_budget=disk_budget, rules=config.get("rules", ()), **settings)
+
+    def settings_for(self, name):
+        """Configuração efetiva para a aula `name` (nome do arquivo ou título)"""
+        for pattern, overrides in self.rules:
+            if pattern.search(name or ""):
+                return {**self.settings, **overrides}
+        return self.settings
+
+    def signature(self, name):
+        """Resumo estável dos tetos aplicados a `name`, para separar vídeos guardados com políticas diferentes"""
+        settings = self.settings_for(name)
+        partes = [settings["prefer"]]
+        if settings["max_height"]:
+            partes.append(f"{settings['max_height']}p")
+        if settings["max_bandwidth"]:
+            partes.append(f"{int(settings['max_bandwidth'])}bps")
+        if self.budget:
+            partes.append("budget")
+        return "-".join(partes)
+
+    def allowed(self, variants, name):
+        """Rendições dentro dos tetos, da menor para a maior; nunca vazia se houver variantes"""
+        settings = self.settings_for(name)
+        ordenadas = sorted(variants, key=lambda v: (v.height, v.bandwidth))
+        permitidas = [
+            v for v in ordenadas
+            if not (settings["max_height"] and v.height > settings["max_height"])
+            and not (settings["max_bandwidth"] and v.bandwidth > settings["max_bandwidth"])
+        ]
+        return permitidas or ordenadas[:1]
+
+    def needs_duration(self, name):
+        """Se a escolha depende da duração do vídeo (ou seja, de baixar uma playlist de mídia)"""
+        return self.budget is not None and self.settings_for(name)["prefer"] == PREFER_HIGHEST
+
+    def choose(self, variants, name, duration=None):
+        """Rendição para a aula `name`; com orçamento de disco, a maior cuja estimativa cabe na parte da aula
+
+        Não desconta nada: a aula é cobrada uma vez, em finish_lesson, pelo tamanho real.
+        """
+        candidatas = self.allowed(variants, name)
+        if not candidatas:
+            return None
+        if self.settings_for(name)["prefer"] == PREFER_LOWEST:
+            escolhida = candidatas[0]
+        elif self.budget is not None and duration:
+            parte = self.budget.allowance()
+            cabem = [v for v in candidatas if estimated_size(v, duration) <= parte]
+            escolhida = cabem[-1] if cabem else candidatas[0]
+            if not cabem:
+                logger.warning(f"⚠️ Nenhuma rendição cabe em {parte / _GB:.2f} GB; usando a menor ({escolhida.height}p)")
+        else:
+            escolhida = candidatas[-1]
+        return escolhida
+
+    def fallback_heights(self, heights, name):
+        """Ordena as alturas das playlists de fallback pela preferência, respeitando o teto"""
+        settings = self.settings_for(name)
+        ordenadas = sorted(heights)
+        permitidas = [h for h in ordenadas if not (settings["max_height"] and h > settings["max_height"])] or ordenadas[:1]
+        return permitidas if settings["prefer"] == PREFER_LOWEST else permitidas[::-1]
+
+    def start_course(self, lessons, output_dir=None):
+        """Reinicia o orçamento de disco para um curso com `lessons` aulas a baixar.
+
+        Os vídeos que já estão em `output_dir` (aulas concluídas em sincronizações
+        anteriores ou arquivos já existentes) são descontados do total.
+        """
+        if self.budget is None:
+            return
+        self._counted = set()
+        used = 0
+        if output_dir and os.path.isdir(output_dir):
+            for entry in os.scandir(output_dir):
+                if entry.is_file() and entry.name.endswith(VIDEO_EXTENSIONS) and not entry.name.startswith("."):
+                    self._counted.add(os.path.abspath(entry.path))
+                    used += entry.stat().st_size
+        self.budget.start(lessons, used)
+        logger.info(
+            f"💽 Orçamento de disco: {max(0, self.budget.remaining) / _GB:.2f} de {self.budget.total / _GB:.2f} GB "
+            f"livres para {lessons} aulas"
+        )
+
+    def finish_lesson(self, output_path=None):
+        """Tira uma aula da divisão do orçamento, cobrando o vídeo gravado em `output_path`.
+
+        Sem vídeo (markdown, falha ou arquivo ausente), a parte da aula volta para as demais.
+        """
+        if self.budget is None:
+            return
+        path = os.path.abspath(output_path) if output_path and output_path.endswith(VIDEO_EXTENSIONS) else None
+        if path is None or path in self._counted or not os.path.exists(path):
+            self.budget.skip()
+            return
+        self._counted.add(path)
+        self.budget.spend(os.path.getsize(path))
@@ -0,0 +1,101 @@
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Orçamento por host: (requisições por segundo, rajada máxima).
+# As chaves casam com o host exato ou com um sufixo de domínio.
+DEFAULT_RATE_LIMITS = {
+    "hub.asimov.academy": (0.5, 2),
+    "iframe.mediadelivery.net": (2, 4),
+    "b-cdn.net": (100, 100),
+}
+
+# Hosts sem entrada própria ganham um balde individual com este orçamento
+DEFAULT_HOST_RATE = (50, 50)
+
+HUB_HOST = "hub.asimov.academy"
+
+
+class TokenBucket:
+    """Balde de fichas: `rate` fichas por segundo, acumulando no máximo `burst`.
+
+    As fichas podem ficar negativas: cada chamada reserva sua vez e recebe o
+    tempo de espera correspondente, então quem chega primeiro sai primeiro.
+    `clock` substitui time.monotonic (nos testes, um relógio controlado).
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self._clock = clock
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Reserva uma ficha e retorna quantos segundos esperar antes de usá-la"""
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    """Um TokenBucket por host (ou sufixo de domínio) pelo qual passam todas as requisições"""
+
+    def __init__(self, rate_limits=None, default_rate=DEFAULT_HOST_RATE, clock=time.monotonic):
+        self.rate_limits = dict(DEFAULT_RATE_LIMITS)
+        self.rate_limits.update(rate_limits or {})
+        self.default_rate = default_rate
+        self._clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, wait_time=None, rate_limits=None):
+        """Limiter padrão; `wait_time` vira o intervalo médio entre páginas do hub"""
+        limits = {}
+        if wait_time:
+            limits[HUB_HOST] = (1.0 / wait_time, DEFAULT_RATE_LIMITS[HUB_HOST][1])
+        for host, (rate, burst) in (rate_limits or {}).items():
+            limits[host] = (rate, burst)
+        return cls(limits)
+
+    def _budget_key(self, host):
+        for key in self.rate_limits:
+            if host == key or host.endswith(f".{key}"):
+                return key
+        return host
+
+    def bucket_for(self, url):
+        host = (urlsplit(url).hostname or "").lower()
+        key = self._budget_key(host)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate, burst = self.rate_limits.get(key, self.default_rate)
+                bucket = self._buckets[key] = TokenBucket(rate, burst, self._clock)
+            return bucket
+
+    def reserve(self, url):
+        """Tempo de espera para uma requisição a `url` (para quem dorme por conta própria, ex: asyncio)"""
+        return self.bucket_for(url).reserve()
+
+    def acquire(self, url):
+        wait = self.bucket_for(url).acquire()
+        if wait > 0.5:
+            logger.debug(f"⏳ Limite de taxa: aguardou {wait:.1f}s por {urlsplit(url).hostname}")
+        return wait
@@ -0,0 +1,83 @@
+import random
+import threading
+import statistics
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
+
+# Tentativas extras por segmento antes de desistir da playlist
+DEFAULT_SEGMENT_RETRIES = 4
+# Backoff exponencial: BACKOFF_BASE * 2^tentativa, limitado a BACKOFF_CAP, com jitter total
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+# Status que valem nova tentativa; 403/404 indicam playlist errada ou token vencido
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Requisição duplicada quando um segmento demora HEDGE_FACTOR x a mediana (mínimo HEDGE_MIN_DELAY s)
+HEDGE_FACTOR = 3.0
+HEDGE_MIN_DELAY = 1.0
+HEDGE_MIN_SAMPLES = 5
+
+
+def backoff_delay(tentativa, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Espera antes da tentativa `tentativa` (0 = primeira repetição), com jitter total"""
+    return random.uniform(0, min(cap, base * (2 ** tentativa)))
+
+
+def retry_after_seconds(response):
+    """Lê o header Retry-After (em segundos), se houver"""
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyTracker:
+    """Mediana móvel das latências dos últimos segmentos, usada para decidir quando duplicar"""
+
+    def __init__(self, size=100):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self._samples.append(latency)
+
+    def hedge_delay(self, factor=HEDGE_FACTOR, minimum=HEDGE_MIN_DELAY):
+        """Após quantos segundos duplicar a requisição, ou None se ainda não há amostras suficientes"""
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            median = statistics.median(self._samples)
+        return max(minimum, factor * median)
+
+
+def hedged_call(executor, attempt, hedge_after):
+    """Executa `attempt(cancel)` e, se não terminar em `hedge_after` s, dispara uma cópia.
+
+    Vale o resultado da primeira cópia que concluir com sucesso; a outra recebe
+    o sinal em `cancel` (um threading.Event) para abandonar a transferência. Se as
+    duas falharem, a última exceção é propagada.
+    """
+    cancels = {}
+    primaria_cancel = threading.Event()
+    primaria = executor.submit(attempt, primaria_cancel)
+    cancels[primaria] = primaria_cancel
+
+    done, _ = wait([primaria], timeout=hedge_after)
+    if not done:
+        copia_cancel = threading.Event()
+        copia = executor.submit(attempt, copia_cancel)
+        cancels[copia] = copia_cancel
+
+    pendentes = set(cancels)
+    erro = None
+    while pendentes:
+        done, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for outra in pendentes:
+                    cancels[outra].set()
+                return future.result()
+            erro = future.exception()
+    raise erro
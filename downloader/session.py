@@ -0,0 +1,98 @@
+import threading
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+
+from downloader.hls import DEFAULT_PROBE_WORKERS
+from downloader.ratelimit import HostRateLimiter
+from downloader.metrics import HTTP_RESPONSES, host_of, record_sleep
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:112.0) Gecko/20100101 Firefox/112.0",
+    "Referer": "https://hub.asimov.academy/",
+}
+
+# Domínio usado para os cookies de login (não são enviados para o CDN)
+COOKIE_DOMAIN = ".asimov.academy"
+
+# Quantos hosts distintos mantêm um pool próprio (hub, iframe, CDNs...)
+DEFAULT_POOL_CONNECTIONS = 10
+# Conexões keep-alive por host; deve acompanhar o paralelismo configurado
+DEFAULT_POOL_SIZE = 8
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+class RateLimitedSession(requests.Session):
+    """requests.Session em que cada requisição (inclusive redirects) passa pelo limite de taxa do host"""
+
+    def __init__(self, rate_limiter=None):
+        super().__init__()
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+
+    def send(self, request, **kwargs):
+        record_sleep("rate_limit", self.rate_limiter.acquire(request.url))
+        try:
+            response = super().send(request, **kwargs)
+        except requests.RequestException:
+            HTTP_RESPONSES.inc(host=host_of(request.url), status=0)
+            raise
+        HTTP_RESPONSES.inc(host=host_of(request.url), status=response.status_code)
+        return response
+
+
+def peak_connections(max_workers, hedge=False):
+    """Conexões simultâneas que um mesmo host (o CDN) pode receber no pico
+
+    Com `hedge`, segmentos rodam no executor de cópias (2 * max_workers); as
+    sondagens de variantes da aula seguinte se sobrepõem ao download no pipeline.
+    """
+    workers = max(1, max_workers)
+    segmentos = workers * 2 if hedge else workers
+    return segmentos + DEFAULT_PROBE_WORKERS
+
+
+def create_session(headers=None, pool_size=DEFAULT_POOL_SIZE, rate_limiter=None):
+    """Cria uma sessão HTTP com pools keep-alive por host dimensionados para `pool_size`
+
+    `pool_size` deve cobrir a concorrência real por host (veja peak_connections);
+    um pool menor descarta conexões e perde o keep-alive.
+    Toda requisição passa pelo `rate_limiter` (um orçamento por host); sem ele,
+    usa os limites padrão de downloader.ratelimit.
+    """
+    session = RateLimitedSession(rate_limiter)
+    adapter = HTTPAdapter(
+        pool_connections=DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=max(1, pool_size),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    if headers:
+        apply_auth_headers(session, headers)
+    return session
+
+
+def apply_auth_headers(session, headers):
+    """Aplica os headers de login na sessão, movendo o header Cookie para o cookie jar"""
+    headers = dict(headers or {})
+    cookie_header = headers.pop("Cookie", None)
+    session.headers.update(headers)
+
+    if cookie_header:
+        for item in cookie_header.split(";"):
+            name, sep, value = item.strip().partition("=")
+            if sep and name:
+                session.cookies.set(name, value, domain=COOKIE_DOMAIN)
+
+
+def get_session():
+    """Retorna a sessão compartilhada padrão, usada quando nenhuma é informada"""
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = create_session()
+        return _default_session
@@ -0,0 +1,115 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = "course_state.db"
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lessons (
+    lesson_url  TEXT NOT NULL,
+    output_dir  TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    title       TEXT,
+    output_path TEXT,
+    size        INTEGER,
+    stream_url  TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (lesson_url, output_dir)
+)
+"""
+
+
+class CourseState:
+    """Estado local das aulas (SQLite): status, arquivo gerado, tamanho e stream resolvido.
+
+    Cada aula é registrada por pasta de destino: a mesma aula baixada pela opção
+    de aula avulsa ou em outro curso não conta como concluída aqui. Uma aula
+    concluída cujo arquivo (vídeo ou .md) ainda está em disco com o mesmo tamanho
+    é pulada sem nenhuma requisição; só aulas novas, que falharam ou cujo arquivo
+    sumiu voltam à rede.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Acessado pelas threads do pipeline; o lock serializa o uso da conexão
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(lessons)")}
+            if columns and "output_dir" not in columns:
+                # Formato antigo, só por URL: as aulas serão conferidas de novo na próxima sincronização
+                logger.info("🗂️ Estado das aulas em formato antigo descartado")
+                self._conn.execute("DROP TABLE lessons")
+            self._conn.execute(_SCHEMA)
+
+    def _row(self, lesson_url, output_dir):
+        return self._conn.execute(
+            "SELECT status, output_path, size FROM lessons WHERE lesson_url = ? AND output_dir = ?",
+            (lesson_url, os.path.abspath(output_dir)),
+        ).fetchone()
+
+    def is_done(self, lesson_url, output_dir):
+        with self._lock:
+            row = self._row(lesson_url, output_dir)
+        if row is None or row[0] != STATUS_DONE:
+            return False
+        status, output_path, size = row
+        if output_path is None:
+            return False
+        try:
+            return os.path.getsize(output_path) == size
+        except OSError:
+            return False
+
+    def diff(self, lesson_urls, output_dir):
+        """Separa `lesson_urls` em (novas, com falha ou incompletas, já concluídas) para `output_dir`"""
+        novas, pendentes, concluidas = [], [], []
+        for lesson_url in lesson_urls:
+            with self._lock:
+                known = self._row(lesson_url, output_dir) is not None
+            if self.is_done(lesson_url, output_dir):
+                concluidas.append(lesson_url)
+            elif known:
+                pendentes.append(lesson_url)
+            else:
+                novas.append(lesson_url)
+        return novas, pendentes, concluidas
+
+    def record(self, lesson_url, output_dir, success, title=None, output_path=None, stream_url=None):
+        """Registra o resultado de uma aula em `output_dir`; o tamanho é lido do arquivo gerado, se houver"""
+        size = None
+        if output_path is not None:
+            try:
+                size = os.path.getsize(output_path)
+            except OSError:
+                output_path = None
+        status = STATUS_DONE if success else STATUS_FAILED
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO lessons (lesson_url, output_dir, status, title, output_path, size, stream_url, attempts, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)
+                ON CONFLICT(lesson_url, output_dir) DO UPDATE SET
+                    status = excluded.status,
+                    title = COALESCE(excluded.title, title),
+                    output_path = excluded.output_path,
+                    size = excluded.size,
+                    stream_url = COALESCE(excluded.stream_url, stream_url),
+                    attempts = attempts + 1,
+                    updated_at = excluded.updated_at
+                """,
+                (lesson_url, os.path.abspath(output_dir), status, title, output_path, size, stream_url, time.time()),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
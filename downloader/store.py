@@ -0,0 +1,276 @@
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import threading
+
+from downloader.checkpoint import playlist_key
+from downloader.metrics import DEDUP_BYTES
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: sem ioctl, o reflink não é tentado
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Diretório do armazenamento, dentro da pasta de saída para que hardlinks funcionem
+STORE_NAME = ".store"
+
+# ioctl FICLONE do Linux (btrfs, XFS, bcachefs): cópia copy-on-write instantânea
+FICLONE = 0x40049409
+
+# Como um objeto foi colocado no destino
+LINK_REFLINK = "reflink"
+LINK_HARDLINK = "hardlink"
+LINK_COPY = "copy"
+
+_HASH_BLOCK = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    stream_key TEXT PRIMARY KEY,
+    sha256     TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    segment_key TEXT PRIMARY KEY,
+    sha256      TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    updated_at  REAL NOT NULL
+);
+"""
+
+
+def video_key(m3u8_url, output_filename, quality=None):
+    """Identidade do vídeo: playlist sem tokens + formato de saída (`.mp4` ou `.ts`) + política de qualidade"""
+    key = f"{playlist_key(m3u8_url)}{os.path.splitext(output_filename)[1]}"
+    return f"{key}#{quality}" if quality else key
+
+
+def segment_key(segmento):
+    """Identidade do segmento: URL sem tokens + intervalo de bytes, se houver"""
+    key = playlist_key(segmento.url)
+    if segmento.byterange:
+        length, offset = segmento.byterange
+        key = f"{key}@{offset}+{length}"
+    return key
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(bloco)
+    return digest.hexdigest()
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        raise OSError("reflink indisponível nesta plataforma")
+    with open(src, 'rb') as origem, open(dst, 'wb') as destino:
+        fcntl.ioctl(destino.fileno(), FICLONE, origem.fileno())
+
+
+def link_file(src, dst):
+    """Coloca `src` em `dst` sem duplicar dados quando possível.
+
+    Tenta hardlink (que mantém a contagem de links usada por
+    ContentStore.collect_garbage), depois reflink (cópia copy-on-write) e, só
+    se os dois falharem (outro sistema de arquivos), uma cópia. `dst` é
+    substituído atomicamente. Retorna o modo usado.
+    """
+    tmp_path = f"{dst}.{threading.get_ident()}.link"
+    for modo, ligar in ((LINK_HARDLINK, os.link), (LINK_REFLINK, _reflink), (LINK_COPY, shutil.copyfile)):
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            ligar(src, tmp_path)
+        except OSError as e:
+            logger.debug(f"{modo} de {src} falhou: {e}")
+            continue
+        os.replace(tmp_path, dst)
+        return modo
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    raise OSError(f"Não foi possível copiar {src} para {dst}")
+
+
+class ContentStore:
+    """Armazenamento de conteúdo compartilhado entre cursos.
+
+    Os arquivos ficam em `objects/` nomeados pelo SHA-256; um índice SQLite
+    associa a identidade de cada vídeo (playlist sem tokens + formato) e de
+    cada segmento (URL sem tokens + intervalo) ao seu hash. Um vídeo que
+    aparece em outro curso é ligado na pasta nova por reflink ou hardlink, sem
+    nenhuma requisição; um segmento já baixado para outra aula é ligado no
+    diretório de segmentos em vez de ser buscado de novo.
+
+    Segmentos só ficam guardados enquanto o vídeo não está completo: depois
+    disso o vídeo inteiro é reaproveitado e eles são descartados.
+
+    Objetos só entram no armazenamento por hardlink: se o sistema de arquivos
+    não permite, nada é guardado, em vez de manter uma segunda cópia de cada
+    vídeo. Um objeto sem outro link (st_nlink == 1) não está mais em nenhuma
+    pasta de curso e é removido por collect_garbage.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def _find(self, table, column, key):
+        with self._lock:
+            row = self._conn.execute(f"SELECT sha256, size FROM {table} WHERE {column} = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        sha256, size = row
+        path = self.object_path(sha256)
+        try:
+            if os.path.getsize(path) == size:
+                return path, size, sha256
+        except OSError:
+            pass
+        # Objeto sumiu ou foi truncado: a entrada não vale mais
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (key,))
+        return None
+
+    def _put(self, path, sha256):
+        """Guarda `path` como objeto `sha256` (se ainda não existir) e retorna o caminho do objeto.
+
+        Retorna None se o objeto não pode ser um hardlink de `path`.
+        """
+        destino = self.object_path(sha256)
+        if not os.path.exists(destino):
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            try:
+                os.link(path, destino)
+            except FileExistsError:
+                pass
+            except OSError as e:
+                logger.debug(f"Sem hardlink para {path}, não guardado no armazenamento de conteúdo: {e}")
+                return None
+        return destino
+
+    def collect_garbage(self):
+        """Remove objetos que nenhuma pasta de curso usa mais (st_nlink == 1) e suas entradas.
+
+        Retorna os bytes liberados.
+        """
+        liberados = 0
+        removidos = []
+        for prefixo in os.scandir(self.objects_dir):
+            if not prefixo.is_dir():
+                continue
+            for objeto in os.scandir(prefixo.path):
+                try:
+                    info = objeto.stat()
+                    if info.st_nlink > 1:
+                        continue
+                    os.remove(objeto.path)
+                except OSError:
+                    continue
+                liberados += info.st_size
+                removidos.append(objeto.name)
+        if removidos:
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM videos WHERE sha256 = ?", ((sha256,) for sha256 in removidos))
+                self._conn.executemany("DELETE FROM segments WHERE sha256 = ?", ((sha256,) for sha256 in removidos))
+            logger.info(f"🧹 Armazenamento de conteúdo: {len(removidos)} objetos sem uso removidos ({liberados / 1e6:.1f} MB)")
+        return liberados
+
+    def restore_video(self, key, output_path):
+        """Liga o vídeo `key` em `output_path`, se já estiver guardado. Retorna o tamanho, ou None"""
+        encontrado = self._find("videos", "stream_key", key)
+        if encontrado is None:
+            return None
+        path, size, _ = encontrado
+        modo = link_file(path, output_path)
+        DEDUP_BYTES.inc(size, kind="video")
+        logger.info(f"♻️ Vídeo já baixado em outro curso ({modo}): {output_path}")
+        return size
+
+    def add_video(self, key, path):
+        """Guarda o vídeo pronto em `path` sob `key`.
+
+        Se o mesmo conteúdo já estava guardado, `path` passa a apontar para o objeto existente.
+        """
+        sha256 = file_sha256(path)
+        size = os.path.getsize(path)
+        existia = os.path.exists(self.object_path(sha256))
+        objeto = self._put(path, sha256)
+        if objeto is None:
+            return
+        if existia:
+            link_file(objeto, path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO videos (stream_key, sha256, size, updated_at) VALUES (?, ?, ?, ?)",
+                (key, sha256, size, time.time()),
+            )
+
+    def restore_segment(self, key, seg_path):
+        """Liga o segmento `key` em `seg_path`, se já estiver guardado. Retorna (tamanho, sha256), ou None"""
+        encontrado = self._find("segments", "segment_key", key)
+        if encontrado is None:
+            return None
+        path, size, sha256 = encontrado
+        link_file(path, seg_path)
+        DEDUP_BYTES.inc(size, kind="segment")
+        return size, sha256
+
+    def read_segment(self, key):
+        """Bytes do segmento `key`, se já estiver guardado"""
+        encontrado = self._find("segments", "segment_key", key)
+        if encontrado is None:
+            return None
+        DEDUP_BYTES.inc(encontrado[1], kind="segment")
+        with open(encontrado[0], 'rb') as f:
+            return f.read()
+
+    def add_segment(self, key, seg_path, size, sha256):
+        if self._put(seg_path, sha256) is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO segments (segment_key, sha256, size, updated_at) VALUES (?, ?, ?, ?)",
+                (key, sha256, size, time.time()),
+            )
+
+    def release_segments(self, keys):
+        """Descarta os segmentos `keys` (o vídeo deles já está guardado inteiro)"""
+        keys = list(keys)
+        with self._lock, self._conn:
+            hashes = set()
+            for key in keys:
+                row = self._conn.execute("SELECT sha256 FROM segments WHERE segment_key = ?", (key,)).fetchone()
+                if row:
+                    hashes.add(row[0])
+            self._conn.executemany("DELETE FROM segments WHERE segment_key = ?", ((key,) for key in keys))
+            # Um objeto ainda citado por outro segmento ou por um vídeo fica
+            orfaos = [
+                sha256 for sha256 in hashes
+                if self._conn.execute("SELECT 1 FROM segments WHERE sha256 = ? UNION SELECT 1 FROM videos WHERE sha256 = ?", (sha256, sha256)).fetchone() is None
+            ]
+        for sha256 in orfaos:
+            try:
+                os.remove(self.object_path(sha256))
+            except OSError:
+                pass
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
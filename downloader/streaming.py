@@ -0,0 +1,51 @@
+import os
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tamanho do bloco lido do socket e gravado em disco. Grande o suficiente para
+# poucas chamadas de sistema por segmento, pequeno o bastante para que a memória
+# por download em andamento fique em ~1 bloco, independente do tamanho do segmento.
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+
+class StreamCancelled(Exception):
+    """A cópia foi abandonada porque outra requisição do mesmo conteúdo terminou antes"""
+
+
+def stream_response(response, out, chunk_size=DEFAULT_CHUNK_SIZE, cancel=None):
+    """Copia o corpo de uma resposta `stream=True` para `out` em blocos.
+
+    Retorna `(bytes_escritos, sha256)`; o hash é calculado durante a cópia, sem
+    reler o arquivo. Se `cancel` (threading.Event) for sinalizado, a cópia para
+    com StreamCancelled no próximo bloco.
+    """
+    digest = hashlib.sha256()
+    total = 0
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        if cancel is not None and cancel.is_set():
+            raise StreamCancelled()
+        if not chunk:
+            continue
+        out.write(chunk)
+        digest.update(chunk)
+        total += len(chunk)
+    return total, digest.hexdigest()
+
+
+def stream_to_file(response, path, chunk_size=DEFAULT_CHUNK_SIZE, cancel=None, part_path=None):
+    """Grava a resposta em `path` via arquivo `.part` + rename atômico
+
+    `part_path` permite que cópias simultâneas do mesmo arquivo usem `.part` distintos.
+    """
+    part_path = part_path or f"{path}.part"
+    try:
+        with open(part_path, 'wb') as out:
+            size, sha256 = stream_response(response, out, chunk_size, cancel)
+        os.replace(part_path, path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return size, sha256
@@ -0,0 +1,100 @@
+"""Linha do tempo da execução no formato Chrome trace-event (abre no Perfetto ou em chrome://tracing).
+
+Desligado por padrão: com o tracer inativo, `span` não grava nada. Ligado, cada
+etapa medida por `downloader.metrics.track_stage` (página, iframe, playlist,
+segmento, download, concat...) vira um evento completo na thread que a executou,
+e cada aula vira um evento assíncrono do início ao fim, mesmo passando por
+várias threads do pipeline. Intervalos vazios nas threads são tempo ocioso.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class Tracer:
+    """Coleta eventos trace-event em memória; `save(path)` grava o JSON"""
+
+    def __init__(self):
+        self.enabled = False
+        self._events = []
+        self._threads = {}
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        with self._lock:
+            self.enabled = True
+            self._origin = time.perf_counter()
+            self._events = []
+            self._threads = {}
+
+    def disable(self):
+        self.enabled = False
+
+    def _now(self):
+        # Microssegundos desde o início do trace
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def _add(self, event):
+        thread = threading.current_thread()
+        event["pid"] = os.getpid()
+        event["tid"] = thread.ident
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self._events.append(event)
+
+    @contextmanager
+    def span(self, name, cat="stage", **args):
+        """Evento completo (`ph: X`) cobrindo o bloco `with`, na thread atual"""
+        if not self.enabled:
+            yield
+            return
+        inicio = self._now()
+        try:
+            yield
+        finally:
+            self._add({"name": name, "cat": cat, "ph": "X", "ts": inicio, "dur": self._now() - inicio, "args": args})
+
+    def begin(self, name, span_id, cat="lesson", **args):
+        """Abre um evento assíncrono que pode terminar em outra thread (ver `end`)"""
+        if self.enabled:
+            self._add({"name": name, "cat": cat, "ph": "b", "id": str(span_id), "ts": self._now(), "args": args})
+
+    def end(self, name, span_id, cat="lesson", **args):
+        if self.enabled:
+            self._add({"name": name, "cat": cat, "ph": "e", "id": str(span_id), "ts": self._now(), "args": args})
+
+    def __len__(self):
+        with self._lock:
+            return len(self._events)
+
+    def events(self):
+        """Eventos gravados, precedidos dos nomes das threads (metadados `ph: M`)"""
+        with self._lock:
+            eventos = list(self._events)
+            threads = dict(self._threads)
+        pid = os.getpid()
+        nomes = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": nome}}
+            for tid, nome in threads.items()
+        ]
+        return nomes + eventos
+
+    def save(self, path):
+        """Grava o trace em `path` (JSON trace-event) via arquivo temporário + rename atômico"""
+        eventos = self.events()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": eventos, "displayTimeUnit": "ms"}, f)
+        os.replace(tmp_path, path)
+        logger.info(f"🧵 Trace com {len(eventos)} eventos gravado em {path} (abra em https://ui.perfetto.dev)")
+
+
+TRACER = Tracer()
@@ -1,114 +1,600 @@
 import os
+import io
 import time
 import re
 import shutil
+import sqlite3
 import subprocess
+import tempfile
 import requests
-from tqdm import tqdm
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import logging
 
+from downloader.session import get_session
+from downloader.checkpoint import SegmentManifest, MANIFEST_NAME, checkpoint_dir
+from downloader.streaming import stream_to_file, stream_response, DEFAULT_CHUNK_SIZE
+from downloader.hls import parse_playlist, fetch_playlist, probe_playlists
+from downloader.metrics import RETRIES, track_stage, record_transfer, record_sleep
+from downloader.store import video_key, segment_key
+from downloader.retry import (
+    DEFAULT_SEGMENT_RETRIES,
+    RETRYABLE_STATUS,
+    LatencyTracker,
+    backoff_delay,
+    retry_after_seconds,
+    hedged_call,
+)
+
 logger = logging.getLogger(__name__)
 
-def download_video_with_fallback(m3u8_url, output_filename, output_dir, headers):
-    """Download vídeo, usando diretamente o .m3u8 final quando disponível, ou fallback por qualidade"""
+# Número padrão de segmentos .ts baixados em paralelo
+DEFAULT_MAX_WORKERS = 8
+
+# Modos de concatenação (ver download_video_with_fallback)
+CONCAT_FILES = "files"
+CONCAT_PIPE = "pipe"
+CONCAT_TS = "ts"
+CONCAT_MODES = (CONCAT_FILES, CONCAT_PIPE, CONCAT_TS)
+
+# Headers usados pelo player do mediadelivery ao buscar playlists e segmentos
+SEGMENT_HEADERS = {
+    "Referer": "https://iframe.mediadelivery.net/",
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36"
+}
+
+# Estruturas antigas de playlist por qualidade, tentadas quando a principal falha
+FALLBACK_QUALITIES = ("1080p", "720p")
+
+# Byte de sincronismo que abre todo pacote MPEG-TS
+TS_SYNC_BYTE = 0x47
+TS_PACKET_SIZE = 188
+
+# Janela de reordenação dos modos `pipe`/`ts`: segmentos adiante do próximo a escrever
+# (baixando ou prontos) e bytes já baixados à espera de escrita. Não dependem de
+# max_workers, para que a memória fique estável mesmo com milhares de requisições em voo.
+REORDER_MAX_SEGMENTS = 32
+REORDER_MAX_BYTES = 64 * 1024 * 1024
+
+
+# Fim dos itens em escrever_em_ordem
+_FIM = object()
+
+
+class SegmentError(Exception):
+    """Falha HTTP ao baixar um segmento; `status` é o código recebido"""
+
+    def __init__(self, url, status, retry_after=None):
+        super().__init__("Segmento não encontrado")
+        self.url = url
+        self.status = status
+        self.retry_after = retry_after
+
+
+def video_output_filename(output_filename, concat_mode=CONCAT_FILES):
+    """Nome final do vídeo: `.mp4`, ou `.ts` quando não há remux"""
     if not output_filename.endswith('.mp4'):
         output_filename = f"{output_filename}.mp4"
-        
+    if concat_mode == CONCAT_TS:
+        # Sem remux, a saída é o próprio fluxo MPEG-TS
+        output_filename = f"{os.path.splitext(output_filename)[0]}.ts"
+    return output_filename
+
+
+def lesson_parts_dir(output_dir, output_filename):
+    """Diretório de segmentos fixo por aula, para que o checkpoint sobreviva entre execuções"""
+    return os.path.join(output_dir, f".{os.path.splitext(output_filename)[0]}.parts")
+
+
+def fallback_playlist_urls(m3u8_url, quality_policy=None, name=None):
+    """Playlists das estruturas antigas 1080p/720p, tentadas quando a principal falha.
+
+    Com `quality_policy`, só entram as qualidades dentro do teto, na ordem preferida pela política.
+    """
+    base_url = m3u8_url.rsplit('/', 1)[0]
+    qualities = FALLBACK_QUALITIES
+    if quality_policy:
+        qualities = [f"{height}p" for height in quality_policy.fallback_heights([int(q[:-1]) for q in FALLBACK_QUALITIES], name)]
+    return [(quality, f"{base_url}/{quality}/video.m3u8") for quality in qualities]
+
+
+def choose_variant(master, quality_policy=None, name=None, fetch_media=None):
+    """Rendição de `master` a baixar: a de maior resolução ou, com `quality_policy`, a da política.
+
+    Quando a política depende da duração (orçamento de disco), `fetch_media(url)`
+    baixa a playlist de mídia da maior rendição permitida. Retorna
+    `(variante, playlist de mídia já baixada ou None)`.
+    """
+    if not quality_policy:
+        return master.best_variant(), None
+    media = None
+    if quality_policy.needs_duration(name) and fetch_media:
+        media = fetch_media(quality_policy.allowed(master.variants, name)[-1].url)
+    variant = quality_policy.choose(master.variants, name, media.duration if media else None)
+    if media is not None and media.url != variant.url:
+        media = None
+    return variant, media
+
+
+def janela_cheia(pendentes, max_segments=REORDER_MAX_SEGMENTS, max_bytes=REORDER_MAX_BYTES):
+    """Se a janela de reordenação não comporta mais um segmento.
+
+    `pendentes` são futures (concurrent.futures ou asyncio) na ordem de escrita;
+    os já concluídos contam pelo tamanho do resultado.
+    """
+    if len(pendentes) >= max_segments:
+        return True
+    prontos = sum(
+        len(future.result()) for future in pendentes
+        if future.done() and not future.cancelled() and future.exception() is None
+    )
+    return prontos >= max_bytes
+
+
+def escrever_em_ordem(items, baixar, escrever, max_workers):
+    """Baixa `items` em paralelo e entrega os resultados a `escrever` na ordem original.
+
+    Um segmento novo só começa se a janela tiver vaga (ver janela_cheia): um
+    segmento lento segura os downloads seguintes em vez de acumular o resto do
+    vídeo na RAM.
+    """
+    pendentes = deque()
+    restantes = iter(items)
+    proximo = next(restantes, _FIM)
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, REORDER_MAX_SEGMENTS)))
+    try:
+        from tqdm import tqdm
+
+        with tqdm(total=len(items), desc="Downloading segments") as progresso:
+            while True:
+                while pendentes and pendentes[0].done():
+                    escrever(pendentes.popleft().result())
+                    progresso.update(1)
+                while proximo is not _FIM and not janela_cheia(pendentes):
+                    pendentes.append(executor.submit(baixar, proximo))
+                    proximo = next(restantes, _FIM)
+                if not pendentes:
+                    break
+                wait([future for future in pendentes if not future.done()], return_when=FIRST_COMPLETED)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+class PendingConcat:
+    """Concatenação ffmpeg (modo `files`) de segmentos já baixados, pronta para rodar.
+
+    Retornada por download_video_with_fallback com `defer_concat=True`, para que o
+    mux de uma aula rode em outra etapa enquanto a próxima aula já está baixando.
+    `on_success`, se informado, é chamado depois que o vídeo final está pronto.
+    """
+
+    def __init__(self, temp_dir, seg_names, output_path, parts_dir, on_success=None):
+        self.temp_dir = temp_dir
+        self.seg_names = seg_names
+        self.output_path = output_path
+        self.parts_dir = parts_dir
+        self.on_success = on_success
+
+    def run(self):
+        with open(os.path.join(self.temp_dir, "lista.txt"), 'w') as f:
+            for seg_name in self.seg_names:
+                f.write(f"file '{seg_name}'\n")
+
+        logger.info(f"📦 Concatenando segmentos com ffmpeg...")
+        output_temp = "output.mp4"
+        command = [
+            'ffmpeg',
+            '-y',
+            '-f', 'concat',
+            '-safe', '0',
+            '-i', 'lista.txt',
+            '-c', 'copy',
+            output_temp
+        ]
+
+        with track_stage("concat"):
+            process = subprocess.run(command, cwd=self.temp_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if process.returncode != 0:
+            # Os segmentos ficam no checkpoint para a próxima execução
+            logger.error(f"❌ Erro ao concatenar: {process.stderr.decode()}")
+            return False
+
+        shutil.move(os.path.join(self.temp_dir, output_temp), self.output_path)
+        logger.info(f"✅ Download e concatenação concluídos: {self.output_path}")
+        # Só descarta os segmentos após o sucesso
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        if self.on_success:
+            self.on_success()
+        return True
+
+
+class TsFileSink:
+    """Concatenação MPEG-TS em Python puro: os segmentos HLS já são fluxos TS contínuos"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+
+    def write(self, data):
+        if len(data) < TS_PACKET_SIZE or data[0] != TS_SYNC_BYTE:
+            raise Exception("Segmento não é MPEG-TS; use concat_mode 'files' ou 'pipe'")
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+        return True
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class FfmpegPipeSink:
+    """Envia os segmentos para o stdin do ffmpeg, que remuxa direto para mp4
+
+    O stderr do ffmpeg vai para um arquivo temporário: um pipe que ninguém lê
+    enquanto o stdin é escrito pode encher e travar os dois processos.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        command = [
+            'ffmpeg',
+            '-y',
+            '-loglevel', 'error',
+            '-f', 'mpegts',
+            '-i', 'pipe:0',
+            '-c', 'copy',
+            '-f', 'mp4',
+            path
+        ]
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.stderr)
+
+    def write(self, data):
+        self.process.stdin.write(data)
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            self.stderr.seek(0)
+            logger.error(f"❌ Erro ao concatenar: {self.stderr.read().decode(errors='replace')}")
+            self.abort()
+            return False
+        self.stderr.close()
+        return True
+
+    def abort(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.stderr.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def download_video_with_fallback(m3u8_url, output_filename, output_dir, headers, max_workers=DEFAULT_MAX_WORKERS, session=None, chunk_size=DEFAULT_CHUNK_SIZE, concat_mode=CONCAT_FILES, defer_concat=False, concurrency_controller=None, segment_retries=DEFAULT_SEGMENT_RETRIES, hedge=False, content_store=None, quality_policy=None, fallback_only=False):
+    """Download vídeo, usando diretamente o .m3u8 final quando disponível, ou fallback por qualidade
+
+    Os segmentos são baixados em paralelo por até `max_workers` threads, mas a lista
+    de concatenação do ffmpeg continua na ordem da playlist. Todas as requisições
+    reutilizam as conexões keep-alive de `session`.
+
+    Cada aula tem um diretório de segmentos próprio com um manifesto de checkpoint;
+    se o download for interrompido, a próxima execução baixa só o que falta.
+    Os segmentos são gravados em disco em blocos de `chunk_size`, sem ficar inteiros na memória.
+
+    `concat_mode` escolhe como os segmentos viram o arquivo final:
+      - `files`: segmentos em disco (com checkpoint) + ffmpeg -f concat (padrão)
+      - `pipe`: segmentos enviados em ordem para o stdin do ffmpeg, sem arquivos temporários
+      - `ts`: concatenação MPEG-TS em Python puro, sem ffmpeg; gera um `.ts` em vez de `.mp4`
+    Nos modos `pipe` e `ts` não há checkpoint: uma falha recomeça o vídeo.
+
+    Com `defer_concat=True` (modo `files`), retorna um `PendingConcat` em vez de
+    concatenar; quem chamou decide quando executar `.run()`. Se o `.run()` falhar,
+    chamar de novo com `fallback_only=True` pula a playlist recebida e segue
+    direto para os fallbacks por qualidade.
+
+    Com `concurrency_controller` (um AdaptiveConcurrency), `max_workers` passa a ser
+    só o teto: o controlador ajusta quantos segmentos ficam ativos pela vazão medida
+    e por respostas 429/5xx, e a concorrência final é informada no log.
+
+    Cada segmento tem até `segment_retries` novas tentativas com backoff exponencial
+    e jitter (respeitando Retry-After); só depois disso a playlist é abandonada em
+    favor do fallback. Com `hedge=True`, um segmento que demora HEDGE_FACTOR vezes a
+    mediana ganha uma requisição duplicada e vale a que terminar primeiro.
+
+    Com `content_store` (um ContentStore), um vídeo já baixado para outro curso é
+    ligado em `output_dir` sem nenhuma requisição, e segmentos já baixados para
+    outra aula não são buscados de novo.
+
+    Com `quality_policy` (uma QualityPolicy), a rendição de uma playlist mestre e
+    as qualidades de fallback seguem os tetos e o orçamento da política, em vez
+    da maior resolução.
+    """
+    if concat_mode not in CONCAT_MODES:
+        raise ValueError(f"concat_mode inválido: {concat_mode} (use {', '.join(CONCAT_MODES)})")
+
+    session = session or get_session()
+    output_filename = video_output_filename(output_filename, concat_mode)
     output_path = os.path.join(output_dir, output_filename)
     if os.path.exists(output_path):
         logger.info(f"⏭️ Arquivo já existe: {output_path}")
         return True
+    stream_key = video_key(m3u8_url, output_filename, quality_policy.signature(output_filename) if quality_policy else None)
+    if content_store and content_store.restore_video(stream_key, output_path):
+        return True
 
-    headers = {
-        "Referer": "https://iframe.mediadelivery.net/",
-        "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36"
-    }
+    headers = SEGMENT_HEADERS
+    parts_dir = lesson_parts_dir(output_dir, output_filename)
+    paralelismo = f"{max_workers} em paralelo"
+    if concurrency_controller:
+        # As threads vão até o teto; o controlador decide quantas ficam ativas
+        max_workers = concurrency_controller.maximum
+        paralelismo = f"concorrência adaptativa, até {max_workers}"
 
-    def baixar_segmentos(m3u8_url_real):
+    latencias = LatencyTracker()
+    hedge_executor = ThreadPoolExecutor(max_workers=max(1, max_workers) * 2) if hedge else None
+
+    def tentar_segmento(segmento, consumir, cancel=None):
+        """Uma tentativa de GET; `consumir(resposta, cancel)` retorna (bytes lidos, resultado).
+
+        Com `concurrency_controller`, espera vaga no limite atual e informa status,
+        bytes e latência para o ajuste da concorrência.
+        """
+        if concurrency_controller:
+            concurrency_controller.acquire()
+        inicio = time.monotonic()
+        status = None
+        nbytes = 0
         try:
-            r = requests.get(m3u8_url_real, headers=headers)
-            if r.status_code != 200:
-                return False
+            with track_stage("segment", url=segmento.url, sequence=segmento.sequence), session.get(segmento.url, headers=segmento.request_headers(headers), timeout=30, stream=True) as seg_r:
+                status = seg_r.status_code
+                if status != 200 and not (status == 206 and segmento.byterange):
+                    raise SegmentError(segmento.url, status, retry_after_seconds(seg_r))
+                nbytes, resultado = consumir(seg_r, cancel)
+            latencias.record(time.monotonic() - inicio)
+            return resultado
+        except requests.RequestException:
+            status = None
+            raise
+        finally:
+            record_transfer(segmento.url, nbytes, time.monotonic() - inicio)
+            if concurrency_controller:
+                concurrency_controller.release(nbytes, time.monotonic() - inicio, status)
 
-            segment_urls = []
-            base_url = m3u8_url_real.rsplit('/', 1)[0]
-            for line in r.text.splitlines():
-                if line.strip().endswith(".ts"):
-                    segment_urls.append(f"{base_url}/{line.strip()}")
+    def requisitar_segmento(segmento, consumir):
+        """Baixa um segmento com novas tentativas (backoff exponencial com jitter) e,
+        se `hedge`, uma requisição duplicada quando ele demora bem mais que a mediana."""
+        for tentativa in range(segment_retries + 1):
+            try:
+                hedge_after = latencias.hedge_delay() if hedge_executor else None
+                if hedge_after is None:
+                    return tentar_segmento(segmento, consumir)
+                return hedged_call(hedge_executor, lambda cancel: tentar_segmento(segmento, consumir, cancel), hedge_after)
+            except SegmentError as e:
+                if e.status not in RETRYABLE_STATUS or tentativa == segment_retries:
+                    logger.error(f"❌ Erro ao baixar segmento {segmento.url}: {e.status}")
+                    raise
+                motivo = f"status {e.status}"
+                RETRIES.inc(stage="segment", reason=e.status)
+                atraso = e.retry_after if e.retry_after is not None else backoff_delay(tentativa)
+            except requests.RequestException as e:
+                if tentativa == segment_retries:
+                    logger.error(f"❌ Erro ao baixar segmento {segmento.url}: {e}")
+                    raise
+                motivo = type(e).__name__
+                RETRIES.inc(stage="segment", reason=motivo)
+                atraso = backoff_delay(tentativa)
+            logger.warning(f"⚠️ Segmento falhou ({motivo}), tentativa {tentativa + 2}/{segment_retries + 1} em {atraso:.1f}s: {segmento.url}")
+            record_sleep("backoff", atraso)
+            time.sleep(atraso)
 
-            if not segment_urls:
-                return False
+    def arquivar(segmentos):
+        """Guarda o vídeo pronto no content_store; os segmentos dele deixam de ser necessários"""
+        if not content_store:
+            return
+        try:
+            content_store.add_video(stream_key, output_path)
+            content_store.release_segments(segment_key(segmento) for segmento in segmentos)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"⚠️ Não foi possível guardar {output_path} no armazenamento de conteúdo: {e}")
+
+    def baixar_segmento(segmento, seg_path, manifest):
+        def consumir(seg_r, cancel):
+            # Grava em .part e renomeia, para que um segmento parcial nunca conte como concluído.
+            # O .part leva o id da thread: uma requisição duplicada grava em outro arquivo.
+            size, sha256 = stream_to_file(
+                seg_r, seg_path, chunk_size,
+                cancel=cancel,
+                part_path=f"{seg_path}.{threading.get_ident()}.part",
+            )
+            return size, (size, sha256)
+        size, sha256 = requisitar_segmento(segmento, consumir)
+        manifest.record(os.path.basename(seg_path), size, sha256)
+        if content_store:
+            try:
+                content_store.add_segment(segment_key(segmento), seg_path, size, sha256)
+            except (OSError, sqlite3.Error) as e:
+                # O segmento já está no checkpoint; só não fica disponível para outras aulas
+                logger.debug(f"Segmento não guardado no armazenamento de conteúdo: {e}")
+
+    def baixar_segmento_em_memoria(segmento):
+        if content_store:
+            guardado = content_store.read_segment(segment_key(segmento))
+            if guardado is not None:
+                return guardado
+
+        def consumir(seg_r, cancel):
+            buffer = io.BytesIO()
+            nbytes, _ = stream_response(seg_r, buffer, chunk_size, cancel)
+            return nbytes, buffer.getbuffer()
+        return requisitar_segmento(segmento, consumir)
 
-            temp_dir = os.path.join(output_dir, f"temp_{int(time.time())}")
-            os.makedirs(temp_dir, exist_ok=True)
-            lista_concat = os.path.join(temp_dir, "lista.txt")
-
-            logger.info(f"⬇️ Baixando {len(segment_urls)} segmentos .ts...")
-            with open(lista_concat, 'w') as f:
-                for i, url in enumerate(tqdm(segment_urls, desc="Downloading segments")):
-                    seg_name = f"seg_{i:04d}.ts"
-                    seg_path = os.path.join(temp_dir, seg_name)
-                    seg_r = requests.get(url, headers=headers)
-                    if seg_r.status_code == 200:
-                        with open(seg_path, 'wb') as out:
-                            out.write(seg_r.content)
-                        f.write(f"file '{seg_name}'\n")
-                    else:
-                        logger.error(f"❌ Erro ao baixar segmento {url}: {seg_r.status_code}")
-                        raise Exception("Segmento não encontrado")
-
-            logger.info(f"📦 Concatenando segmentos com ffmpeg...")
-            output_temp = f"temp_{int(time.time())}.mp4"
-            command = [
-                'ffmpeg',
-                '-y',
-                '-f', 'concat',
-                '-safe', '0',
-                '-i', 'lista.txt',
-                '-c', 'copy',
-                output_temp
-            ]
-
-            process = subprocess.run(command, cwd=temp_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            if process.returncode == 0:
-                shutil.move(os.path.join(temp_dir, output_temp), output_path)
-                logger.info(f"✅ Download e concatenação concluídos: {output_path}")
-                shutil.rmtree(temp_dir)
-                return True
+    def reaproveitar_segmentos(temp_dir, pendentes, manifest):
+        """Liga no checkpoint os segmentos que outra aula já baixou; retorna os que faltam"""
+        faltando = []
+        for segmento, seg_name in pendentes:
+            guardado = content_store.restore_segment(segment_key(segmento), os.path.join(temp_dir, seg_name))
+            if guardado is None:
+                faltando.append((segmento, seg_name))
             else:
-                logger.error(f"❌ Erro ao concatenar: {process.stderr.decode()}")
-                shutil.rmtree(temp_dir)
+                manifest.record(seg_name, *guardado)
+        if len(faltando) < len(pendentes):
+            logger.info(f"♻️ {len(pendentes) - len(faltando)} segmentos reaproveitados de outra aula")
+        return faltando
+
+    def baixar_em_arquivos(m3u8_url_real, segmentos):
+        """Modo `files`: segmentos em disco com checkpoint, depois ffmpeg -f concat"""
+        # Cada playlist (principal ou fallback) tem seu próprio checkpoint
+        temp_dir = checkpoint_dir(parts_dir, m3u8_url_real)
+        os.makedirs(temp_dir, exist_ok=True)
+        seg_names = [f"seg_{i:04d}.ts" for i in range(len(segmentos))]
+        manifest = SegmentManifest(os.path.join(temp_dir, MANIFEST_NAME), m3u8_url_real)
+
+        pendentes = [
+            (segmento, seg_name) for segmento, seg_name in zip(segmentos, seg_names)
+            if not manifest.is_complete(seg_name, os.path.join(temp_dir, seg_name))
+        ]
+        if len(pendentes) < len(segmentos):
+            logger.info(f"♻️ Retomando download: {len(segmentos) - len(pendentes)}/{len(segmentos)} segmentos já baixados")
+        if content_store and pendentes:
+            pendentes = reaproveitar_segmentos(temp_dir, pendentes, manifest)
+
+        if pendentes:
+            logger.info(f"⬇️ Baixando {len(pendentes)} segmentos .ts ({paralelismo})...")
+            executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+            try:
+                futures = [
+                    executor.submit(baixar_segmento, segmento, os.path.join(temp_dir, seg_name), manifest)
+                    for segmento, seg_name in pendentes
+                ]
+                from tqdm import tqdm
+
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Downloading segments"):
+                    future.result()
+            finally:
+                # Em caso de erro, não espera pelos segmentos que ainda nem começaram
+                executor.shutdown(wait=True, cancel_futures=True)
+                manifest.flush()
+
+        concat = PendingConcat(temp_dir, seg_names, output_path, parts_dir, on_success=lambda: arquivar(segmentos))
+        if defer_concat:
+            return concat
+        return concat.run()
+
+    def transmitir_segmentos(segmentos):
+        """Modos `pipe` e `ts`: segmentos baixados em paralelo e escritos em ordem, sem arquivos temporários"""
+        output_part = f"{output_path}.part"
+        if concat_mode == CONCAT_PIPE:
+            destino = FfmpegPipeSink(output_part)
+            logger.info(f"⬇️ Transmitindo {len(segmentos)} segmentos para o ffmpeg ({paralelismo})...")
+        else:
+            destino = TsFileSink(output_part)
+            logger.info(f"⬇️ Concatenando {len(segmentos)} segmentos .ts em {output_filename} ({paralelismo})...")
+
+        try:
+            escrever_em_ordem(
+                segmentos,
+                baixar_segmento_em_memoria,
+                destino.write,
+                max_workers,
+            )
+        except BaseException:
+            destino.abort()
+            raise
+
+        with track_stage("concat"):
+            # O ffmpeg termina de gravar o mp4 depois do último segmento
+            fechado = destino.close()
+        if not fechado:
+            return False
+        os.replace(output_part, output_path)
+        logger.info(f"✅ Download e concatenação concluídos: {output_path}")
+        arquivar(segmentos)
+        return True
+
+    def baixar_segmentos(playlist):
+        try:
+            if playlist.is_master:
+                # Recebemos a playlist mestre: desce para a melhor variante (ou a da política)
+                variant, media = choose_variant(
+                    playlist, quality_policy, output_filename,
+                    lambda url: fetch_playlist(session, url, headers, timeout=30),
+                )
+                logger.info(f"🎯 Playlist mestre: usando a variante {variant.height}p")
+                playlist = media or fetch_playlist(session, variant.url, headers, timeout=30)
+                if playlist is None:
+                    return False
+
+            if not playlist.segments:
+                return False
+            if playlist.encryption:
+                logger.error(f"❌ Segmentos criptografados ({playlist.encryption}) não são suportados")
                 return False
 
+            if concat_mode == CONCAT_FILES:
+                return baixar_em_arquivos(playlist.url, playlist.segments)
+            return transmitir_segmentos(playlist.segments)
+
         except Exception as e:
             logger.error(f"❌ Falha no download ou concatenação: {str(e)}")
             return False
 
-    # 1. Tenta baixar direto do .m3u8 recebido
-    if baixar_segmentos(m3u8_url):
-        return True
+    def baixar_e_reportar(playlist):
+        resultado = baixar_segmentos(playlist)
+        if concurrency_controller:
+            logger.info(f"🎛️ Concorrência ajustada: {concurrency_controller.report()}")
+        return resultado
 
-    # 2. Fallback para estruturas antigas 1080p/720p
-    base_url = m3u8_url.rsplit('/', 1)[0]
-    for quality in ["1080p", "720p"]:
-        fallback_url = f"{base_url}/{quality}/video.m3u8"
-        logger.info(f"⚠️ Tentando fallback: {fallback_url}")
-        if baixar_segmentos(fallback_url):
-            return True
-        else:
-            logger.warning(f"⚠️ Qualidade {quality} indisponível, tentando próxima...")
+    try:
+        # 1. Tenta baixar direto do .m3u8 recebido
+        principal = None
+        if not fallback_only:
+            try:
+                principal = fetch_playlist(session, m3u8_url, headers, timeout=30)
+            except requests.RequestException as e:
+                logger.error(f"❌ Erro ao baixar playlist {m3u8_url}: {e}")
+        if principal is not None:
+            resultado = baixar_e_reportar(principal)
+            if resultado:
+                return resultado
 
-    logger.error("❌ Nenhuma qualidade disponível para download.")
-    return False
+        # 2. Fallback para estruturas antigas 1080p/720p: as playlists são sondadas
+        # em paralelo e tentadas em ordem de qualidade
+        fallbacks = fallback_playlist_urls(m3u8_url, quality_policy, output_filename)
+        sondadas = dict(probe_playlists(session, [url for _, url in fallbacks], headers))
+        for quality, fallback_url in fallbacks:
+            playlist = sondadas.get(fallback_url)
+            if playlist is None:
+                logger.warning(f"⚠️ Qualidade {quality} indisponível, tentando próxima...")
+                continue
+            logger.info(f"⚠️ Tentando fallback: {fallback_url}")
+            resultado = baixar_e_reportar(playlist)
+            if resultado:
+                return resultado
+            else:
+                logger.warning(f"⚠️ Qualidade {quality} indisponível, tentando próxima...")
 
+        logger.error("❌ Nenhuma qualidade disponível para download.")
+        return False
+    finally:
+        if hedge_executor:
+            # Cópias perdedoras já foram sinalizadas; não há por que esperar por elas
+            hedge_executor.shutdown(wait=False, cancel_futures=True)
 
-def download_m3u8_segments(m3u8_url, output_path):
+
+def download_m3u8_segments(m3u8_url, output_path, headers=None, session=None, chunk_size=DEFAULT_CHUNK_SIZE):
     """
     1. Baixa o .m3u8
-    2. Substitui URLs relativas por absolutas
+    2. Interpreta a playlist, com URLs relativas resolvidas para absolutas
     3. Baixa cada segmento .ts
     4. Concatena com ffmpeg -f concat
     """
+    session = session or get_session()
+    output_dir = os.path.dirname(output_path)
     try:
         # Pasta temporária para segmentos
         segment_dir = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(output_path))[0]}_segments")
@@ -116,56 +602,33 @@ def download_m3u8_segments(m3u8_url, output_path):
             os.makedirs(segment_dir)
         
         # 1. Baixar o .m3u8
-        m3u8_headers = {
-            "Referer": "https://hub.asimov.academy/",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:112.0) Gecko/20100101 Firefox/112.0",
-            "Cookie": cookies
-        }
-        r = requests.get(m3u8_url, headers=m3u8_headers)
+        m3u8_headers = headers
+        r = session.get(m3u8_url, headers=m3u8_headers, timeout=30)
         if r.status_code != 200:
             logger.error(f"❌ Erro ao baixar playlist .m3u8: {r.status_code}")
             return False
         
-        playlist_content = r.text.splitlines()
-        
-        # 2. Ajustar URLs relativas -> absolutas
-        base_url = os.path.dirname(m3u8_url)
-        absolute_lines = []
-        for line in playlist_content:
-            if line.startswith("#"):
-                # Linha de metadata
-                absolute_lines.append(line)
-            else:
-                # Segmento .ts (ou sub-playlist)
-                if not line.startswith("http"):
-                    # Converter para URL absoluta
-                    line = f"{base_url}/{line}"
-                absolute_lines.append(line)
-        
+        # 2. Interpretar a playlist (URLs relativas viram absolutas)
+        playlist = parse_playlist(r.text, m3u8_url)
+
         # 3. Baixar cada segmento .ts e gerar lista de concat
         concat_list_path = os.path.join(segment_dir, "file_list.txt")
         with open(concat_list_path, "w", encoding="utf-8") as concat_file:
             segment_index = 0
-            for line in absolute_lines:
-                if line.startswith("#"):
-                    continue
-                segment_url = line.strip()
+            for segmento in playlist.segments:
                 segment_filename = f"segment_{segment_index}.ts"
                 segment_filepath = os.path.join(segment_dir, segment_filename)
                 
                 # Baixar segmento
-                seg_resp = requests.get(segment_url, headers=m3u8_headers, stream=True)
-                if seg_resp.status_code == 200:
-                    with open(segment_filepath, "wb") as sf:
-                        for chunk in seg_resp.iter_content(chunk_size=8192):
-                            sf.write(chunk)
-                    
-                    # Adicionar ao file_list.txt
-                    concat_file.write(f"file '{segment_filename}'\n")
-                    segment_index += 1
-                else:
-                    logger.error(f"❌ Erro ao baixar segmento {segment_url}: {seg_resp.status_code}")
-                    return False
+                with session.get(segmento.url, headers=segmento.request_headers(m3u8_headers), stream=True, timeout=30) as seg_resp:
+                    if seg_resp.status_code not in (200, 206):
+                        logger.error(f"❌ Erro ao baixar segmento {segmento.url}: {seg_resp.status_code}")
+                        return False
+                    stream_to_file(seg_resp, segment_filepath, chunk_size)
+
+                # Adicionar ao file_list.txt
+                concat_file.write(f"file '{segment_filename}'\n")
+                segment_index += 1
         
         # 4. Concatena com ffmpeg
         temp_output_path = f"{output_path}.part"
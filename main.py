@@ -1,29 +1,25 @@
 import os
 import time
 import json
-import shutil
-import pickle
 import requests
-import subprocess
-from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
-from downloader.utils import sanitize_filename
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from tqdm import tqdm
-from markdownify import markdownify as md
-from downloader.extract_m3u8 import extract_m3u8_url  # type: ignore
-from downloader.auth import login_and_get_cookies
-from downloader.parser import extract_iframe_url, extract_lesson_title
-from downloader.lessons import process_lesson, process_multiple_lessons, process_course
+import threading
+from downloader.lessons import process_lesson, process_multiple_lessons, process_course, download_course_lessons
 import logging
-from downloader.video_downloader import download_video_with_fallback
+from downloader.video_downloader import DEFAULT_MAX_WORKERS, CONCAT_FILES
+from downloader.session import create_session, peak_connections
+from downloader.auth import SessionManager
+from downloader.ratelimit import HostRateLimiter
+from downloader.adaptive import AdaptiveConcurrency
+from downloader.retry import DEFAULT_SEGMENT_RETRIES
+from downloader.cache import ResolutionCache, CACHE_NAME, DEFAULT_TTL
+from downloader.httpcache import PageCache
+from downloader.state import CourseState, STATE_NAME
+from downloader.store import ContentStore, STORE_NAME
+from downloader.quality import QualityPolicy
+from downloader.catalog import CatalogIndex, CATALOG_NAME, crawl_catalog
+from downloader.document import as_document
+from downloader.metrics import track_stage, start_http_server, start_file_writer
+from downloader.tracing import TRACER
 
 
 # Configure logging
@@ -39,16 +35,65 @@ logger = logging.getLogger("AsimovDownloader")
 
 
 class AsimovDownloader:
-    def __init__(self, email, password, output_dir="downloads", config_dir=".config", max_retries=3, wait_time=2):
+    def __init__(self, email, password, output_dir="downloads", config_dir=".config", max_retries=3, wait_time=2, max_workers=DEFAULT_MAX_WORKERS, concat_mode=CONCAT_FILES, pipeline=True, engine="sync", rate_limits=None, adaptive_concurrency=False, segment_retries=DEFAULT_SEGMENT_RETRIES, hedge_requests=False, resolution_cache_ttl=DEFAULT_TTL, http_cache=True, incremental_sync=True, content_store=True, quality=None):
         self.email = email
         self.password = password
-        self.cookies = None
-        self.headers = None
         self.output_dir = output_dir
         self.config_dir = config_dir
         self.session_file = os.path.join(config_dir, "asimov_session.pkl")
         self.max_retries = max_retries
         self.wait_time = wait_time
+        self.max_workers = max_workers
+        # Sobrepõe as etapas de aulas consecutivas em process_multiple_lessons
+        self.pipeline = pipeline
+        # "sync" (threads, padrão) ou "async" (asyncio + aiohttp)
+        self.engine = engine
+        # Sessão HTTP compartilhada por todos os módulos (keep-alive e limite de taxa por host).
+        # wait_time define o intervalo médio entre páginas do hub.
+        self.rate_limiter = HostRateLimiter.from_config(wait_time, rate_limits)
+        self.session = create_session(
+            pool_size=peak_connections(max_workers, hedge=hedge_requests),
+            rate_limiter=self.rate_limiter,
+        )
+        # Cookies de login compartilhados pelos workers; só um login acontece por vez
+        self.sessions = SessionManager(email, password, self.session_file, http_session=self.session)
+        # Índice dos cursos e aulas da conta, preenchido pela opção "Atualizar catálogo"
+        self.catalog = CatalogIndex(os.path.join(config_dir, CATALOG_NAME))
+        # Páginas do hub revalidadas com ETag/Last-Modified: página inalterada = resposta 304 vazia
+        self.page_cache = PageCache(os.path.join(config_dir, "pages")) if http_cache else None
+        # Opções repassadas pelas funções de aula até download_video_with_fallback
+        self.download_options = {
+            "max_workers": max_workers,
+            "session": self.session,
+            "concat_mode": concat_mode,
+            "segment_retries": segment_retries,
+            "hedge": hedge_requests,
+        }
+        if adaptive_concurrency:
+            # Um controlador para a sessão inteira: o valor aprendido passa de uma aula para a outra
+            self.download_options["concurrency_controller"] = AdaptiveConcurrency(
+                initial=min(4, max_workers),
+                maximum=max_workers,
+            )
+        if resolution_cache_ttl:
+            # Aula -> iframe -> .m3u8 já resolvidos não são buscados de novo dentro do TTL
+            self.download_options["resolution_cache"] = ResolutionCache(
+                os.path.join(config_dir, CACHE_NAME),
+                ttl=resolution_cache_ttl,
+            )
+        if incremental_sync:
+            # Status de cada aula: sincronizar um curso de novo só busca aulas novas ou que falharam
+            self.download_options["course_state"] = CourseState(os.path.join(config_dir, STATE_NAME))
+        if content_store:
+            # Vídeos e segmentos por conteúdo: o mesmo vídeo em outro curso vira um hardlink/reflink.
+            # Fica dentro de output_dir para que os links não cruzem sistemas de arquivos.
+            self.download_options["content_store"] = ContentStore(os.path.join(output_dir, STORE_NAME))
+            # Libera o espaço de vídeos cujas pastas de curso foram apagadas
+            self.download_options["content_store"].collect_garbage()
+        # Tetos de resolução/banda e orçamento de disco por curso; sem política, a maior qualidade
+        self.quality_policy = QualityPolicy.from_config(quality)
+        if self.quality_policy:
+            self.download_options["quality_policy"] = self.quality_policy
         # self.lesson_urls = lesson_urls
         self.process_lesson= process_lesson
         # self.save_lesson_as_markdown= save_lesson_as_markdown
@@ -59,73 +104,78 @@ class AsimovDownloader:
             if not os.path.exists(directory):
                 os.makedirs(directory)
         
-        # Try to load existing session first
-        if not self.load_session():
+        # Try to load existing session first; it is checked against the hub in the background
+        self._session_check = None
+        if self.sessions.load():
+            logger.info("✅ Sessão existente carregada com sucesso!")
+            self._session_check = threading.Thread(target=self.validate_session, name="session-check", daemon=True)
+            self._session_check.start()
+        else:
             # If no valid session found, login and get new cookies
-            self.headers = login_and_get_cookies(self.email, self.password, save_path=self.session_file)
-            self.cookies = self.headers["Cookie"] if self.headers else None
-            self.save_session()
+            logger.info("ℹ️ Nenhuma sessão válida encontrada.")
+            self.sessions.refresh()
 
+    @property
+    def headers(self):
+        return self.sessions.headers
+
+    @property
+    def cookies(self):
+        return self.sessions.cookies
+
+    def validate_session(self):
+        """Test if the loaded session is still valid, logging in again if the hub redirects to login"""
+        try:
+            generation = self.sessions.generation
+            test_url = "https://hub.asimov.academy/dashboard/"
+            response = self.session.get(test_url, timeout=30)
+            if "login" not in response.url.lower():
+                logger.debug("✅ Sessão validada no hub.")
+                return
+            logger.warning("⚠️ Sessão salva expirou no hub, fazendo novo login...")
+            self.sessions.refresh(generation)
+        except Exception as e:
+            # Sem rede agora: get_course_page refaz o login se o hub redirecionar depois
+            logger.warning(f"⚠️ Não foi possível validar a sessão: {e}")
+
+    def ensure_session(self):
+        """Espera a validação em segundo plano terminar (se ainda estiver rodando)"""
+        session_check = self._session_check
+        if session_check is not None:
+            session_check.join()
+            self._session_check = None
     
-    def load_session(self):
-        """Try to load existing session cookies if they exist and are still valid"""
-        if os.path.exists(self.session_file):
-            try:
-                with open(self.session_file, 'rb') as f:
-                    session_data = pickle.load(f)
-                
-                # Check if session is not expired (less than 1 day old)
-                if datetime.now() - session_data.get('timestamp', datetime.min) < timedelta(days=1):
-                    self.cookies = session_data.get('cookies')
-                    self.headers = {
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:112.0) Gecko/20100101 Firefox/112.0",
-                        "Referer": "https://hub.asimov.academy/",
-                        "Cookie": self.cookies
-                    }
-                    
-                    # Test if the session is still valid
-                    test_url = "https://hub.asimov.academy/dashboard/"
-                    response = requests.get(test_url, headers=self.headers)
-                    
-                    if "login" not in response.url.lower():
-                        logger.info("✅ Sessão existente carregada com sucesso!")
-                        logger.debug(f"🍪 Cookies aplicados: {self.cookies}")
-
-                        return True
-            except Exception as e:
-                logger.warning(f"⚠️ Erro ao carregar sessão existente: {e}")
-        
-        logger.info("ℹ️ Nenhuma sessão válida encontrada.")
-        return False
-    
-    def save_session(self):
-        """Save current session cookies for future use"""
-        session_data = {
-            'cookies': self.cookies,
-            'timestamp': datetime.now()
-        }
-        
-        with open(self.session_file, 'wb') as f:
-            pickle.dump(session_data, f)
-        
-        logger.info("✅ Sessão salva para uso futuro.")
-    
-    
-    def get_course_page(self, course_url, retry=0):
+    def get_course_page(self, course_url):
         """Get course page with retry mechanism"""
+        with track_stage("page", url=course_url):
+            return self._get_course_page(course_url)
+
+    def _get_course_page(self, course_url, retry=0):
+        self.ensure_session()
         try:
-            response = requests.get(course_url, headers=self.headers, timeout=30)
+            validators = self.page_cache.conditional_headers(course_url) if self.page_cache else {}
+            # Geração do login usada nesta requisição: se outro worker já renovou, não loga de novo
+            generation = self.sessions.generation
+            response = self.session.get(course_url, headers=validators, timeout=30)
             
             # Check if redirected to login page
             if "login" in response.url.lower() and retry < self.max_retries:
                 logger.warning("⚠️ Sessão expirada, tentando novo login...")
-                self.headers = login_and_get_cookies(self.email, self.password, save_path=self.session_file)
-                self.cookies = self.headers["Cookie"] if self.headers else None
-                self.save_session()
+                self.sessions.refresh(generation)
 
-                return self.get_course_page(course_url, retry + 1)
+                return self._get_course_page(course_url, retry + 1)
                 
+            if response.status_code == 304 and validators:
+                body = self.page_cache.load(course_url)
+                if body is not None:
+                    logger.debug(f"♻️ Página inalterada, usando cópia local: {course_url}")
+                    return body
+                # Cópia local sumiu: busca de novo, agora sem validadores
+                return self._get_course_page(course_url, retry + 1)
+
             if response.status_code == 200:
+                if self.page_cache:
+                    self.page_cache.store(course_url, response)
                 return response.text
             else:
                 logger.error(f"❌ Erro ao acessar a página: {response.status_code}")
@@ -137,12 +187,15 @@ class AsimovDownloader:
                 wait_time = (retry + 1) * 5  # Exponential backoff
                 logger.info(f"⏳ Tentando novamente em {wait_time} segundos...")
                 time.sleep(wait_time)
-                return self.get_course_page(course_url, retry + 1)
+                return self._get_course_page(course_url, retry + 1)
             return None
 
 
     def save_lesson_as_markdown(self, lesson_title, lesson_html, prefix=None):
-        """Salva o conteúdo da aula como Markdown limpo e com nome numerado"""
+        """Salva o conteúdo da aula como Markdown limpo e com nome numerado
+
+        Retorna o caminho do .md gravado, ou False em caso de falha.
+        """
         from markdownify import markdownify as md
 
         if prefix:
@@ -153,15 +206,16 @@ class AsimovDownloader:
         output_path = os.path.join(self.output_dir, output_filename)
 
         try:
-            soup = BeautifulSoup(lesson_html, "html.parser")
+            # Reaproveita o parse feito para procurar o iframe (lesson_html pode ser um HtmlDocument)
+            document = as_document(lesson_html)
 
             # Tenta selecionar o conteúdo da aula (ajustável conforme necessidade)
             content_candidates = [
-                soup.select_one("article"),
-                soup.select_one("main"),
-                soup.select_one(".lesson-content"),
-                soup.select_one(".content"),
-                soup.body
+                document.select_one("article"),
+                document.select_one("main"),
+                document.select_one(".lesson-content"),
+                document.select_one(".content"),
+                document.soup.body
             ]
             main_content = next((c for c in content_candidates if c), None)
 
@@ -186,7 +240,7 @@ class AsimovDownloader:
                 f.write(markdown_text.strip())
 
             logger.info(f"📝 Aula salva em markdown com prefixo: {output_filename}")
-            return True
+            return output_path
 
         except Exception as e:
             logger.error(f"❌ Erro ao salvar markdown: {e}")
@@ -199,6 +253,22 @@ def main():
     email = None
     password = None
     output_dir = "downloads"
+    max_workers = DEFAULT_MAX_WORKERS
+    concat_mode = CONCAT_FILES
+    pipeline = True
+    engine = "sync"
+    rate_limits = None
+    adaptive_concurrency = False
+    segment_retries = DEFAULT_SEGMENT_RETRIES
+    hedge_requests = False
+    resolution_cache_ttl = DEFAULT_TTL
+    http_cache = True
+    incremental_sync = True
+    content_store = True
+    quality = None
+    metrics_port = None
+    metrics_file = None
+    trace_file = None
     
     if os.path.exists(config_file):
         try:
@@ -207,6 +277,22 @@ def main():
                 email = config.get('email')
                 password = config.get('password')
                 output_dir = config.get('output_dir', 'downloads')
+                max_workers = config.get('max_workers', DEFAULT_MAX_WORKERS)
+                concat_mode = config.get('concat_mode', CONCAT_FILES)
+                pipeline = config.get('pipeline', True)
+                engine = config.get('engine', "sync")
+                rate_limits = config.get('rate_limits')
+                adaptive_concurrency = config.get('adaptive_concurrency', False)
+                segment_retries = config.get('segment_retries', DEFAULT_SEGMENT_RETRIES)
+                hedge_requests = config.get('hedge_requests', False)
+                resolution_cache_ttl = config.get('resolution_cache_ttl', DEFAULT_TTL)
+                http_cache = config.get('http_cache', True)
+                incremental_sync = config.get('incremental_sync', True)
+                content_store = config.get('content_store', True)
+                quality = config.get('quality')
+                metrics_port = config.get('metrics_port')
+                metrics_file = config.get('metrics_file')
+                trace_file = config.get('trace_file')
         except Exception as e:
             logger.error(f"❌ Erro ao carregar arquivo de configuração: {str(e)}")
     
@@ -233,6 +319,18 @@ def main():
             except Exception as e:
                 logger.error(f"❌ Erro ao salvar configurações: {str(e)}")
 
+    # Métricas no formato Prometheus, para acompanhar lotes longos
+    if metrics_port:
+        try:
+            start_http_server(metrics_port)
+        except OSError as e:
+            logger.error(f"❌ Não foi possível abrir a porta de métricas {metrics_port}: {e}")
+    if metrics_file:
+        start_file_writer(metrics_file)
+    if trace_file:
+        # Spans de cada aula e etapa, gravados em trace_file ao fim de cada opção do menu
+        TRACER.enable()
+
     # Initialize downloader
     downloader = AsimovDownloader(
         email=email, 
@@ -240,6 +338,19 @@ def main():
         output_dir=output_dir,
         max_retries=3,
         wait_time=3,
+        max_workers=max_workers,
+        concat_mode=concat_mode,
+        pipeline=pipeline,
+        engine=engine,
+        rate_limits=rate_limits,
+        adaptive_concurrency=adaptive_concurrency,
+        segment_retries=segment_retries,
+        hedge_requests=hedge_requests,
+        resolution_cache_ttl=resolution_cache_ttl,
+        http_cache=http_cache,
+        incremental_sync=incremental_sync,
+        content_store=content_store,
+        quality=quality,
     )
 
     shared_args = {
@@ -253,18 +364,40 @@ def main():
 
 
     while True:
+        if trace_file and len(TRACER):
+            TRACER.save(trace_file)
         print("\n" + "="*50)
         print("🎓 Asimov Downloader 2.0")
         print("="*50)
         print("1. Baixar aula específica")
         print("2. Baixar várias aulas")
         print("3. Baixar curso completo")
-        print("4. Sair")
+        print("4. Atualizar catálogo de cursos da conta")
+        print("5. Baixar cursos do catálogo")
+        print("6. Sair")
         
-        choice = input("\n🔢 Escolha uma opção (1-4): ")
+        choice = input("\n🔢 Escolha uma opção (1-6): ")
+        if choice in ("1", "2", "3", "4", "5"):
+            # Os headers repassados abaixo precisam refletir um eventual novo login
+            downloader.ensure_session()
         
         if choice == "1":
             lesson_url = input("🔗 Digite a URL da aula: ")
+            if downloader.engine == "async":
+                # Uma lista de uma aula só, pelo engine assíncrono
+                process_multiple_lessons(
+                    lesson_urls=[lesson_url],
+                    process_lesson=process_lesson,
+                    get_course_page=downloader.get_course_page,
+                    save_lesson_as_markdown=downloader.save_lesson_as_markdown,
+                    headers=downloader.headers,
+                    max_retries=downloader.max_retries,
+                    wait_time=downloader.wait_time,
+                    output_dir=downloader.output_dir,
+                    engine=downloader.engine,
+                    **downloader.download_options
+                )
+                continue
             process_lesson(
                 save_lesson_as_markdown=downloader.save_lesson_as_markdown,
                 headers=downloader.headers,
@@ -273,7 +406,8 @@ def main():
                 output_dir=downloader.output_dir,
                 get_course_page=downloader.get_course_page,
                 lesson_url=lesson_url,
-                prefix="1"
+                prefix="1",
+                **downloader.download_options
             )
 
             
@@ -295,7 +429,10 @@ def main():
                 headers=downloader.headers,
                 max_retries=downloader.max_retries,
                 wait_time=downloader.wait_time,
-                output_dir=downloader.output_dir
+                output_dir=downloader.output_dir,
+                pipeline=downloader.pipeline,
+                engine=downloader.engine,
+                **downloader.download_options
             )
             else:
                 logger.warning("⚠️ Nenhuma URL fornecida.")
@@ -311,10 +448,52 @@ def main():
             headers=downloader.headers,
             max_retries=downloader.max_retries,
             wait_time=downloader.wait_time,
-            output_dir=downloader.output_dir
+            output_dir=downloader.output_dir,
+            pipeline=downloader.pipeline,
+            engine=downloader.engine,
+            **downloader.download_options
         )
             
         elif choice == "4":
+            crawl_catalog(downloader.get_course_page, downloader.catalog)
+
+        elif choice == "5":
+            if not downloader.catalog.courses:
+                logger.warning("⚠️ Catálogo vazio. Use a opção 4 para atualizá-lo.")
+                continue
+            courses = downloader.catalog.search(input("🔎 Filtrar cursos por nome (Enter para todos): "))
+            for number, course in enumerate(courses, 1):
+                print(f"{number:3d}. {course['title']} ({len(course['lessons'])} aulas)")
+            if not courses:
+                logger.warning("⚠️ Nenhum curso corresponde ao filtro.")
+                continue
+
+            selection = input("🔢 Cursos a baixar (ex: 1,3,5 ou 'todos'): ").strip().lower()
+            if selection != "todos":
+                try:
+                    courses = [courses[int(n) - 1] for n in selection.split(",") if n.strip()]
+                except (ValueError, IndexError):
+                    logger.warning("⚠️ Seleção inválida.")
+                    continue
+
+            # As aulas vêm do índice: nenhuma página de curso é buscada de novo
+            for course in courses:
+                logger.info(f"\n📚 Processando curso: {course['url']}")
+                download_course_lessons(
+                    course['title'],
+                    course['lessons'],
+                    get_course_page=downloader.get_course_page,
+                    save_lesson_as_markdown=downloader.save_lesson_as_markdown,
+                    headers=downloader.headers,
+                    max_retries=downloader.max_retries,
+                    wait_time=downloader.wait_time,
+                    output_dir=downloader.output_dir,
+                    pipeline=downloader.pipeline,
+                    engine=downloader.engine,
+                    **downloader.download_options
+                )
+
+        elif choice == "6":
             print("👋 Saindo do programa. Até a próxima!")
             break
             
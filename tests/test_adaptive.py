@@ -0,0 +1,130 @@
+import pytest
+
+from downloader.adaptive import AdaptiveConcurrency, WINDOW_SECONDS, BASELINE_DECAY
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fechar_janela(controller, clock, nbytes=1000, latency=0.1, status=200):
+    """Registra uma requisição que termina no fim da janela atual, fechando-a"""
+    clock.now += WINDOW_SECONDS
+    controller.acquire()
+    controller.release(nbytes, latency, status)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_slow_start_doubles_while_throughput_grows(clock):
+    controller = AdaptiveConcurrency(initial=4, maximum=32, clock=clock)
+
+    limites = []
+    for nbytes in (1000, 2000, 4000, 8000):
+        fechar_janela(controller, clock, nbytes)
+        limites.append(controller.current)
+
+    assert limites == [8, 16, 32, 32]
+
+
+def test_additive_step_after_throughput_stops_growing(clock):
+    controller = AdaptiveConcurrency(initial=4, maximum=32, clock=clock)
+
+    fechar_janela(controller, clock, 1000)
+    assert controller.current == 8
+    # Vazão estável: fim do slow start, sem mudar o limite
+    fechar_janela(controller, clock, 1000)
+    assert controller.current == 8
+    assert not controller.slow_start
+
+    fechar_janela(controller, clock, 2000)
+    assert controller.current == 9
+    fechar_janela(controller, clock, 3000)
+    assert controller.current == 10
+
+
+@pytest.mark.parametrize("status", [429, 503, None])
+def test_throttle_halves_once_per_window(clock, status):
+    controller = AdaptiveConcurrency(initial=16, clock=clock)
+
+    controller.acquire()
+    controller.release(0, None, status)
+    assert controller.current == 8
+    # Um segundo erro na mesma janela não corta de novo
+    clock.now += WINDOW_SECONDS / 2
+    controller.acquire()
+    controller.release(0, None, status)
+    assert controller.current == 8
+
+    clock.now += WINDOW_SECONDS
+    controller.acquire()
+    controller.release(0, None, status)
+    assert controller.current == 4
+    assert not controller.slow_start
+
+
+def test_throttle_respects_minimum(clock):
+    controller = AdaptiveConcurrency(initial=2, minimum=2, clock=clock)
+
+    controller.acquire()
+    controller.release(0, None, 429)
+    assert controller.current == 2
+
+
+def test_latency_increase_halves_limit(clock):
+    controller = AdaptiveConcurrency(initial=4, clock=clock)
+
+    fechar_janela(controller, clock, 1000, latency=0.1)
+    assert controller.current == 8
+    assert controller.latency_baseline == pytest.approx(0.1 / 1000)
+
+    # Mesma vazão, mas três vezes mais lento por byte: congestionamento
+    fechar_janela(controller, clock, 2000, latency=0.6)
+    assert controller.current == 4
+
+
+def test_latency_is_measured_per_byte(clock):
+    controller = AdaptiveConcurrency(initial=4, clock=clock)
+
+    fechar_janela(controller, clock, 1000, latency=0.1)
+    # Segmento maior com a mesma latência por byte não é congestionamento
+    fechar_janela(controller, clock, 5000, latency=0.5)
+    assert controller.current == 16
+
+
+def test_baseline_drops_at_once_and_rises_slowly(clock):
+    controller = AdaptiveConcurrency(initial=4, clock=clock)
+    base = 0.1 / 1000
+
+    fechar_janela(controller, clock, 1000, latency=0.1)
+    assert controller.latency_baseline == pytest.approx(base)
+
+    # Pior, mas abaixo do limite de congestionamento: a referência sobe só BASELINE_DECAY da diferença
+    fechar_janela(controller, clock, 1000, latency=0.15)
+    esperado = base + BASELINE_DECAY * (1.5 * base - base)
+    assert controller.latency_baseline == pytest.approx(esperado)
+
+    # Melhor: a referência cai de imediato
+    fechar_janela(controller, clock, 1000, latency=0.05)
+    assert controller.latency_baseline == pytest.approx(base / 2)
+
+
+def test_baseline_forgets_old_minimum(clock):
+    controller = AdaptiveConcurrency(initial=4, maximum=4, clock=clock)
+
+    fechar_janela(controller, clock, 1000, latency=0.1)
+    # Um CDN que ficou 1.9x mais lento de vez: a referência converge para o novo patamar
+    for _ in range(40):
+        fechar_janela(controller, clock, 1000, latency=0.19)
+    assert controller.latency_baseline == pytest.approx(0.19 / 1000, rel=0.01)
+
+    # Daí em diante 2x o mínimo antigo já não conta como congestionamento
+    fechar_janela(controller, clock, 1000, latency=0.21)
+    assert controller.current == 4
@@ -0,0 +1,122 @@
+import os
+import json
+import hashlib
+
+import pytest
+
+from downloader.checkpoint import SegmentManifest, MANIFEST_NAME, checkpoint_dir, playlist_key
+from downloader.video_downloader import download_video_with_fallback, lesson_parts_dir, PendingConcat
+
+PLAYLIST_URL = "https://vz-a.b-cdn.net/aula/720p/video.m3u8?token=abc"
+SEGMENTS = {f"https://vz-a.b-cdn.net/aula/720p/seg_{i}.ts": bytes([i]) * (100 + i) for i in range(4)}
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b""):
+        self.status_code = status_code
+        self.content = body
+        self.text = body.decode("utf-8", errors="replace")
+        self.headers = {}
+
+    def iter_content(self, chunk_size=1):
+        yield self.content
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """Serve a playlist e seus segmentos; registra os segmentos pedidos"""
+
+    def __init__(self):
+        self.requested = []
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        if url.split("?")[0].endswith(".m3u8"):
+            if url != PLAYLIST_URL:
+                return FakeResponse(404)
+            linhas = ["#EXTM3U", "#EXT-X-TARGETDURATION:4"]
+            for segment_url in SEGMENTS:
+                linhas += ["#EXTINF:4,", segment_url.rsplit("/", 1)[1]]
+            linhas.append("#EXT-X-ENDLIST")
+            return FakeResponse(200, "\n".join(linhas).encode())
+        self.requested.append(url)
+        return FakeResponse(200, SEGMENTS[url])
+
+
+def prepare_checkpoint(output_dir, sizes):
+    """Grava segmentos e manifesto como uma execução interrompida deixaria"""
+    temp_dir = checkpoint_dir(lesson_parts_dir(output_dir, "aula.mp4"), PLAYLIST_URL)
+    os.makedirs(temp_dir)
+    registrados = {}
+    for i, (url, body) in enumerate(SEGMENTS.items()):
+        if i not in sizes:
+            continue
+        name = f"seg_{i:04d}.ts"
+        with open(os.path.join(temp_dir, name), "wb") as f:
+            f.write(body[:sizes[i]])
+        registrados[name] = {"size": len(body), "sha256": hashlib.sha256(body).hexdigest()}
+    with open(os.path.join(temp_dir, MANIFEST_NAME), "w") as f:
+        json.dump({"playlist": playlist_key(PLAYLIST_URL), "segments": registrados}, f)
+    return temp_dir
+
+
+def download(output_dir, session):
+    return download_video_with_fallback(PLAYLIST_URL, "aula", output_dir, {}, max_workers=2, session=session, defer_concat=True)
+
+
+def test_size_mismatch_forces_redownload(tmp_path):
+    urls = list(SEGMENTS)
+    # seg 0 inteiro, seg 1 truncado, segs 2 e 3 nunca baixados
+    temp_dir = prepare_checkpoint(str(tmp_path), {0: len(SEGMENTS[urls[0]]), 1: 10})
+    session = FakeSession()
+
+    concat = download(str(tmp_path), session)
+
+    assert isinstance(concat, PendingConcat)
+    assert sorted(session.requested) == urls[1:]
+    for i, body in enumerate(SEGMENTS.values()):
+        with open(os.path.join(temp_dir, f"seg_{i:04d}.ts"), "rb") as f:
+            assert f.read() == body
+
+
+def test_complete_manifest_skips_straight_to_concat(tmp_path):
+    temp_dir = prepare_checkpoint(str(tmp_path), {i: len(body) for i, body in enumerate(SEGMENTS.values())})
+    session = FakeSession()
+
+    concat = download(str(tmp_path), session)
+
+    assert session.requested == []
+    assert concat.temp_dir == temp_dir
+    assert concat.seg_names == [f"seg_{i:04d}.ts" for i in range(len(SEGMENTS))]
+
+
+def test_manifest_of_another_playlist_is_discarded(tmp_path):
+    path = str(tmp_path / MANIFEST_NAME)
+    with open(path, "w") as f:
+        json.dump({"playlist": "outro.cdn/video.m3u8", "segments": {"seg_0000.ts": {"size": 1, "sha256": "x"}}}, f)
+
+    assert SegmentManifest(path, PLAYLIST_URL).segments == {}
+
+
+def test_manifest_ignores_query_string_tokens(tmp_path):
+    path = str(tmp_path / MANIFEST_NAME)
+    manifest = SegmentManifest(path, PLAYLIST_URL)
+    manifest.record("seg_0000.ts", 3, "abc")
+    manifest.flush()
+
+    (tmp_path / "seg_0000.ts").write_bytes(b"123")
+    retomado = SegmentManifest(path, PLAYLIST_URL.replace("token=abc", "token=novo"))
+    assert retomado.is_complete("seg_0000.ts", str(tmp_path / "seg_0000.ts"))
+    (tmp_path / "seg_0000.ts").write_bytes(b"12")
+    assert not retomado.is_complete("seg_0000.ts", str(tmp_path / "seg_0000.ts"))
+
+
+@pytest.mark.parametrize("conteudo", ["", "{nao e json"])
+def test_invalid_manifest_starts_over(tmp_path, conteudo):
+    path = tmp_path / MANIFEST_NAME
+    path.write_text(conteudo)
+    assert SegmentManifest(str(path), PLAYLIST_URL).segments == {}
@@ -0,0 +1,82 @@
+import pytest
+
+from downloader.extract_m3u8 import M3U8Scanner, M3U8_RE, SCAN_CHUNK_SIZE, SCAN_OVERLAP, scan_m3u8_candidates, _match_url
+
+
+def iframe_body():
+    """HTML de player com URLs nos quatro formatos, espalhadas por mais de um bloco"""
+    enchimento = "<div class='x'>çãé " + "a" * 997 + "</div>\n"
+    inicio = "".join([
+        "<html><head><title>Aula</title></head><body>",
+        enchimento * 3,
+        '<video src="https://vz-a.b-cdn.net/a1/playlist.m3u8?token=abc&amp;e=1"></video>',
+        enchimento * 12,
+    ])
+    # A URL em JSON atravessa a fronteira do primeiro bloco de 16 KiB
+    inicio += "x" * (SCAN_CHUNK_SIZE - 40 - len(inicio.encode()))
+    return "".join([
+        inicio,
+        "<script>var cfg = {\"playbackUrl\": \"https:\\/\\/vz-b.b-cdn.net\\/b2\\/playlist.m3u8\"};</script>",
+        enchimento * 5,
+        "<source src='https://vz-c.b-cdn.net/c3/video.m3u8'>",
+        "<p>https://vz-d.b-cdn.net/d4/playlist.m3u8</p>",
+        # Repetida: só a primeira ocorrência conta
+        '<video src="https://vz-a.b-cdn.net/a1/playlist.m3u8?token=abc&amp;e=1"></video>',
+        enchimento * 12,
+        '<video src="https://vz-e.b-cdn.net/e5/playlist.m3u8"></video>',
+        "</body></html>",
+    ])
+
+
+def one_shot(text):
+    """Referência: a expressão aplicada ao texto inteiro, sem repetir URLs"""
+    return list(dict.fromkeys(_match_url(match) for match in M3U8_RE.finditer(text)))
+
+
+class FakeResponse:
+    encoding = "utf-8"
+
+    def __init__(self, body):
+        self.body = body
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+
+def test_reference_finds_every_format():
+    assert one_shot(iframe_body()) == [
+        "https://vz-a.b-cdn.net/a1/playlist.m3u8?token=abc&amp;e=1",
+        "https://vz-b.b-cdn.net/b2/playlist.m3u8",
+        "https://vz-c.b-cdn.net/c3/video.m3u8",
+        "https://vz-d.b-cdn.net/d4/playlist.m3u8",
+        "https://vz-e.b-cdn.net/e5/playlist.m3u8",
+    ]
+    assert len(iframe_body().encode()) > 2 * SCAN_CHUNK_SIZE
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, SCAN_OVERLAP + 1, SCAN_CHUNK_SIZE])
+def test_chunked_scan_matches_one_shot(chunk_size):
+    body = iframe_body()
+    encontrados = [url for novos in scan_m3u8_candidates(FakeResponse(body.encode()), chunk_size) for url in novos]
+    assert encontrados == one_shot(body)
+
+
+@pytest.mark.parametrize("chunk_size", [1, SCAN_CHUNK_SIZE])
+def test_feed_returns_only_new_urls(chunk_size):
+    body = iframe_body()
+    scanner = M3U8Scanner()
+    encontrados = []
+    for start in range(0, len(body), chunk_size):
+        encontrados.extend(scanner.feed(body[start:start + chunk_size]))
+    encontrados.extend(scanner.close())
+
+    assert encontrados == one_shot(body)
+    assert list(scanner.found) == encontrados
+
+
+def test_url_split_at_the_end_waits_for_close():
+    scanner = M3U8Scanner()
+    assert scanner.feed('<video src="https://vz-a.b-cdn.net/a1/play') == []
+    assert scanner.feed('list.m3u8?t=1"></video>') == []
+    assert scanner.close() == ["https://vz-a.b-cdn.net/a1/playlist.m3u8?t=1"]
@@ -0,0 +1,110 @@
+import pytest
+
+from downloader.hls import parse_playlist, PlaylistError
+
+BASE = "https://cdn.example.com/video/playlist.m3u8"
+
+
+def test_master_playlist():
+    text = "\n".join([
+        "#EXTM3U",
+        '#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,CODECS="avc1.4d401e,mp4a.40.2"',
+        "360p/video.m3u8",
+        "#EXT-X-STREAM-INF:BANDWIDTH=5000000,RESOLUTION=1920x1080",
+        "https://other.example.com/1080p/video.m3u8",
+        "#EXT-X-STREAM-INF:BANDWIDTH=2500000,RESOLUTION=1280x720",
+        "720p/video.m3u8",
+    ])
+    playlist = parse_playlist(text, BASE)
+
+    assert playlist.is_master
+    assert not playlist.segments
+    assert [v.height for v in playlist.variants] == [360, 1080, 720]
+    assert playlist.variants[0].url == "https://cdn.example.com/video/360p/video.m3u8"
+    assert playlist.variants[0].codecs == "avc1.4d401e,mp4a.40.2"
+    best = playlist.best_variant()
+    assert best.height == 1080
+    assert best.url == "https://other.example.com/1080p/video.m3u8"
+
+
+def test_media_playlist():
+    text = "\n".join([
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        "#EXT-X-TARGETDURATION:4",
+        "#EXT-X-MEDIA-SEQUENCE:10",
+        "#EXTINF:4.0,",
+        "seg_0.ts",
+        "#EXT-X-DISCONTINUITY",
+        "#EXTINF:2.5,titulo",
+        "seg_1.ts",
+        "#EXT-X-ENDLIST",
+    ])
+    playlist = parse_playlist(text, BASE)
+
+    assert not playlist.is_master
+    assert playlist.target_duration == 4.0
+    assert playlist.endlist
+    assert playlist.encryption is None
+    assert [s.url for s in playlist.segments] == [
+        "https://cdn.example.com/video/seg_0.ts",
+        "https://cdn.example.com/video/seg_1.ts",
+    ]
+    assert [s.sequence for s in playlist.segments] == [10, 11]
+    assert [s.discontinuity for s in playlist.segments] == [False, True]
+    assert playlist.duration == pytest.approx(6.5)
+
+
+def test_byterange_offsets_continue_within_the_same_file():
+    text = "\n".join([
+        "#EXTM3U",
+        "#EXTINF:4,",
+        "#EXT-X-BYTERANGE:1000@0",
+        "video.ts",
+        "#EXTINF:4,",
+        "#EXT-X-BYTERANGE:500",
+        "video.ts",
+        "#EXTINF:4,",
+        "#EXT-X-BYTERANGE:200@5000",
+        "video.ts",
+    ])
+    segments = parse_playlist(text, BASE).segments
+
+    assert [s.byterange for s in segments] == [(1000, 0), (500, 1000), (200, 5000)]
+    assert segments[1].request_headers({"Referer": "x"}) == {"Referer": "x", "Range": "bytes=1000-1499"}
+
+
+def test_encrypted_playlist_reports_method():
+    text = '#EXTM3U\n#EXT-X-KEY:METHOD=AES-128,URI="key.bin"\n#EXTINF:4,\nseg.ts\n'
+    assert parse_playlist(text, BASE).encryption == "AES-128"
+
+
+def test_bom_and_blank_lines_are_accepted():
+    text = "\ufeff#EXTM3U\n\n#EXTINF:4,\n\nseg.ts\n"
+    assert len(parse_playlist(text, BASE).segments) == 1
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "<html><body>Erro 500</body></html>\n<p>seg.ts</p>",
+    "seg_0.ts\nseg_1.ts",
+])
+def test_missing_header_is_rejected(text):
+    with pytest.raises(PlaylistError):
+        parse_playlist(text, BASE)
+
+
+@pytest.mark.parametrize("tag", [
+    "#EXT-X-TARGETDURATION:quatro",
+    "#EXT-X-MEDIA-SEQUENCE:1.5",
+    "#EXT-X-BYTERANGE:abc@0",
+    "#EXT-X-STREAM-INF:BANDWIDTH=alto",
+])
+def test_malformed_numeric_tags_raise_playlist_error(tag):
+    with pytest.raises(PlaylistError):
+        parse_playlist(f"#EXTM3U\n{tag}\nseg.ts\n", BASE)
+
+
+def test_malformed_extinf_duration_is_tolerated():
+    playlist = parse_playlist("#EXTM3U\n#EXTINF:?,\nseg.ts\n", BASE)
+    assert playlist.segments[0].duration == 0.0
@@ -0,0 +1,64 @@
+import pytest
+
+from downloader import lessons
+from downloader.video_downloader import PendingConcat
+
+M3U8_URL = "https://vz-a.b-cdn.net/aula/playlist.m3u8"
+
+
+class FakeConcat(PendingConcat):
+    def __init__(self, success):
+        super().__init__("tmp", [], "aula.mp4", "parts")
+        self.success = success
+
+    def run(self):
+        return self.success
+
+
+class FakeDownloads:
+    """Substitui download_lesson_video: devolve `resultados` em ordem e registra as opções"""
+
+    def __init__(self, resultados):
+        self.resultados = list(resultados)
+        self.chamadas = []
+
+    def __call__(self, m3u8_url, output_filename, output_dir, headers, session=None, **download_options):
+        self.chamadas.append(download_options)
+        return self.resultados.pop(0)
+
+
+@pytest.fixture(autouse=True)
+def resolved_lesson(monkeypatch):
+    """Aula resolvida sem rede"""
+    monkeypatch.setattr(lessons, "fetch_lesson_page", lambda get_course_page, url: ("<html></html>", "Aula"))
+    monkeypatch.setattr(lessons, "extract_iframe_url", lambda page: "https://iframe.mediadelivery.net/embed/1")
+    monkeypatch.setattr(lessons, "resolve_m3u8_url", lambda *args: M3U8_URL)
+
+
+def run(tmp_path, monkeypatch, resultados):
+    downloads = FakeDownloads(resultados)
+    monkeypatch.setattr(lessons, "download_lesson_video", downloads)
+    (job,) = lessons.run_lesson_pipeline(["/aula/1"], None, None, {}, 0, 0, str(tmp_path))
+    return job, downloads.chamadas
+
+
+def test_failed_mux_falls_back_to_other_qualities(tmp_path, monkeypatch):
+    job, chamadas = run(tmp_path, monkeypatch, [FakeConcat(False), True])
+
+    assert job.success
+    assert [opcoes.get("defer_concat") for opcoes in chamadas] == [True, None]
+    assert chamadas[1]["fallback_only"]
+
+
+def test_mux_and_fallbacks_failing_fail_the_lesson(tmp_path, monkeypatch):
+    job, chamadas = run(tmp_path, monkeypatch, [FakeConcat(False), False])
+
+    assert not job.success
+    assert len(chamadas) == 2
+
+
+def test_successful_mux_does_not_download_again(tmp_path, monkeypatch):
+    job, chamadas = run(tmp_path, monkeypatch, [FakeConcat(True)])
+
+    assert job.success
+    assert len(chamadas) == 1
@@ -0,0 +1,65 @@
+import os
+import sys
+import stat
+import threading
+
+import pytest
+
+from downloader.video_downloader import FfmpegPipeSink
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="ffmpeg falso é um script de shell")
+
+# Imita um ffmpeg verboso: enche o stderr antes de ler o stdin
+FAKE_FFMPEG = """#!{python}
+import sys
+sys.stderr.write("aviso\\n" * 200000)
+sys.stderr.flush()
+dados = sys.stdin.buffer.read()
+with open(sys.argv[-1], "wb") as f:
+    f.write(dados)
+sys.exit({code})
+"""
+
+
+def fake_ffmpeg(tmp_path, monkeypatch, code=0):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "ffmpeg"
+    script.write_text(FAKE_FFMPEG.format(python=sys.executable, code=code))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+def write_all(sink, chunks):
+    resultado = []
+
+    def escrever():
+        for chunk in chunks:
+            sink.write(chunk)
+        resultado.append(sink.close())
+
+    thread = threading.Thread(target=escrever, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    if thread.is_alive():
+        sink.abort()
+        pytest.fail("ffmpeg e o downloader travaram esperando um pelo outro")
+    return resultado[0]
+
+
+def test_verbose_ffmpeg_does_not_deadlock(tmp_path, monkeypatch):
+    fake_ffmpeg(tmp_path, monkeypatch)
+    output = tmp_path / "aula.mp4.part"
+    sink = FfmpegPipeSink(str(output))
+
+    assert write_all(sink, [b"x" * 65536] * 64)
+    assert output.stat().st_size == 65536 * 64
+
+
+def test_failed_ffmpeg_removes_output(tmp_path, monkeypatch):
+    fake_ffmpeg(tmp_path, monkeypatch, code=1)
+    output = tmp_path / "aula.mp4.part"
+    sink = FfmpegPipeSink(str(output))
+
+    assert not write_all(sink, [b"x" * 1024])
+    assert not output.exists()
@@ -0,0 +1,50 @@
+from downloader.hls import Variant
+from downloader.quality import QualityPolicy
+
+GB = 1000 ** 3
+
+VARIANTS = [
+    Variant("360.m3u8", bandwidth=1_000_000, resolution=(640, 360)),
+    Variant("720.m3u8", bandwidth=4_000_000, resolution=(1280, 720)),
+    Variant("1080.m3u8", bandwidth=8_000_000, resolution=(1920, 1080)),
+]
+
+
+def write(path, size):
+    with open(path, "wb") as f:
+        f.truncate(size)
+    return str(path)
+
+
+def test_existing_videos_are_deducted_from_the_budget(tmp_path):
+    write(tmp_path / "01.aula.mp4", int(1.5 * GB))
+    policy = QualityPolicy(disk_budget=2 * GB)
+    policy.start_course(1, str(tmp_path))
+
+    assert policy.budget.allowance() == 0.5 * GB
+    # 1 hora: 720p estima 1,8 GB e não cabe nos 0,5 GB que sobraram
+    assert policy.choose(VARIANTS, "02.aula.mp4", duration=3600).height == 360
+
+
+def test_choose_does_not_charge_and_finish_charges_once(tmp_path):
+    policy = QualityPolicy(disk_budget=10 * GB)
+    policy.start_course(2, str(tmp_path))
+    for _ in range(3):
+        policy.choose(VARIANTS, "01.aula.mp4", duration=600)
+    assert policy.budget.remaining == 10 * GB
+
+    video = write(tmp_path / "01.aula.mp4", 1 * GB)
+    policy.finish_lesson(video)
+    policy.finish_lesson(video)
+    assert policy.budget.remaining == 9 * GB
+    assert policy.budget.allowance() == 9 * GB
+
+
+def test_lessons_without_video_release_their_share(tmp_path):
+    policy = QualityPolicy(disk_budget=9 * GB)
+    policy.start_course(3, str(tmp_path))
+    assert policy.budget.allowance() == 3 * GB
+
+    policy.finish_lesson(write(tmp_path / "01.texto.md", 10))
+    policy.finish_lesson(None)
+    assert policy.budget.allowance() == 9 * GB
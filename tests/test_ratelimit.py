@@ -0,0 +1,96 @@
+import pytest
+
+from downloader.ratelimit import TokenBucket, HostRateLimiter, DEFAULT_RATE_LIMITS, DEFAULT_HOST_RATE
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_burst_is_free_then_requests_queue(clock):
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Sem fichas, cada reserva espera a sua vez: 1/rate depois da anterior
+    assert [bucket.reserve() for _ in range(3)] == pytest.approx([0.5, 1.0, 1.5])
+
+
+def test_refill_follows_rate_and_caps_at_burst(clock):
+    bucket = TokenBucket(rate=4, burst=2, clock=clock)
+    bucket.reserve()
+    bucket.reserve()
+
+    clock.now += 0.25
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.25)
+
+    # Um longo intervalo parado não acumula mais que a rajada
+    clock.now += 60
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.25)
+
+
+def test_acquire_returns_the_reserved_wait(clock, monkeypatch):
+    dormiu = []
+    monkeypatch.setattr("downloader.ratelimit.time.sleep", dormiu.append)
+    bucket = TokenBucket(rate=1, burst=1, clock=clock)
+
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(1.0)
+    assert dormiu == [pytest.approx(1.0)]
+
+
+def test_cdn_subdomains_share_the_suffix_bucket(clock):
+    limiter = HostRateLimiter(clock=clock)
+
+    bucket = limiter.bucket_for("https://vz-x.b-cdn.net/video/seg_0.ts")
+    assert bucket is limiter.bucket_for("https://vz-other.b-cdn.net/video/seg_1.ts")
+    assert (bucket.rate, bucket.burst) == DEFAULT_RATE_LIMITS["b-cdn.net"]
+
+
+def test_exact_host_and_overrides(clock):
+    limiter = HostRateLimiter({"b-cdn.net": (10, 5)}, clock=clock)
+
+    hub = limiter.bucket_for("https://hub.asimov.academy/course/x")
+    assert (hub.rate, hub.burst) == DEFAULT_RATE_LIMITS["hub.asimov.academy"]
+    cdn = limiter.bucket_for("https://vz-x.b-cdn.net/a.ts")
+    assert (cdn.rate, cdn.burst) == (10, 5)
+    # Sufixo só casa em fronteira de domínio
+    assert limiter.bucket_for("https://notb-cdn.net/a.ts") is not cdn
+
+
+def test_unknown_hosts_get_their_own_default_bucket(clock):
+    limiter = HostRateLimiter(clock=clock)
+
+    a = limiter.bucket_for("https://a.example.com/x")
+    b = limiter.bucket_for("https://b.example.com/x")
+    assert a is not b
+    assert (a.rate, a.burst) == DEFAULT_HOST_RATE
+    assert a is limiter.bucket_for("https://A.example.com/y")
+
+
+def test_from_config_turns_wait_time_into_hub_rate():
+    limiter = HostRateLimiter.from_config(wait_time=4, rate_limits={"example.com": [1, 1]})
+
+    hub = limiter.bucket_for("https://hub.asimov.academy/")
+    assert hub.rate == 0.25
+    assert hub.burst == DEFAULT_RATE_LIMITS["hub.asimov.academy"][1]
+    assert limiter.bucket_for("https://cdn.example.com/").rate == 1
+
+
+def test_reserve_uses_the_url_bucket(clock):
+    limiter = HostRateLimiter({"example.com": (1, 1)}, clock=clock)
+
+    assert limiter.reserve("https://example.com/a") == 0.0
+    assert limiter.reserve("https://example.com/b") == pytest.approx(1.0)
+    # Outro host não divide o orçamento
+    assert limiter.reserve("https://vz-x.b-cdn.net/a.ts") == 0.0
@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+
+from downloader.state import CourseState, STATE_NAME
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = CourseState(str(tmp_path / ".config" / STATE_NAME))
+    yield state
+    state.close()
+
+
+def lesson_file(tmp_path, name, data=b"video"):
+    path = tmp_path / "curso" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_diff_splits_new_redo_and_done(state, tmp_path):
+    output_dir = str(tmp_path / "curso")
+    state.record("/aula/1", output_dir, True, "Aula 1", lesson_file(tmp_path, "01. Aula 1.mp4"))
+    state.record("/aula/2", output_dir, False, "Aula 2")
+    # Concluída, mas o arquivo foi apagado
+    state.record("/aula/3", output_dir, True, "Aula 3", lesson_file(tmp_path, "03. Aula 3.mp4"))
+    (tmp_path / "curso" / "03. Aula 3.mp4").unlink()
+    # Concluída sem arquivo registrado
+    state.record("/aula/4", output_dir, True, "Aula 4")
+
+    novas, pendentes, concluidas = state.diff(["/aula/1", "/aula/2", "/aula/3", "/aula/4", "/aula/5"], output_dir)
+
+    assert novas == ["/aula/5"]
+    assert pendentes == ["/aula/2", "/aula/3", "/aula/4"]
+    assert concluidas == ["/aula/1"]
+
+
+def test_size_change_demotes_lesson_to_redo(state, tmp_path):
+    output_dir = str(tmp_path / "curso")
+    path = lesson_file(tmp_path, "01. Aula.mp4", b"video completo")
+    state.record("/aula/1", output_dir, True, "Aula", path)
+    assert state.is_done("/aula/1", output_dir)
+
+    # Arquivo truncado (ou substituído) depois de registrado
+    lesson_file(tmp_path, "01. Aula.mp4", b"video")
+
+    assert not state.is_done("/aula/1", output_dir)
+    assert state.diff(["/aula/1"], output_dir) == ([], ["/aula/1"], [])
+
+
+def test_state_is_kept_per_output_dir(state, tmp_path):
+    path = lesson_file(tmp_path, "01. Aula.mp4")
+    state.record("/aula/1", str(tmp_path / "curso"), True, "Aula", path)
+
+    assert state.diff(["/aula/1"], str(tmp_path / "outro-curso")) == (["/aula/1"], [], [])
+
+
+def test_failure_after_success_is_redone(state, tmp_path):
+    output_dir = str(tmp_path / "curso")
+    state.record("/aula/1", output_dir, True, "Aula", lesson_file(tmp_path, "01. Aula.mp4"))
+    state.record("/aula/1", output_dir, False)
+
+    assert state.diff(["/aula/1"], output_dir) == ([], ["/aula/1"], [])
+
+
+def test_old_url_only_table_is_dropped(tmp_path):
+    path = str(tmp_path / STATE_NAME)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE lessons (lesson_url TEXT PRIMARY KEY, status TEXT NOT NULL)")
+    conn.execute("INSERT INTO lessons VALUES ('/aula/1', 'done')")
+    conn.commit()
+    conn.close()
+
+    state = CourseState(path)
+    try:
+        assert state.diff(["/aula/1"], str(tmp_path)) == (["/aula/1"], [], [])
+    finally:
+        state.close()
@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from downloader.store import ContentStore, STORE_NAME, file_sha256
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ContentStore(str(tmp_path / STORE_NAME))
+    yield store
+    store.close()
+
+
+def write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_linked_video_survives_gc(store, tmp_path):
+    video = write(tmp_path / "curso-a" / "01. Aula.mp4", b"video" * 1000)
+    store.add_video("playlist.mp4", video)
+
+    objeto = store.object_path(file_sha256(video))
+    assert os.path.samefile(objeto, video)
+    assert store.collect_garbage() == 0
+    assert os.path.exists(objeto)
+
+    # O vídeo guardado é ligado em outro curso sem baixar de novo
+    copia = str(tmp_path / "curso-b" / "03. Aula.mp4")
+    os.makedirs(os.path.dirname(copia))
+    assert store.restore_video("playlist.mp4", copia) == 5000
+    assert os.path.samefile(copia, video)
+
+
+def test_video_whose_output_was_deleted_is_collected(store, tmp_path):
+    video = write(tmp_path / "curso-a" / "01. Aula.mp4", b"video" * 1000)
+    store.add_video("playlist.mp4", video)
+    objeto = store.object_path(file_sha256(video))
+
+    os.remove(video)
+    assert store.collect_garbage() == 5000
+    assert not os.path.exists(objeto)
+    assert store.restore_video("playlist.mp4", str(tmp_path / "nova.mp4")) is None
+
+
+def test_duplicate_content_shares_the_existing_object(store, tmp_path):
+    primeiro = write(tmp_path / "curso-a" / "01. Aula.mp4", b"mesmo conteudo")
+    segundo = write(tmp_path / "curso-b" / "07. Aula.mp4", b"mesmo conteudo")
+    store.add_video("a.mp4", primeiro)
+    store.add_video("b.mp4", segundo)
+
+    assert os.path.samefile(primeiro, segundo)
+    os.remove(primeiro)
+    # Ainda usado pela pasta do curso b
+    assert store.collect_garbage() == 0
+    assert store.restore_video("a.mp4", str(tmp_path / "restaurado.mp4")) == len(b"mesmo conteudo")
+
+
+def add_segment(store, key, path, data):
+    seg_path = write(path, data)
+    store.add_segment(key, seg_path, len(data), file_sha256(seg_path))
+    return seg_path
+
+
+def test_release_segments_keeps_object_referenced_by_video(store, tmp_path):
+    dados = b"segmento unico" * 100
+    seg_path = add_segment(store, "seg_0.ts", tmp_path / "parts" / "seg_0.ts", dados)
+    # Vídeo de um segmento só, concatenado em .ts: mesmo conteúdo, mesmo objeto
+    video = write(tmp_path / "curso-a" / "01. Aula.ts", dados)
+    store.add_video("playlist.ts", video)
+    os.remove(seg_path)
+
+    store.release_segments(["seg_0.ts"])
+
+    assert os.path.exists(store.object_path(file_sha256(video)))
+    assert store.read_segment("seg_0.ts") is None
+    assert store.restore_video("playlist.ts", str(tmp_path / "restaurado.ts")) == len(dados)
+
+
+def test_release_segments_removes_orphans_only(store, tmp_path):
+    orfao = add_segment(store, "aula1/seg_0.ts", tmp_path / "p1" / "seg_0.ts", b"so desta aula")
+    compartilhado = add_segment(store, "aula1/seg_1.ts", tmp_path / "p1" / "seg_1.ts", b"vinheta")
+    add_segment(store, "aula2/seg_0.ts", tmp_path / "p2" / "seg_0.ts", b"vinheta")
+    objeto_orfao = store.object_path(file_sha256(orfao))
+    objeto_compartilhado = store.object_path(file_sha256(compartilhado))
+
+    store.release_segments(["aula1/seg_0.ts", "aula1/seg_1.ts"])
+
+    assert not os.path.exists(objeto_orfao)
+    assert os.path.exists(objeto_compartilhado)
+    assert store.read_segment("aula2/seg_0.ts") == b"vinheta"
+    assert store.read_segment("aula1/seg_1.ts") is None
+
+
+def test_truncated_object_is_forgotten(store, tmp_path):
+    video = write(tmp_path / "curso-a" / "01. Aula.mp4", b"video" * 1000)
+    store.add_video("playlist.mp4", video)
+    with open(video, "r+b") as f:
+        f.truncate(10)
+
+    assert store.restore_video("playlist.mp4", str(tmp_path / "restaurado.mp4")) is None